@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from config.admin_tools import EstimatedCountPaginator
 from .models import User
 
 
@@ -9,8 +10,10 @@ class UserAdmin(BaseUserAdmin):
     
     list_display = ('username', 'email', 'first_name', 'last_name', 'role', 'is_active', 'created_at')
     list_filter = ('role', 'is_staff', 'is_active', 'created_at')
-    search_fields = ('username', 'email', 'first_name', 'last_name', 'phone')
+    search_fields = ('^username', '^email', '^first_name', '^last_name', '^phone')
     ordering = ('-created_at',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = BaseUserAdmin.fieldsets + (
         ('Custom Fields', {
@@ -0,0 +1,33 @@
+# Indexes for the admin's prefix (``^field``) searches; see config.admin_tools.PrefixSearchIndex
+import config.admin_tools
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_user_role'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=config.admin_tools.PrefixSearchIndex(fields=['username'], name='user_username_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=config.admin_tools.PrefixSearchIndex(fields=['email'], name='user_email_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=config.admin_tools.PrefixSearchIndex(fields=['first_name'], name='user_first_name_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=config.admin_tools.PrefixSearchIndex(fields=['last_name'], name='user_last_name_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=config.admin_tools.PrefixSearchIndex(fields=['phone'], name='user_phone_search_idx'),
+        ),
+    ]
@@ -6,6 +6,8 @@ from django.db import models
 from django.core.exceptions import ValidationError
 import os
 
+from config.admin_tools import PrefixSearchIndex
+
 
 def validate_image_size(image):
     """Validate that uploaded image is not too large."""
@@ -64,6 +66,11 @@ class User(AbstractUser):
         ordering = ['-created_at']
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        # Admin ^field searches
+        indexes = [
+            PrefixSearchIndex(fields=[field], name=f'user_{field}_search_idx')
+            for field in ('username', 'email', 'first_name', 'last_name', 'phone')
+        ]
 
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
@@ -86,6 +93,11 @@ class User(AbstractUser):
         """Check if user has admin role."""
         return self.role == 'admin' or self.is_staff or self.is_superuser
 
+    @property
+    def is_doctor(self):
+        """Check if user has doctor role."""
+        return self.role == 'doctor'
+
     @property
     def is_regular_user(self):
         """Check if user has regular user role."""
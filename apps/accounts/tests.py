@@ -1,3 +1,146 @@
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.appointments.models import Appointment, Notification, Payment
+from apps.appointments.stats import bulk_set_status
+from apps.services.models import Doctor, Service
+
+from .models import User
+
+
+class DashboardQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = User.objects.create_user(username='patient', password='pass')
+        cls.admin = User.objects.create_user(username='boss', password='pass', role='admin')
+        services = [
+            Service.objects.create(name=f'Service {i}', description='x', price=100)
+            for i in range(3)
+        ]
+        day = timezone.localdate() + timedelta(days=3)
+        for i, status in enumerate(['pending', 'pending', 'approved', 'rejected'] * 3):
+            Appointment.objects.create(
+                user=cls.patient, service=services[i % 3],
+                appointment_date=day, appointment_time=f'{9 + i % 8}:00', status=status,
+            )
+        Notification.objects.create(user=cls.patient, message='hello')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_user_dashboard(self):
+        self.client.force_login(self.patient)
+        # session, user, counts, notifications, recent appointments,
+        # plus the session save (SESSION_SAVE_EVERY_REQUEST)
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('user_dashboard'))
+        self.assertEqual(response.context['total_appointments'], 12)
+        self.assertEqual(response.context['pending_appointments'], 6)
+        self.assertEqual(response.context['approved_appointments'], 3)
+        self.assertEqual(response.context['notification_count'], 1)
+
+        # Counts are now cached
+        with self.assertNumQueries(7):
+            self.client.get(reverse('user_dashboard'))
+
+    def test_admin_dashboard(self):
+        self.client.force_login(self.admin)
+        # session, user, counts, users, services, recent appointments,
+        # plus the session save (SESSION_SAVE_EVERY_REQUEST)
+        with self.assertNumQueries(9):
+            response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.context['total_appointments'], 12)
+        self.assertEqual(response.context['rejected_appointments'], 3)
+        self.assertEqual(response.context['total_users'], 1)
+        self.assertEqual(response.context['total_services'], 3)
+
+        with self.assertNumQueries(6):
+            self.client.get(reverse('admin_dashboard'))
+
+    def test_status_change_invalidates_counts(self):
+        self.client.force_login(self.patient)
+        self.client.get(reverse('user_dashboard'))
+
+        appointment = Appointment.objects.filter(status='pending').first()
+        appointment.status = 'approved'
+        appointment.save()
+
+        response = self.client.get(reverse('user_dashboard'))
+        self.assertEqual(response.context['pending_appointments'], 5)
+        self.assertEqual(response.context['approved_appointments'], 4)
+
+
+class DoctorDashboardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor_user = User.objects.create_user(username='doc', password='pass', role='doctor')
+        doctor = Doctor.objects.create(user=cls.doctor_user, specialization='Cardiology')
+        other = Doctor.objects.create(
+            user=User.objects.create_user(username='other', role='doctor'), specialization='Dermatology',
+        )
+        services = [
+            Service.objects.create(name=f'Service {i}', description='x', price=100, doctor=doctor)
+            for i in range(2)
+        ]
+        elsewhere = Service.objects.create(name='Elsewhere', description='x', price=100, doctor=other)
+        patients = [User.objects.create_user(username=f'patient{i}') for i in range(4)]
+        cls.today = timezone.localdate()
+
+        def book(service, days, hour, status='approved'):
+            return Appointment.objects.create(
+                user=patients[hour % 4], service=service, status=status,
+                appointment_date=cls.today + timedelta(days=days), appointment_time=f'{hour}:00',
+            )
+
+        cls.first = book(services[0], 0, 9)
+        book(services[1], 0, 11, 'pending')
+        book(services[1], 3, 10)
+        book(services[0], 7, 10)
+        book(elsewhere, 0, 10)
+        Payment.objects.create(appointment=cls.first, amount=100, status=Payment.Status.SUCCESS)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.doctor_user)
+
+    def test_agenda(self):
+        # session, user, doctor, agenda rows, agenda counts,
+        # plus the session save (SESSION_SAVE_EVERY_REQUEST)
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('doctor_dashboard'))
+        agenda = response.context['agenda']
+        self.assertEqual([a.appointment_time.hour for a in agenda['today']], [9, 11])
+        self.assertEqual(len(agenda['upcoming']), 1)
+        self.assertEqual(agenda['counts']['week'], 3)
+        self.assertEqual(agenda['counts']['pending'], 1)
+        self.assertEqual(agenda['counts']['paid'], 1)
+        self.assertContains(response, 'Success')
+
+        # The agenda is now cached
+        with self.assertNumQueries(6):
+            self.client.get(reverse('doctor_dashboard'))
+
+    def test_other_day(self):
+        response = self.client.get(reverse('doctor_dashboard'), {'day': self.today + timedelta(days=3)})
+        self.assertEqual(response.context['agenda']['counts']['today'], 1)
+
+    def test_changes_invalidate_agenda(self):
+        self.client.get(reverse('doctor_dashboard'))
+
+        self.first.status = 'completed'
+        self.first.save()
+        agenda = self.client.get(reverse('doctor_dashboard')).context['agenda']
+        self.assertEqual(agenda['counts']['completed'], 1)
+
+        bulk_set_status(Appointment.objects.filter(status='pending'), 'approved')
+        agenda = self.client.get(reverse('doctor_dashboard')).context['agenda']
+        self.assertEqual(agenda['counts']['pending'], 0)
 
-# Create your tests here.
+    def test_doctors_are_sent_to_their_agenda(self):
+        self.assertRedirects(self.client.get(reverse('user_dashboard')), reverse('doctor_dashboard'))
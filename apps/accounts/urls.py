@@ -13,6 +13,7 @@ urlpatterns = [
     # Dashboard
     path('dashboard/', views.user_dashboard, name='user_dashboard'),
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('doctor-dashboard/', views.doctor_dashboard, name='doctor_dashboard'),
     # notification
     path('notifications/read/', views.mark_notifications_read, name='mark_notifications_read'),
     # Profile
@@ -1,6 +1,7 @@
 """
 Views for user authentication and profile management.
 """
+from datetime import timedelta
 
 from django.shortcuts import render, redirect
 from django.contrib.auth import (
@@ -12,10 +13,14 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.contrib.auth.forms import PasswordChangeForm
-from apps.services.models import Service
 from .models import User
 from apps.appointments.models import Appointment, Notification
+from apps.appointments.agenda import doctor_agenda
+from apps.appointments.stats import appointment_counts, site_counts
+from apps.services.models import Doctor
 from .forms import (
     UserRegistrationForm,
     UserLoginForm,
@@ -54,6 +59,8 @@ def login_view(request):
     if request.user.is_authenticated:
         if request.user.is_admin_user:
             return redirect("admin_dashboard")
+        if request.user.is_doctor:
+            return redirect("doctor_dashboard")
         return redirect("user_dashboard")
 
     if request.method == "POST":
@@ -72,6 +79,8 @@ def login_view(request):
 
             if user.is_admin_user:
                 return redirect("admin_dashboard")
+            if user.is_doctor:
+                return redirect("doctor_dashboard")
             return redirect("user_dashboard")
         else:
             messages.error(request, "Invalid username or password.")
@@ -101,30 +110,33 @@ def user_dashboard(request):
 
     if request.user.is_admin_user:
         return redirect('admin_dashboard')
+    if request.user.is_doctor:
+        return redirect('doctor_dashboard')
     
-    # Get user's appointments    
-    appointments = Appointment.objects.filter(user=request.user).order_by('-created_at')
-    
+    # Get user's appointments
+    appointments = (
+        Appointment.objects.filter(user=request.user)
+        .select_related('service')
+        .order_by('-created_at')
+    )
+
     # Get statistics
-    total_appointments = appointments.count()
-    pending_appointments = appointments.filter(status='pending').count()
-    approved_appointments = appointments.filter(status='approved').count()
-    rejected_appointments = appointments.filter(status='rejected').count()
-    
+    counts = appointment_counts(request.user)
+
     # Get unread notifications
-    notifications = Notification.objects.filter(
+    notifications = list(Notification.objects.filter(
         user=request.user,
         is_read=False
-    ).order_by('-created_at')
+    ).order_by('-created_at'))
 
     context = {
         'appointments': appointments[:5],  # Latest 5 appointments
-        'total_appointments': total_appointments,
-        'pending_appointments': pending_appointments,
-        'approved_appointments': approved_appointments,
-        'rejected_appointments': rejected_appointments,
+        'total_appointments': counts['total'],
+        'pending_appointments': counts['pending'],
+        'approved_appointments': counts['approved'],
+        'rejected_appointments': counts['rejected'],
         "notifications": notifications,
-        "notification_count": notifications.count(),
+        "notification_count": len(notifications),
     }
 
     return render(request, "dashboard/user_dashboard.html", context)
@@ -141,28 +153,53 @@ def admin_dashboard(request):
         messages.error(request, 'You do not have permission to access the admin dashboard.')
         return redirect('user_dashboard')
     
-    # Get all appointments
-    appointments = Appointment.objects.all().order_by('-created_at')
-    
-    # Get total users
-    total_users = User.objects.filter(role='user').count()
-    
-    # Get services count
-    from apps.services.models import Service
-    total_services = Service.objects.filter(is_active=True).count()
-    
+    # Get latest appointments
+    appointments = (
+        Appointment.objects.select_related('user', 'service')
+        .order_by('-created_at')
+    )
+
+    counts = appointment_counts()
+    totals = site_counts()
+
     context = {
         "appointments": appointments[:10],
-        "total_appointments": appointments.count(),
-        "pending_appointments": appointments.filter(status="pending").count(),
-        "approved_appointments": appointments.filter(status="approved").count(),
-        "rejected_appointments": appointments.filter(status="rejected").count(),
-        "total_users": User.objects.filter(role="user").count(),
-        "total_services": Service.objects.filter(is_active=True).count(),
+        "total_appointments": counts["total"],
+        "pending_appointments": counts["pending"],
+        "approved_appointments": counts["approved"],
+        "rejected_appointments": counts["rejected"],
+        "total_users": totals["users"],
+        "total_services": totals["services"],
     }
     
     return render(request, 'dashboard/admin_dashboard.html', context)
 
+
+# =========================
+# Doctor Dashboard
+# =========================
+@login_required
+def doctor_dashboard(request):
+    """Day and week agenda across all of the doctor's services."""
+    if not request.user.is_doctor:
+        return redirect('user_dashboard')
+
+    doctor = Doctor.objects.filter(user=request.user).only('pk').first()
+    if doctor is None:
+        messages.error(request, 'Your doctor profile has not been set up yet.')
+        return render(request, 'dashboard/doctor_dashboard.html', {'agenda': None})
+
+    try:
+        day = parse_date(request.GET.get('day', '')) or timezone.localdate()
+    except ValueError:
+        day = timezone.localdate()
+    context = {
+        'agenda': doctor_agenda(doctor.pk, day),
+        'previous_day': day - timedelta(days=1),
+        'next_day': day + timedelta(days=1),
+    }
+    return render(request, 'dashboard/doctor_dashboard.html', context)
+
 # mark notification as read
 def mark_notifications_read(request):
     Notification.objects.filter(
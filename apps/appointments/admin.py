@@ -1,20 +1,35 @@
 from django.contrib import admin
-from .models import Appointment, TimeSlot, Weekday
+from config.admin_tools import EstimatedCountPaginator, PrefixSearchMixin
+from .models import Appointment, ArchivedAppointment, ArchivedPayment, TimeSlot, Weekday
+from .stats import bulk_set_status
 
 
-admin.site.register(TimeSlot)
 admin.site.register(Weekday)
 
+
+@admin.register(TimeSlot)
+class TimeSlotAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'start_time', 'end_time', 'max_appointments', 'is_available')
+    list_filter = ('is_available',)
+    # __str__ shows the service name and every weekday
+    list_select_related = ('service',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('day_of_week')
+
 @admin.register(Appointment)
-class AppointmentAdmin(admin.ModelAdmin):
+class AppointmentAdmin(PrefixSearchMixin, admin.ModelAdmin):
     """Admin interface for Appointment model."""
     
     list_display = ('user', 'service', 'appointment_date', 'appointment_time', 'status', 'created_at')
     list_filter = ('status', 'appointment_date', 'service', 'created_at')
-    search_fields = ('user__username', 'user__email', 'service__name', 'notes')
+    search_fields = ('^user__username', '^user__email', '^service__name')
     list_editable = ('status',)
+    list_select_related = ('user', 'service')
     date_hierarchy = 'appointment_date'
     ordering = ('-appointment_date', '-appointment_time')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         ('Appointment Details', {
@@ -38,12 +53,47 @@ class AppointmentAdmin(admin.ModelAdmin):
     
     def approve_appointments(self, request, queryset):
         """Bulk action to approve appointments."""
-        updated = queryset.update(status='approved')
+        updated = bulk_set_status(queryset, 'approved')
         self.message_user(request, f'{updated} appointment(s) approved successfully.')
     approve_appointments.short_description = 'Approve selected appointments'
     
     def reject_appointments(self, request, queryset):
         """Bulk action to reject appointments."""
-        updated = queryset.update(status='rejected')
+        updated = bulk_set_status(queryset, 'rejected')
         self.message_user(request, f'{updated} appointment(s) rejected.')
-    reject_appointments.short_description = 'Reject selected appointments'
\ No newline at end of file
+    reject_appointments.short_description = 'Reject selected appointments'
+
+
+class ArchivedPaymentInline(admin.StackedInline):
+    model = ArchivedPayment
+    can_delete = False
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedAppointment)
+class ArchivedAppointmentAdmin(PrefixSearchMixin, admin.ModelAdmin):
+    """Read-only view of appointments moved out by `archive_appointments`."""
+
+    list_display = ('user', 'service', 'appointment_date', 'appointment_time', 'status', 'archived_at')
+    list_filter = ('status',)
+    list_select_related = ('user', 'service')
+    search_fields = ('^user__username', '^user__email', '^service__name')
+    date_hierarchy = 'appointment_date'
+    inlines = [ArchivedPaymentInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,106 @@
+"""
+Day and week agenda for doctors.
+
+An agenda is every appointment across the doctor's services from the given
+day through the following six days, with patient, service and payment
+loaded in one query, plus the status counts from one aggregate. It is
+cached per doctor and day. Each doctor has a version number that is part
+of the key, and bumping it drops all of that doctor's cached days at once.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.services.models import Service
+
+from .models import Appointment, Payment
+from .signals import is_archiving
+
+AGENDA_DAYS = 7
+AGENDA_STATUSES = ('pending', 'approved', 'completed')
+
+
+def agenda_version_key(doctor_id):
+    return f'agenda:version:{doctor_id}'
+
+
+def agenda_key(doctor_id, day, version):
+    return f'agenda:{doctor_id}:{day.isoformat()}:v{version}'
+
+
+def build_agenda(doctor_id, day):
+    """Appointments and counts for ``day`` and the six days after it."""
+    week_end = day + timedelta(days=AGENDA_DAYS - 1)
+    appointments = Appointment.objects.filter(
+        service__doctor_id=doctor_id,
+        appointment_date__range=(day, week_end),
+    )
+    rows = list(
+        appointments
+        .select_related('user', 'service', 'payment')
+        .order_by('appointment_date', 'appointment_time', 'id')
+    )
+    counts = appointments.aggregate(
+        week=Count('pk'),
+        today=Count('pk', filter=Q(appointment_date=day)),
+        paid=Count('pk', filter=Q(payment__status=Payment.Status.SUCCESS)),
+        **{status: Count('pk', filter=Q(status=status)) for status in AGENDA_STATUSES}
+    )
+    return {
+        'day': day,
+        'week_end': week_end,
+        'today': [appointment for appointment in rows if appointment.appointment_date == day],
+        'upcoming': [appointment for appointment in rows if appointment.appointment_date != day],
+        'counts': counts,
+    }
+
+
+def doctor_agenda(doctor_id, day):
+    """Cached ``build_agenda()``."""
+    version = cache.get_or_set(agenda_version_key(doctor_id), 1, None)
+    return cache.get_or_set(
+        agenda_key(doctor_id, day, version),
+        lambda: build_agenda(doctor_id, day),
+        settings.DOCTOR_AGENDA_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_doctor_agendas(doctor_ids):
+    """Drop every cached agenda of the given doctors."""
+    for doctor_id in set(doctor_ids):
+        if doctor_id is None:
+            continue
+        try:
+            cache.incr(agenda_version_key(doctor_id))
+        except ValueError:
+            # No version yet, so nothing is cached for this doctor
+            pass
+
+
+def invalidate_service_agendas(service_ids):
+    """Drop the cached agendas of the doctors running the given services."""
+    invalidate_doctor_agendas(
+        Service.objects.filter(pk__in=set(service_ids)).order_by().values_list('doctor_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def appointment_changed(sender, instance, **kwargs):
+    if is_archiving():
+        return
+    if Appointment.service.is_cached(instance):
+        invalidate_doctor_agendas([instance.service.doctor_id])
+    else:
+        invalidate_service_agendas([instance.service_id])
+
+
+@receiver(post_save, sender=Payment)
+def payment_changed(sender, instance, **kwargs):
+    invalidate_doctor_agendas(
+        Service.objects.filter(appointments=instance.appointment_id).order_by().values_list('doctor_id', flat=True)
+    )
@@ -0,0 +1,76 @@
+"""
+Archival of old appointments.
+
+Appointments in a final status (completed, rejected, cancelled, expired)
+dated before the cutoff are moved, together with their payments, into
+ArchivedAppointment and ArchivedPayment. Chunks are taken one at a time,
+each in its own short transaction, like the notification retention job.
+
+The daily rollups keep counting archived appointments, so dashboard totals
+do not change when rows are archived.
+"""
+import time
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .agenda import invalidate_service_agendas
+from .models import Appointment, ArchivedAppointment, ArchivedPayment, Payment
+from .signals import archiving
+from .stats import invalidate_appointment_counts
+
+ARCHIVE_STATUSES = ('completed', 'rejected', 'cancelled', 'expired')
+
+
+def _copied_fields(model):
+    return [field.attname for field in model._meta.concrete_fields if field.name != 'archived_at']
+
+
+def archive_cutoff(days=None):
+    """Return the date before which finished appointments are archived."""
+    if days is None:
+        days = settings.APPOINTMENT_ARCHIVE_AFTER_DAYS
+    return timezone.localdate() - timedelta(days=days)
+
+
+def archivable_appointments(cutoff):
+    """Queryset of finished appointments dated before ``cutoff``."""
+    return Appointment.objects.filter(status__in=ARCHIVE_STATUSES, appointment_date__lt=cutoff)
+
+
+def archive_appointments(cutoff, chunk_size=None, pause=0):
+    """
+    Move archivable appointments and their payments chunk by chunk.
+
+    Yields the number of appointments moved by each chunk.
+    """
+    if chunk_size is None:
+        chunk_size = settings.APPOINTMENT_ARCHIVE_CHUNK_SIZE
+    appointment_fields = _copied_fields(ArchivedAppointment)
+    payment_fields = _copied_fields(ArchivedPayment)
+
+    while True:
+        with transaction.atomic():
+            rows = list(archivable_appointments(cutoff).order_by().values(*appointment_fields)[:chunk_size])
+            if not rows:
+                return
+
+            pks = [row['id'] for row in rows]
+            payments = Payment.objects.filter(appointment_id__in=pks)
+            ArchivedAppointment.objects.bulk_create([ArchivedAppointment(**row) for row in rows])
+            ArchivedPayment.objects.bulk_create(
+                [ArchivedPayment(**row) for row in payments.values(*payment_fields)]
+            )
+            # Payments go by cascade
+            with archiving():
+                Appointment.objects.filter(pk__in=pks).delete()
+            transaction.on_commit(partial(invalidate_appointment_counts, {row['user_id'] for row in rows}))
+            transaction.on_commit(partial(invalidate_service_agendas, {row['service_id'] for row in rows}))
+
+        yield len(rows)
+
+        if pause:
+            time.sleep(pause)
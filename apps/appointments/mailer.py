@@ -0,0 +1,106 @@
+"""
+Email delivery for in-app notifications.
+
+Notifications that have not been emailed yet are sent in batches over a
+single reused mail connection. A message that fails is retried after
+NOTIFICATION_EMAIL_RETRY_DELAY seconds, doubled after each further failure,
+until NOTIFICATION_EMAIL_MAX_ATTEMPTS is reached.
+"""
+import smtplib
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Notification
+
+
+def pending_emails(max_attempts=None):
+    """Notifications that still need to be emailed."""
+    if max_attempts is None:
+        max_attempts = settings.NOTIFICATION_EMAIL_MAX_ATTEMPTS
+    return (
+        Notification.objects
+        .filter(emailed_at__isnull=True, email_attempts__lt=max_attempts)
+        .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()))
+        .exclude(user__email='')
+        .exclude(user__email__isnull=True)
+    )
+
+
+def retry_delay(attempts):
+    """How long to wait before retrying a message that has failed ``attempts`` times."""
+    return timedelta(seconds=settings.NOTIFICATION_EMAIL_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def build_email(notification, connection=None):
+    """Build the EmailMessage for a single notification."""
+    return EmailMessage(
+        subject=settings.NOTIFICATION_EMAIL_SUBJECT,
+        body=notification.message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[notification.user.email],
+        connection=connection,
+    )
+
+
+def send_notification_emails(batch_size=None, max_attempts=None, connection=None):
+    """
+    Email one batch of pending notifications.
+
+    Returns a ``(sent, failed)`` tuple. The connection is opened once for
+    the whole batch; after a failure it is closed so the next message
+    reconnects. If it cannot be opened at all, the whole batch has failed.
+    """
+    if batch_size is None:
+        batch_size = settings.NOTIFICATION_EMAIL_BATCH_SIZE
+
+    notifications = list(
+        pending_emails(max_attempts)
+        .select_related('user')
+        .order_by('pk')[:batch_size]
+    )
+    if not notifications:
+        return 0, 0
+
+    connection = connection or get_connection()
+    sent, failed = [], []
+    try:
+        connection.open()
+    except (smtplib.SMTPException, OSError):
+        failed = notifications
+    else:
+        try:
+            for notification in notifications:
+                try:
+                    # 0 when the backend swallowed an error (fail_silently)
+                    delivered = connection.send_messages([build_email(notification, connection)])
+                except (smtplib.SMTPException, OSError):
+                    delivered = 0
+                if delivered == 1:
+                    sent.append(notification.pk)
+                else:
+                    failed.append(notification)
+                    connection.close()
+        finally:
+            connection.close()
+
+    if sent:
+        Notification.objects.filter(pk__in=sent).update(
+            emailed_at=timezone.now(),
+            email_attempts=F('email_attempts') + 1,
+        )
+    if failed:
+        by_attempts = defaultdict(list)
+        for notification in failed:
+            by_attempts[notification.email_attempts + 1].append(notification.pk)
+        now = timezone.now()
+        for attempts, pks in by_attempts.items():
+            Notification.objects.filter(pk__in=pks).update(
+                email_attempts=attempts,
+                next_attempt_at=now + retry_delay(attempts),
+            )
+    return len(sent), len(failed)
@@ -0,0 +1,61 @@
+"""
+Management command to move old finished appointments into the archive tables.
+Usage: python manage.py archive_appointments [--days 365] [--pause 0.1] [--dry-run]
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from apps.appointments.archive import archivable_appointments, archive_appointments, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Moves finished appointments older than the archive period, with their payments, to the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.APPOINTMENT_ARCHIVE_AFTER_DAYS,
+            help='Archive period in days (default: APPOINTMENT_ARCHIVE_AFTER_DAYS)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.APPOINTMENT_ARCHIVE_CHUNK_SIZE,
+            help='Appointments moved per transaction',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between chunks to give way to live traffic',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be archived',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        self.stdout.write(f'Finished appointments dated before {cutoff:%Y-%m-%d} are archived.')
+
+        if options['dry_run']:
+            summary = archivable_appointments(cutoff).aggregate(
+                oldest=Min('appointment_date'),
+                newest=Max('appointment_date'),
+            )
+            count = archivable_appointments(cutoff).count()
+            chunks = -(-count // options['chunk_size'])
+            self.stdout.write(f'{count} appointment(s) would be archived in {chunks} chunk(s).')
+            if count:
+                self.stdout.write(f"  Oldest: {summary['oldest']:%Y-%m-%d}  Newest: {summary['newest']:%Y-%m-%d}")
+            return
+
+        total = 0
+        for moved in archive_appointments(cutoff, chunk_size=options['chunk_size'], pause=options['pause']):
+            total += moved
+            self.stdout.write(f'  ... {total} archived', ending='\r')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {total} appointment(s) archived.'))
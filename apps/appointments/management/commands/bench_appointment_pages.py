@@ -0,0 +1,86 @@
+"""
+Management command to compare OFFSET and keyset pagination of appointments.
+Usage: python manage.py bench_appointment_pages [--rows 100000] [--page 10000]
+
+Seeds appointments inside a transaction that is rolled back, so no data is kept.
+"""
+import time
+from datetime import date, timedelta, time as clock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from apps.appointments.models import Appointment
+from apps.appointments.pagination import KEYSET_ORDERING, encode_cursor, paginate_keyset
+from apps.services.models import Service
+
+User = get_user_model()
+
+PER_PAGE = 10
+
+
+class Rollback(Exception):
+    pass
+
+
+def timed(func, repeat=20):
+    """Best wall time of ``repeat`` runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks page 1 against a deep page for OFFSET and keyset pagination'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--page', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        page_number = min(options['page'], options['rows'] // PER_PAGE)
+        try:
+            with transaction.atomic():
+                user = User.objects.create(username='__bench_pages__')
+                service = Service.objects.create(name='Benchmark', description='-', price=1)
+                start = date(2000, 1, 1)
+                # bulk_create skips Appointment.save(), so no rollups or notifications
+                Appointment.objects.bulk_create(
+                    (
+                        Appointment(
+                            user=user,
+                            service=service,
+                            appointment_date=start + timedelta(days=i // 16),
+                            appointment_time=clock(8 + (i % 16) // 2, 30 * (i % 2)),
+                        )
+                        for i in range(options['rows'])
+                    ),
+                    batch_size=2000,
+                )
+                queryset = (
+                    Appointment.objects.filter(user=user)
+                    .select_related('user', 'service')
+                    .order_by(*KEYSET_ORDERING)
+                )
+                paginator = Paginator(queryset, PER_PAGE)
+                before_deep = queryset[(page_number - 1) * PER_PAGE - 1]
+                cursor = encode_cursor(before_deep)
+
+                results = {
+                    'offset page 1': timed(lambda: list(paginator.page(1))),
+                    f'offset page {page_number}': timed(lambda: list(paginator.page(page_number))),
+                    'keyset page 1': timed(lambda: paginate_keyset(queryset, PER_PAGE)),
+                    f'keyset page {page_number}': timed(lambda: paginate_keyset(queryset, PER_PAGE, after=cursor)),
+                }
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f"{options['rows']} appointments, {PER_PAGE} per page:")
+        for label, ms in results.items():
+            self.stdout.write(f'  {label:<22} {ms:8.2f} ms')
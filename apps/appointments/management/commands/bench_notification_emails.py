@@ -0,0 +1,65 @@
+"""
+Management command to measure notification email throughput.
+Usage: python manage.py bench_notification_emails [--count 5000] [--batch-size 100]
+
+Runs inside a transaction that is rolled back, so no data is kept.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.appointments.mailer import send_notification_emails
+from apps.appointments.models import Notification
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks batched notification email delivery (messages per second)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=5000)
+        parser.add_argument('--batch-size', type=int, default=settings.NOTIFICATION_EMAIL_BATCH_SIZE)
+        parser.add_argument(
+            '--backend',
+            default='django.core.mail.backends.locmem.EmailBackend',
+            help='Email backend to send through',
+        )
+
+    def handle(self, *args, **options):
+        count = options['count']
+        try:
+            with transaction.atomic():
+                user = User.objects.create(username='__bench_mailer__', email='bench@example.com')
+                Notification.objects.bulk_create(
+                    [Notification(user=user, message=f'Benchmark message {i}') for i in range(count)],
+                    batch_size=500,
+                )
+
+                started = time.perf_counter()
+                delivered = 0
+                while True:
+                    sent, failed = send_notification_emails(
+                        batch_size=options['batch_size'],
+                        connection=get_connection(options['backend']),
+                    )
+                    delivered += sent
+                    if not sent and not failed:
+                        break
+                elapsed = time.perf_counter() - started
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {delivered} message(s) in {elapsed:.2f}s '
+            f'({delivered / elapsed:.0f} msg/s, batch size {options["batch_size"]})'
+        ))
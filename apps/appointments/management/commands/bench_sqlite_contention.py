@@ -0,0 +1,106 @@
+"""
+Management command to measure booking throughput with concurrent writers.
+Usage: python manage.py bench_sqlite_contention [--workers 8] [--bookings 200]
+
+Several processes book appointments against a scratch SQLite file, first
+with the stock configuration (a new connection per booking, DEFERRED
+transactions, rollback journal), then with SQLITE_PRAGMAS, BEGIN IMMEDIATE
+and one persistent connection per process. The project database is not
+touched.
+"""
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCHEMA = """
+CREATE TABLE booking (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    slot INTEGER NOT NULL,
+    worker INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX booking_slot_idx ON booking (slot);
+"""
+
+
+def connect(path, tuned):
+    # Python's sqlite3 default busy timeout is 5 seconds, as in Django
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    if tuned:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            conn.execute(f'PRAGMA {name}={value}')
+    return conn
+
+
+def book(conn, slot, worker, tuned):
+    """The shape of AppointmentForm's slot check followed by the insert."""
+    conn.execute('BEGIN IMMEDIATE' if tuned else 'BEGIN')
+    try:
+        conn.execute('SELECT COUNT(*) FROM booking WHERE slot = ?', (slot,)).fetchone()
+        conn.execute(
+            'INSERT INTO booking (slot, worker, created_at) VALUES (?, ?, ?)',
+            (slot, worker, time.time()),
+        )
+        conn.execute('COMMIT')
+    except sqlite3.OperationalError:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def run_worker(args):
+    path, worker, bookings, tuned = args
+    booked = locked = 0
+    conn = connect(path, tuned) if tuned else None
+    for i in range(bookings):
+        if not tuned:
+            conn = connect(path, tuned)
+        try:
+            book(conn, slot=i % 50, worker=worker, tuned=tuned)
+            booked += 1
+        except sqlite3.OperationalError:
+            locked += 1
+        if not tuned:
+            conn.close()
+    if tuned:
+        conn.close()
+    return booked, locked
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks concurrent bookings with the default and the tuned SQLite configuration'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--bookings', type=int, default=200, help='Bookings per worker')
+
+    def run(self, directory, tuned, workers, bookings):
+        path = os.path.join(directory, 'tuned.sqlite3' if tuned else 'default.sqlite3')
+        conn = connect(path, tuned)
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        started = time.perf_counter()
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(run_worker, [(path, w, bookings, tuned) for w in range(workers)])
+        elapsed = time.perf_counter() - started
+
+        booked = sum(r[0] for r in results)
+        locked = sum(r[1] for r in results)
+        label = 'tuned  ' if tuned else 'default'
+        self.stdout.write(
+            f'{label}  {booked:>6} booked  {locked:>6} "database is locked"  '
+            f'{elapsed:7.2f}s  {booked / elapsed:8.0f} bookings/s'
+        )
+
+    def handle(self, *args, **options):
+        workers, bookings = options['workers'], options['bookings']
+        self.stdout.write(f'{workers} workers x {bookings} bookings')
+        with tempfile.TemporaryDirectory() as directory:
+            self.run(directory, False, workers, bookings)
+            self.run(directory, True, workers, bookings)
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark finished'))
@@ -0,0 +1,76 @@
+"""
+Management command to delete or archive old read notifications.
+Usage: python manage.py compact_notifications [--days 90] [--archive] [--dry-run]
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from apps.appointments.retention import (
+    compact_notifications,
+    expired_notifications,
+    retention_cutoff,
+)
+
+
+class Command(BaseCommand):
+    help = 'Deletes or archives read notifications older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.NOTIFICATION_RETENTION_DAYS,
+            help='Retention period in days (default: NOTIFICATION_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.NOTIFICATION_COMPACTION_CHUNK_SIZE,
+            help='Rows deleted per transaction',
+        )
+        parser.add_argument(
+            '--archive',
+            action='store_true',
+            help='Copy rows into ArchivedNotification before deleting them',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between chunks to give way to live traffic',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be removed',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options['days'])
+        self.stdout.write(f'Read notifications created before {cutoff:%Y-%m-%d %H:%M} are expired.')
+
+        if options['dry_run']:
+            summary = expired_notifications(cutoff).aggregate(
+                oldest=Min('created_at'),
+                newest=Max('created_at'),
+            )
+            count = expired_notifications(cutoff).count()
+            chunks = -(-count // options['chunk_size'])
+            self.stdout.write(f'{count} notification(s) would be removed in {chunks} chunk(s).')
+            if count:
+                self.stdout.write(f"  Oldest: {summary['oldest']:%Y-%m-%d}  Newest: {summary['newest']:%Y-%m-%d}")
+            return
+
+        total = 0
+        for handled in compact_notifications(
+            cutoff,
+            chunk_size=options['chunk_size'],
+            archive=options['archive'],
+            pause=options['pause'],
+        ):
+            total += handled
+            self.stdout.write(f'  ... {total} removed', ending='\r')
+
+        action = 'archived' if options['archive'] else 'deleted'
+        self.stdout.write(self.style.SUCCESS(f'✓ {total} notification(s) {action}.'))
@@ -0,0 +1,22 @@
+"""
+Management command to rebuild the daily appointment rollups.
+Usage: python manage.py rebuild_rollups
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.appointments.models import AppointmentDailyRollup
+from apps.appointments.stats import invalidate_appointment_counts
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the per day/service/status appointment counters from scratch'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = AppointmentDailyRollup.objects.rebuild()
+        invalidate_appointment_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Rebuilt {rows} rollup row(s) in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,42 @@
+"""
+Management command to email pending notifications.
+Usage: python manage.py send_notification_emails [--batch-size 100] [--interval 30]
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.appointments.mailer import send_notification_emails
+
+
+class Command(BaseCommand):
+    help = 'Emails notifications in batches over a single mail connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.NOTIFICATION_EMAIL_BATCH_SIZE,
+            help='Messages sent per connection',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep running, polling every N seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Drain everything that is pending before sleeping, unless the
+            # mail server is failing
+            while True:
+                sent, failed = send_notification_emails(batch_size=options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent} email(s), {failed} failed.')
+                if failed or sent < options['batch_size']:
+                    break
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
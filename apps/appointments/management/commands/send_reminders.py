@@ -0,0 +1,47 @@
+"""
+Management command to send reminders for upcoming approved appointments.
+Usage: python manage.py send_reminders [--hours-ahead 24] [--interval 60] [--once]
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.appointments.reminders import ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = 'Runs the appointment reminder scheduler'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours-ahead',
+            type=int,
+            default=settings.APPOINTMENT_REMINDER_HOURS,
+            help='Send reminders this many hours before the appointment',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60,
+            help='Seconds between scheduler ticks',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send whatever is due now and exit',
+        )
+
+    def handle(self, *args, **options):
+        scheduler = ReminderScheduler(hours_ahead=options['hours_ahead'])
+        scheduler.load()
+        self.stdout.write(f'Loaded {len(scheduler)} upcoming reminder(s).')
+
+        while True:
+            sent = scheduler.run_due()
+            if sent:
+                self.stdout.write(self.style.SUCCESS(f'✓ {sent} reminder(s) sent.'))
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+            scheduler.refresh()
@@ -0,0 +1,39 @@
+"""
+Management command to expire stale pending appointments and payments.
+Usage: python manage.py sweep_stale [--interval 300]
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.appointments.sweeper import sweep
+
+
+class Command(BaseCommand):
+    help = 'Expires pending appointments that already started and abandoned payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.SWEEPER_BATCH_SIZE,
+            help='Rows updated per statement',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep running, sweeping every N seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            result = sweep(batch_size=options['batch_size'])
+            self.stdout.write(
+                f"Expired {result['appointments']} appointment(s) and "
+                f"{result['payments']} payment(s) in {result['duration_ms']:.1f} ms."
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,54 @@
+"""
+Management command to copy the primary SQLite database to its replicas.
+Usage: python manage.py sync_replicas [--interval 2]
+
+Stands in for real replication when trying the read-replica router locally.
+Each copy is a consistent snapshot taken with the SQLite online backup API,
+so it can run while the site is serving traffic.
+"""
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def copy_database(source, target):
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+    src.close()
+    dst.close()
+
+
+class Command(BaseCommand):
+    help = 'Copies the primary SQLite database to every alias in DATABASE_REPLICAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep running, copying every N seconds',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('DATABASE_REPLICAS is empty; there is nothing to sync.')
+
+        databases = settings.DATABASES
+        if any(databases[alias]['ENGINE'] != 'django.db.backends.sqlite3'
+               for alias in ['default', *settings.DATABASE_REPLICAS]):
+            raise CommandError('sync_replicas only works with SQLite databases.')
+
+        source = databases['default']['NAME']
+        while True:
+            started = time.perf_counter()
+            for alias in settings.DATABASE_REPLICAS:
+                copy_database(source, databases[alias]['NAME'])
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Synced {len(settings.DATABASE_REPLICAS)} replica(s) '
+                f'in {(time.perf_counter() - started) * 1000:.1f} ms'
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
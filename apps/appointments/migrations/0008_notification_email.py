@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:44
+
+from django.db import migrations, models
+
+
+def mark_existing_emailed(apps, schema_editor):
+    # Notifications from before email delivery were already seen in the app;
+    # emailing the whole backlog on the first run would spam every user
+    Notification = apps.get_model('appointments', 'Notification')
+    Notification.objects.filter(emailed_at__isnull=True).update(emailed_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_expired_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='email_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='emailed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_emailed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_rollups(apps, schema_editor):
+    Appointment = apps.get_model('appointments', 'Appointment')
+    AppointmentDailyRollup = apps.get_model('appointments', 'AppointmentDailyRollup')
+    rows = (
+        Appointment.objects.order_by()
+        .values('appointment_date', 'service_id', 'status')
+        .annotate(n=models.Count('pk'))
+    )
+    AppointmentDailyRollup.objects.bulk_create(
+        (
+            AppointmentDailyRollup(day=row['appointment_date'], service_id=row['service_id'],
+                                   status=row['status'], count=row['n'])
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0008_notification_email'),
+        ('services', '0009_alter_service_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('cancelled', 'Cancelled'), ('completed', 'Completed'), ('expired', 'Expired')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='services.service')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'service', 'status'), name='unique_appointment_rollup')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
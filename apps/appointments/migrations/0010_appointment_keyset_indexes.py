@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0009_appointmentdailyrollup'),
+        ('services', '0009_alter_service_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointment_date', 'appointment_time', 'id'], name='appointment_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['user', 'appointment_date', 'appointment_time', 'id'], name='appointment_user_keyset_idx'),
+        ),
+    ]
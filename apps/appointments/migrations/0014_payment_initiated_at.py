@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_created_at(apps, schema_editor):
+    Payment = apps.get_model('appointments', 'Payment')
+    Payment.objects.update(initiated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0013_notification_next_attempt_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payment_status_created_idx',
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='initiated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'initiated_at'], name='payment_status_initiated_idx'),
+        ),
+    ]
@@ -1,9 +1,13 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+from collections import Counter
 from datetime import datetime
 from apps.services.models import Service
 from django.contrib import messages
+from .signals import appointment_status_changed
 
 
 class Weekday(models.Model):
@@ -56,6 +60,7 @@ class Appointment(models.Model):
         ('rejected', 'Rejected'),
         ('cancelled', 'Cancelled'),
         ('completed', 'Completed'),
+        ('expired', 'Expired'),
     )
     
     user = models.ForeignKey(
@@ -86,20 +91,37 @@ class Appointment(models.Model):
         blank=True,
         help_text='Notes from admin (visible to user)'
     )
+    reminder_sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='When the upcoming-appointment reminder was sent'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         old_status = None
 
-        if not is_new:
-            old_status = Appointment.objects.get(pk=self.pk).status
-        super().save(*args, **kwargs)
+        old_key = None
+
+        with transaction.atomic():
+            if not is_new:
+                # Locked, so a concurrent status change cannot move the rollup
+                # out of a bucket this row already left
+                old = Appointment.objects.select_for_update().get(pk=self.pk)
+                old_status = old.status
+                old_key = (old.appointment_date, old.service_id, old.status)
+                # A rescheduled appointment needs a fresh reminder
+                if (old.appointment_date, old.appointment_time) != (self.appointment_date, self.appointment_time):
+                    self.reminder_sent_at = None
+            super().save(*args, **kwargs)
+            AppointmentDailyRollup.objects.move(old_key, (self.appointment_date, self.service_id, self.status))
 
         # Trigger notification only if status changed
         if not is_new and old_status != self.status:
             Notification.objects.create(user=self.user, message=f"Your appointment has been {self.status}.")
+            appointment_status_changed.send(sender=Appointment, appointment=self, old_status=old_status)
     
     def create_status_notification(self):
         messages = {
@@ -117,6 +139,20 @@ class Appointment(models.Model):
         ordering = ['-appointment_date', '-appointment_time']
         verbose_name = 'Appointment'
         verbose_name_plural = 'Appointments'
+        indexes = [
+            # Used by the sweeper to find pending appointments that already started
+            models.Index(fields=['status', 'appointment_date'], name='appointment_status_date_idx'),
+            # Keyset pagination of the appointment list (all / per user)
+            models.Index(fields=['appointment_date', 'appointment_time', 'id'], name='appointment_keyset_idx'),
+            models.Index(fields=['user', 'appointment_date', 'appointment_time', 'id'], name='appointment_user_keyset_idx'),
+            # Slot capacity check in AppointmentForm.clean
+            models.Index(
+                fields=['service', 'appointment_date', 'appointment_time', 'status'],
+                name='appointment_slot_idx',
+            ),
+            # Per-user status counts on the dashboard
+            models.Index(fields=['user', 'status'], name='appointment_user_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.service.name} on {self.appointment_date}"
@@ -131,6 +167,8 @@ class Appointment(models.Model):
             if appointment_datetime < datetime.now():
                 raise ValidationError('Cannot book appointments in the past.')
     
+    is_archived = False
+
     @property
     def status_color(self):
         """Return color class based on status."""
@@ -140,10 +178,116 @@ class Appointment(models.Model):
             'rejected': 'danger',
             'cancelled': 'secondary',
             'completed': 'info',
+            'expired': 'secondary',
         }
         return colors.get(self.status, 'secondary')
 
 
+class AppointmentRollupManager(models.Manager):
+
+    def adjust(self, day, service_id, status, delta):
+        """Add ``delta`` to one (day, service, status) counter."""
+        counter = self.filter(day=day, service_id=service_id, status=status)
+        if counter.update(count=F('count') + delta) or delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                self.create(day=day, service_id=service_id, status=status, count=delta)
+        except IntegrityError:
+            # Created concurrently; add to the existing row instead
+            counter.update(count=F('count') + delta)
+
+    def move(self, old_key, new_key):
+        """Move one appointment from the ``old_key`` counter to ``new_key``."""
+        if old_key == new_key:
+            return
+        if old_key is not None:
+            self.adjust(*old_key, -1)
+        if new_key is not None:
+            self.adjust(*new_key, 1)
+
+    def move_groups(self, groups, new_status):
+        """
+        Apply a bulk status change.
+
+        ``groups`` holds ``appointment_date``, ``service_id``, ``status`` and
+        ``n`` (the number of appointments moved) for each affected counter.
+        """
+        for group in groups:
+            if group['status'] == new_status:
+                continue
+            self.adjust(group['appointment_date'], group['service_id'], group['status'], -group['n'])
+            self.adjust(group['appointment_date'], group['service_id'], new_status, group['n'])
+
+    def rebuild(self):
+        """
+        Recompute every counter from the appointment tables. Archived
+        appointments are still counted.
+        """
+        with transaction.atomic():
+            self.all().delete()
+            counts = Counter()
+            for model in (Appointment, ArchivedAppointment):
+                rows = (
+                    model.objects.order_by()
+                    .values_list('appointment_date', 'service_id', 'status')
+                    .annotate(n=models.Count('pk'))
+                )
+                for day, service_id, status, n in rows.iterator():
+                    counts[day, service_id, status] += n
+            self.bulk_create(
+                (
+                    self.model(day=day, service_id=service_id, status=status, count=n)
+                    for (day, service_id, status), n in counts.items()
+                ),
+                batch_size=1000,
+            )
+        return self.count()
+
+    def status_totals(self, start=None, end=None):
+        """Appointment count per status, optionally for a range of days."""
+        queryset = self.all()
+        if start:
+            queryset = queryset.filter(day__gte=start)
+        if end:
+            queryset = queryset.filter(day__lte=end)
+        return dict(queryset.order_by().values_list('status').annotate(total=Sum('count')))
+
+    def daily_counts(self, start, end, service=None):
+        """Rows of (day, status, total) between ``start`` and ``end``."""
+        queryset = self.filter(day__gte=start, day__lte=end)
+        if service is not None:
+            queryset = queryset.filter(service=service)
+        return (
+            queryset.order_by('day', 'status')
+            .values_list('day', 'status')
+            .annotate(total=Sum('count'))
+        )
+
+
+class AppointmentDailyRollup(models.Model):
+    """Number of appointments per day, service and status, kept current on writes."""
+
+    day = models.DateField()
+    service = models.ForeignKey(
+        Service,
+        on_delete=models.CASCADE,
+        related_name='daily_rollups'
+    )
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    objects = AppointmentRollupManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'service', 'status'], name='unique_appointment_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.service_id} {self.status}: {self.count}"
+
+
 class Notification(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -152,11 +296,40 @@ class Notification(models.Model):
     )
     message = models.TextField()
     is_read = models.BooleanField(default=False)
+    emailed_at = models.DateTimeField(null=True, blank=True)
+    email_attempts = models.PositiveSmallIntegerField(default=0)
+    # Set after a failed email; not retried before then
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Unread notifications on the dashboard
+            models.Index(fields=['user', '-created_at'], condition=models.Q(is_read=False), name='notification_user_unread_idx'),
+            # Retention job
+            models.Index(fields=['created_at'], condition=models.Q(is_read=True), name='notification_read_idx'),
+        ]
+
     def __str__(self):
         return f"Notification for {self.user}"
-    
+
+
+class ArchivedNotification(models.Model):
+    """Read notifications moved out of the hot table by the retention job."""
+
+    original_id = models.BigIntegerField(unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_notifications'
+    )
+    message = models.TextField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived notification for {self.user}"
+
 
 class Payment(models.Model):
 
@@ -168,6 +341,7 @@ class Payment(models.Model):
         PENDING = "pending", "Pending"
         SUCCESS = "success", "Success"
         FAILED = "failed", "Failed"
+        EXPIRED = "expired", "Expired"
 
     appointment = models.OneToOneField(
         Appointment,
@@ -195,7 +369,82 @@ class Payment(models.Model):
 
     paid_at = models.DateTimeField(null=True, blank=True)
 
+    # When the current checkout was started; reset when an expired payment
+    # is started again, so the sweeper's TTL counts from there
+    initiated_at = models.DateTimeField(default=timezone.now)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Used by the sweeper to find abandoned checkouts
+            models.Index(fields=['status', 'initiated_at'], name='payment_status_initiated_idx'),
+            # Khalti callback lookup
+            models.Index(fields=['pidx'], condition=models.Q(pidx__isnull=False), name='payment_pidx_idx'),
+        ]
+
+    def __str__(self):
+        return f"Appointment {self.appointment.id} - {self.status}"
+
+
+class ArchivedAppointment(models.Model):
+    """
+    Past appointments in a final status, moved out of Appointment by the
+    archiver. Rows keep their original primary key, so keyset cursors stay
+    unique across both tables.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_appointments'
+    )
+    service = models.ForeignKey(
+        Service,
+        on_delete=models.CASCADE,
+        related_name='archived_appointments'
+    )
+    appointment_date = models.DateField()
+    appointment_time = models.TimeField()
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    notes = models.TextField(blank=True)
+    admin_notes = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    is_archived = True
+    status_color = Appointment.status_color
+
+    class Meta:
+        ordering = ['-appointment_date', '-appointment_time']
+        indexes = [
+            models.Index(fields=['appointment_date', 'appointment_time', 'id'], name='archived_appt_keyset_idx'),
+            models.Index(fields=['user', 'appointment_date', 'appointment_time', 'id'], name='archived_appt_user_keyset_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.service.name} on {self.appointment_date} (archived)"
+
+
+class ArchivedPayment(models.Model):
+    """Payment of an archived appointment."""
+
+    id = models.BigIntegerField(primary_key=True)
+    appointment = models.OneToOneField(
+        ArchivedAppointment,
+        on_delete=models.CASCADE,
+        related_name="payment",
+    )
+    method = models.CharField(max_length=20, choices=Payment.Method.choices)
+    status = models.CharField(max_length=20, choices=Payment.Status.choices)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    transaction_id = models.CharField(max_length=100, null=True, blank=True)
+    pidx = models.CharField(max_length=100, null=True, blank=True)
+    paid_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
     def __str__(self):
-        return f"Appointment {self.appointment.id} - {self.status}"
\ No newline at end of file
+        return f"Archived appointment {self.appointment_id} - {self.status}"
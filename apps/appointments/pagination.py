@@ -0,0 +1,117 @@
+"""
+Keyset (cursor) pagination for appointment listings.
+
+Pages are addressed by the (appointment_date, appointment_time, id) of the
+row they start after, so every page is an index range scan of
+``per_page + 1`` rows no matter how deep it is, unlike OFFSET pagination
+which has to walk past every earlier row.
+"""
+import base64
+import heapq
+from datetime import date, time
+from itertools import islice
+
+from django.db.models import Q
+
+KEYSET_ORDERING = ('-appointment_date', '-appointment_time', '-id')
+
+
+def encode_cursor(appointment):
+    raw = f"{appointment.appointment_date.isoformat()}|{appointment.appointment_time.isoformat()}|{appointment.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """Return the (date, time, id) key in ``value``, or None if it is not a valid cursor."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        day, at, pk = raw.split('|')
+        return date.fromisoformat(day), time.fromisoformat(at), int(pk)
+    except ValueError:
+        return None
+
+
+def _older_than(key):
+    day, at, pk = key
+    # The leading range on appointment_date lets the database seek the index
+    return Q(appointment_date__lte=day) & (
+        Q(appointment_date__lt=day) |
+        Q(appointment_time__lt=at) |
+        Q(appointment_time=at, id__lt=pk)
+    )
+
+
+def _newer_than(key):
+    day, at, pk = key
+    return Q(appointment_date__gte=day) & (
+        Q(appointment_date__gt=day) |
+        Q(appointment_time__gt=at) |
+        Q(appointment_time=at, id__gt=pk)
+    )
+
+
+class KeysetPage:
+    """One page of appointments, newest first, with cursors to its neighbours."""
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self.has_next else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self.has_previous else None
+
+
+def _sort_key(appointment):
+    return appointment.appointment_date, appointment.appointment_time, appointment.pk
+
+
+def paginate_keyset(queryset, per_page, after=None, before=None):
+    """
+    Return the KeysetPage following the ``after`` cursor, or preceding the
+    ``before`` cursor, or the first page when neither is given.
+
+    ``queryset`` may also be a list of querysets over tables with the same
+    keyset columns and disjoint ids (live and archived appointments). Each
+    one is read with its own ``per_page + 1`` index range and the results
+    are merged.
+    """
+    querysets = queryset if isinstance(queryset, (list, tuple)) else [queryset]
+    after, before = decode_cursor(after), decode_cursor(before)
+
+    if before:
+        rows = list(islice(heapq.merge(
+            *(
+                qs.filter(_newer_than(before))
+                .order_by('appointment_date', 'appointment_time', 'id')[:per_page + 1]
+                for qs in querysets
+            ),
+            key=_sort_key,
+        ), per_page + 1))
+        has_previous = len(rows) > per_page
+        return KeysetPage(rows[:per_page][::-1], has_next=True, has_previous=has_previous)
+
+    if after:
+        querysets = [qs.filter(_older_than(after)) for qs in querysets]
+    rows = list(islice(heapq.merge(
+        *(qs.order_by(*KEYSET_ORDERING)[:per_page + 1] for qs in querysets),
+        key=_sort_key,
+        reverse=True,
+    ), per_page + 1))
+    return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=after is not None)
@@ -0,0 +1,154 @@
+"""
+Reminder scheduler for upcoming approved appointments.
+
+Appointments due for a reminder are kept in a min-heap ordered by the
+time the reminder should fire. The heap is loaded once for a rolling
+horizon and then kept current by `refresh()`, which only reads rows whose
+`updated_at` moved since the previous refresh. Each scan starts ``overlap``
+before the previous one ran, so a change whose transaction committed just
+after that scan is still seen. Entries that are cancelled or rescheduled
+are dropped lazily when they reach the top of the heap.
+"""
+import heapq
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Appointment, Notification
+
+
+class NotificationChannel:
+    """Deliver reminders as in-app Notification rows."""
+
+    def send(self, appointments):
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=appointment.user_id,
+                message=(
+                    f"Reminder: your appointment for {appointment.service.name} is on "
+                    f"{appointment.appointment_date:%b %d} at {appointment.appointment_time:%I:%M %p}."
+                ),
+            )
+            for appointment in appointments
+        ])
+
+
+def get_channel():
+    """Instantiate the channel configured in APPOINTMENT_REMINDER_CHANNEL."""
+    return import_string(settings.APPOINTMENT_REMINDER_CHANNEL)()
+
+
+def appointment_start(appointment_date, appointment_time):
+    """Aware datetime at which an appointment starts."""
+    return timezone.make_aware(datetime.combine(appointment_date, appointment_time))
+
+
+class ReminderScheduler:
+    """Min-heap of pending reminders with incremental refresh."""
+
+    def __init__(self, hours_ahead=None, horizon=timedelta(hours=6), channel=None, overlap=timedelta(minutes=1)):
+        if hours_ahead is None:
+            hours_ahead = settings.APPOINTMENT_REMINDER_HOURS
+        self.lead = timedelta(hours=hours_ahead)
+        self.horizon = horizon
+        self.overlap = overlap
+        self.channel = channel or get_channel()
+        self._heap = []
+        self._entries = {}  # appointment pk -> fire time of its live heap entry
+        self._loaded_until = None
+        self._watermark = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _candidates():
+        return Appointment.objects.filter(status='approved', reminder_sent_at__isnull=True)
+
+    def _window_end(self, now):
+        return now + self.lead + self.horizon
+
+    def _push(self, pk, appointment_date, appointment_time, now):
+        start = appointment_start(appointment_date, appointment_time)
+        if start <= now or start > self._loaded_until:
+            self._entries.pop(pk, None)
+            return
+        fire_at = start - self.lead
+        if self._entries.get(pk) != fire_at:
+            self._entries[pk] = fire_at
+            heapq.heappush(self._heap, (fire_at, pk))
+
+    def _load_range(self, start, end, now):
+        rows = (
+            self._candidates()
+            .filter(appointment_date__gte=start.date(), appointment_date__lte=end.date())
+            .values_list('pk', 'appointment_date', 'appointment_time')
+            .iterator()
+        )
+        for pk, appointment_date, appointment_time in rows:
+            self._push(pk, appointment_date, appointment_time, now)
+
+    def load(self, now=None):
+        """Load every reminder that fires within the horizon."""
+        now = now or timezone.now()
+        self._heap, self._entries = [], {}
+        self._watermark = now - self.overlap
+        self._loaded_until = self._window_end(now)
+        self._load_range(now, self._loaded_until, now)
+
+    def refresh(self, now=None):
+        """Pick up appointment changes and slide the horizon forward."""
+        now = now or timezone.now()
+        if self._loaded_until is None:
+            return self.load(now)
+
+        window_end = self._window_end(now)
+        if window_end > self._loaded_until:
+            previous_end = self._loaded_until
+            self._loaded_until = window_end
+            self._load_range(previous_end, window_end, now)
+
+        changed = (
+            Appointment.objects
+            .filter(updated_at__gte=self._watermark)
+            .values_list('pk', 'status', 'reminder_sent_at', 'appointment_date', 'appointment_time')
+        )
+        # Rows seen twice are pushed or dropped again, which is a no-op
+        self._watermark = now - self.overlap
+        for pk, status, sent_at, appointment_date, appointment_time in changed:
+            if status == 'approved' and sent_at is None:
+                self._push(pk, appointment_date, appointment_time, now)
+            else:
+                self._entries.pop(pk, None)
+
+    def pop_due(self, now=None):
+        """Remove and return the pks of reminders whose fire time has passed."""
+        now = now or timezone.now()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, pk = heapq.heappop(self._heap)
+            if self._entries.get(pk) == fire_at:
+                del self._entries[pk]
+                due.append(pk)
+        return due
+
+    def run_due(self, now=None):
+        """Send every due reminder through the channel. Returns the count sent."""
+        now = now or timezone.now()
+        due = self.pop_due(now)
+        if not due:
+            return 0
+
+        appointments = list(
+            self._candidates()
+            .filter(pk__in=due)
+            .select_related('service')
+        )
+        if not appointments:
+            return 0
+
+        self.channel.send(appointments)
+        Appointment.objects.filter(pk__in=[a.pk for a in appointments]).update(reminder_sent_at=now)
+        return len(appointments)
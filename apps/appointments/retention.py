@@ -0,0 +1,71 @@
+"""
+Retention policy for read notifications.
+
+Old read notifications are removed (or moved to ArchivedNotification)
+in small chunks, oldest first. Each chunk runs in its own short
+transaction so SQLite write locks are released between chunks and the
+job can run alongside normal traffic.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedNotification, Notification
+
+
+def retention_cutoff(days=None):
+    """Return the datetime before which read notifications expire."""
+    if days is None:
+        days = settings.NOTIFICATION_RETENTION_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def expired_notifications(cutoff):
+    """Queryset of read notifications created before ``cutoff``."""
+    return Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+
+def compact_notifications(cutoff, chunk_size=None, archive=False, pause=0):
+    """
+    Delete (or archive) expired notifications chunk by chunk.
+
+    Yields the number of rows handled by each chunk so callers can
+    report progress. Stops when a chunk comes back empty.
+    """
+    if chunk_size is None:
+        chunk_size = settings.NOTIFICATION_COMPACTION_CHUNK_SIZE
+
+    while True:
+        with transaction.atomic():
+            # Handled rows are deleted, so each chunk is simply the oldest remaining
+            rows = list(
+                expired_notifications(cutoff)
+                .order_by('created_at')
+                .values('pk', 'user_id', 'message', 'created_at')[:chunk_size]
+            )
+            if not rows:
+                return
+
+            pks = [row['pk'] for row in rows]
+            if archive:
+                ArchivedNotification.objects.bulk_create(
+                    [
+                        ArchivedNotification(
+                            original_id=row['pk'],
+                            user_id=row['user_id'],
+                            message=row['message'],
+                            created_at=row['created_at'],
+                        )
+                        for row in rows
+                    ],
+                    ignore_conflicts=True,
+                )
+            Notification.objects.filter(pk__in=pks).delete()
+
+        yield len(pks)
+
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,35 @@
+"""
+Signals sent by the appointments app.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.dispatch import Signal
+
+# Sent after an appointment's status changes.
+# Provides ``appointment`` and ``old_status``.
+appointment_status_changed = Signal()
+
+# Sent after a payment has been verified with the gateway.
+# Provides ``payment``.
+payment_completed = Signal()
+
+_archiving = ContextVar('archiving', default=False)
+
+
+@contextmanager
+def archiving():
+    """
+    Appointments deleted inside this block were copied to the archive, not
+    removed: the daily rollups keep counting them, and the per-row cache
+    receivers skip them because the archiver invalidates once per chunk.
+    """
+    token = _archiving.set(True)
+    try:
+        yield
+    finally:
+        _archiving.reset(token)
+
+
+def is_archiving():
+    return _archiving.get()
@@ -0,0 +1,135 @@
+"""
+Cached statistics for the user and admin dashboards.
+
+Per-user status counts come from a single conditional-aggregation query;
+global counts are summed from AppointmentDailyRollup, so they cost
+O(days) rather than O(appointments). Both are cached and the entries are
+dropped whenever an appointment is saved or deleted, and by the bulk paths
+(admin actions, sweeper) through `invalidate_appointment_counts()`.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.services.models import Service
+from apps.webhooks.delivery import appointment_status_data, enqueue_many
+from apps.webhooks.models import WebhookEndpoint
+
+from .agenda import invalidate_service_agendas
+from .models import Appointment, AppointmentDailyRollup
+from .signals import is_archiving
+
+DASHBOARD_STATUSES = ('pending', 'approved', 'rejected')
+
+GLOBAL_COUNTS_KEY = 'dashboard:appointment_counts:all'
+SITE_COUNTS_KEY = 'dashboard:site_counts'
+
+
+def user_counts_key(user_id):
+    return f'dashboard:appointment_counts:user:{user_id}'
+
+
+def count_by_status(queryset):
+    """Total and per-status counts for ``queryset`` in one query."""
+    return queryset.aggregate(
+        total=Count('pk'),
+        **{
+            status: Count('pk', filter=Q(status=status))
+            for status in DASHBOARD_STATUSES
+        }
+    )
+
+
+def count_from_rollups(start=None, end=None):
+    """Total and per-status counts summed from the daily rollups."""
+    totals = AppointmentDailyRollup.objects.status_totals(start, end)
+    counts = {status: totals.get(status, 0) for status in DASHBOARD_STATUSES}
+    counts['total'] = sum(totals.values())
+    return counts
+
+
+def appointment_counts(user=None):
+    """Status counts for one user's appointments, or for all of them."""
+    if user is None:
+        key, compute = GLOBAL_COUNTS_KEY, count_from_rollups
+    else:
+        key = user_counts_key(user.pk)
+        compute = partial(count_by_status, Appointment.objects.filter(user=user))
+    return cache.get_or_set(key, compute, settings.DASHBOARD_STATS_CACHE_TIMEOUT)
+
+
+def site_counts():
+    """Number of patients and active services."""
+    User = get_user_model()
+    return cache.get_or_set(
+        SITE_COUNTS_KEY,
+        lambda: {
+            'users': User.objects.filter(role='user').count(),
+            'services': Service.objects.filter(is_active=True).count(),
+        },
+        settings.DASHBOARD_STATS_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_appointment_counts(user_ids=()):
+    """Drop the global counts and the counts of the given users."""
+    cache.delete_many([GLOBAL_COUNTS_KEY] + [user_counts_key(pk) for pk in set(user_ids)])
+
+
+def bulk_set_status(queryset, status):
+    """
+    ``queryset.update(status=...)`` that keeps rollups and caches current
+    and queues a webhook for every appointment whose status it changed.
+
+    Returns the number of appointments updated.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        changed = list(queryset.exclude(status=status).select_for_update(of=('self',)).order_by('pk'))
+        user_ids = list(queryset.order_by().values_list('user_id', flat=True).distinct())
+        groups = list(
+            queryset.order_by()
+            .values('appointment_date', 'service_id', 'status')
+            .annotate(n=Count('pk'))
+        )
+        updated = queryset.update(status=status, updated_at=now)
+        AppointmentDailyRollup.objects.move_groups(groups, status)
+        events = []
+        for appointment in changed:
+            old_status = appointment.status
+            appointment.status, appointment.updated_at = status, now
+            events.append(appointment_status_data(appointment, old_status))
+        enqueue_many(WebhookEndpoint.EVENT_APPOINTMENT_STATUS_CHANGED, events)
+    invalidate_appointment_counts(user_ids)
+    invalidate_service_agendas(group['service_id'] for group in groups)
+    return updated
+
+
+@receiver(post_save, sender=Appointment)
+def appointment_saved(sender, instance, **kwargs):
+    invalidate_appointment_counts([instance.user_id])
+
+
+@receiver(post_delete, sender=Appointment)
+def appointment_deleted(sender, instance, **kwargs):
+    if is_archiving():
+        return
+    AppointmentDailyRollup.objects.adjust(
+        instance.appointment_date, instance.service_id, instance.status, -1
+    )
+    invalidate_appointment_counts([instance.user_id])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def site_changed(sender, **kwargs):
+    cache.delete(SITE_COUNTS_KEY)
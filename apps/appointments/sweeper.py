@@ -0,0 +1,141 @@
+"""
+Sweeper that expires stale pending appointments and payments.
+
+Pending appointments whose start time has passed, and pending Khalti
+checkouts started more than PAYMENT_PENDING_TTL_MINUTES ago, are moved to
+the ``expired`` status with batched ``UPDATE ... WHERE pk IN (...)``
+statements. Each batch is locked with ``SELECT ... FOR UPDATE``, and only
+the rows the update actually changed get a notification, a rollup move and
+a queued webhook, all in the batch's transaction.
+"""
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.webhooks.delivery import appointment_status_data, enqueue_many
+from apps.webhooks.models import WebhookEndpoint
+
+from .agenda import invalidate_service_agendas
+from .models import Appointment, AppointmentDailyRollup, Notification, Payment
+from .stats import invalidate_appointment_counts
+
+
+def stale_appointments(now):
+    """Pending appointments that should already have started."""
+    local_now = timezone.localtime(now)
+    return Appointment.objects.filter(status='pending').filter(
+        Q(appointment_date__lt=local_now.date()) |
+        Q(appointment_date=local_now.date(), appointment_time__lte=local_now.time())
+    )
+
+
+def stale_payments(now):
+    """Pending payments whose checkout was started longer than the TTL ago."""
+    cutoff = now - timedelta(minutes=settings.PAYMENT_PENDING_TTL_MINUTES)
+    return Payment.objects.filter(status=Payment.Status.PENDING, initiated_at__lt=cutoff)
+
+
+def _expire_in_batches(queryset, pending_status, changes, build_notification, after_batch, batch_size):
+    """
+    Apply ``changes`` to ``queryset`` batch by batch.
+
+    ``build_notification`` turns each expired row into a Notification and
+    ``after_batch`` runs inside the batch transaction once it is updated.
+    """
+    model = queryset.model
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.select_for_update(of=('self',)).order_by('pk')[:batch_size])
+            if not rows:
+                return total
+
+            pks = [row.pk for row in rows]
+            updated = model.objects.filter(pk__in=pks, status=pending_status).update(**changes)
+            if updated != len(rows):
+                # Without row locks (SQLite) another writer can still move a
+                # row between the select and the update; keep only ours
+                expired = set(
+                    model.objects.filter(pk__in=pks, status=changes['status']).values_list('pk', flat=True)
+                )
+                rows = [row for row in rows if row.pk in expired]
+            for row in rows:
+                for field, value in changes.items():
+                    setattr(row, field, value)
+
+            Notification.objects.bulk_create([build_notification(row) for row in rows])
+            after_batch(rows)
+        total += len(rows)
+
+
+def _appointments_expired(rows):
+    groups = Counter((row.appointment_date, row.service_id) for row in rows)
+    AppointmentDailyRollup.objects.move_groups(
+        [
+            {'appointment_date': day, 'service_id': service_id, 'status': 'pending', 'n': n}
+            for (day, service_id), n in groups.items()
+        ],
+        'expired',
+    )
+    enqueue_many(
+        WebhookEndpoint.EVENT_APPOINTMENT_STATUS_CHANGED,
+        [appointment_status_data(row, 'pending') for row in rows],
+    )
+    transaction.on_commit(lambda: invalidate_appointment_counts(row.user_id for row in rows))
+    transaction.on_commit(lambda: invalidate_service_agendas(service_id for _, service_id in groups))
+
+
+def expire_stale_appointments(now=None, batch_size=None):
+    """Expire pending appointments that were never approved in time."""
+    now = now or timezone.now()
+    return _expire_in_batches(
+        stale_appointments(now).select_related('service'),
+        'pending',
+        {'status': 'expired', 'updated_at': now},
+        lambda row: Notification(
+            user_id=row.user_id,
+            message=(
+                f"Your appointment request for {row.service.name} on "
+                f"{row.appointment_date:%b %d} expired before it could be approved."
+            ),
+        ),
+        _appointments_expired,
+        batch_size or settings.SWEEPER_BATCH_SIZE,
+    )
+
+
+def expire_stale_payments(now=None, batch_size=None):
+    """Expire abandoned Khalti checkouts so they can be started again."""
+    now = now or timezone.now()
+    return _expire_in_batches(
+        stale_payments(now).select_related('appointment__service'),
+        Payment.Status.PENDING,
+        {'status': Payment.Status.EXPIRED},
+        lambda row: Notification(
+            user_id=row.appointment.user_id,
+            message=(
+                f"Your payment for {row.appointment.service.name} was not completed "
+                f"and has expired. You can start it again from your dashboard."
+            ),
+        ),
+        lambda rows: None,
+        batch_size or settings.SWEEPER_BATCH_SIZE,
+    )
+
+
+def sweep(now=None, batch_size=None):
+    """Run one sweep and report what it touched."""
+    started = time.perf_counter()
+    now = now or timezone.now()
+    appointments = expire_stale_appointments(now, batch_size)
+    payments = expire_stale_payments(now, batch_size)
+    return {
+        'appointments': appointments,
+        'payments': payments,
+        'duration_ms': (time.perf_counter() - started) * 1000,
+    }
@@ -1,3 +1,477 @@
+from datetime import timedelta
+
+from unittest import mock, skipUnless
+
+import requests
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import connection
+from django.db.models import QuerySet
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.services.models import Service
+
+from .archive import archive_appointments, archive_cutoff
+from .forms import AppointmentForm
+
+from .mailer import send_notification_emails
+from .models import (
+    Appointment, AppointmentDailyRollup, ArchivedAppointment, ArchivedNotification, Notification, Payment,
+    TimeSlot, Weekday,
+)
+from .reminders import ReminderScheduler
+from .retention import compact_notifications, expired_notifications, retention_cutoff
+from .stats import bulk_set_status, count_by_status
+from .sweeper import stale_appointments, stale_payments, sweep
+
+User = get_user_model()
+
+
+class NotificationRetentionTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='patient', password='pass')
+        old = timezone.now() - timedelta(days=120)
+        for i in range(7):
+            Notification.objects.create(user=self.user, message=f'old {i}', is_read=True)
+        Notification.objects.create(user=self.user, message='old unread')
+        Notification.objects.update(created_at=old)
+        Notification.objects.create(user=self.user, message='recent', is_read=True)
+
+    def test_deletes_expired_read_notifications_in_chunks(self):
+        chunks = list(compact_notifications(retention_cutoff(90), chunk_size=3))
+
+        self.assertEqual(chunks, [3, 3, 1])
+        self.assertQuerySetEqual(
+            Notification.objects.order_by('message').values_list('message', flat=True),
+            ['old unread', 'recent'],
+        )
+        self.assertFalse(ArchivedNotification.objects.exists())
+
+    def test_archive_keeps_a_copy(self):
+        list(compact_notifications(retention_cutoff(90), chunk_size=5, archive=True))
+
+        self.assertEqual(ArchivedNotification.objects.count(), 7)
+        self.assertEqual(Notification.objects.count(), 2)
+
+
+class ReminderSchedulerTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='patient', password='pass')
+        self.service = Service.objects.create(name='Checkup', description='x', price=100)
+        self.now = timezone.now()
+
+    def book(self, hours_from_now, status='approved'):
+        start = timezone.localtime(self.now + timedelta(hours=hours_from_now))
+        return Appointment.objects.create(
+            user=self.user,
+            service=self.service,
+            appointment_date=start.date(),
+            appointment_time=start.time(),
+            status=status,
+        )
+
+    def test_fires_reminders_in_order_once(self):
+        soon = self.book(3)
+        self.book(10)
+        self.book(3, status='pending')
+        scheduler = ReminderScheduler(hours_ahead=2, horizon=timedelta(hours=12))
+        scheduler.load(self.now)
+
+        self.assertEqual(len(scheduler), 2)
+        self.assertEqual(scheduler.run_due(self.now), 0)
+        self.assertEqual(scheduler.run_due(self.now + timedelta(hours=1)), 1)
+        self.assertEqual(scheduler.run_due(self.now + timedelta(hours=1)), 0)
+
+        soon.refresh_from_db()
+        self.assertIsNotNone(soon.reminder_sent_at)
+        self.assertEqual(Notification.objects.filter(message__startswith='Reminder').count(), 1)
+
+    def test_refresh_applies_changes_incrementally(self):
+        appointment = self.book(5, status='pending')
+        scheduler = ReminderScheduler(hours_ahead=2, horizon=timedelta(hours=12))
+        scheduler.load(self.now)
+        self.assertEqual(len(scheduler), 0)
+
+        appointment.status = 'approved'
+        appointment.save()
+        scheduler.refresh(self.now)
+        self.assertEqual(len(scheduler), 1)
+
+        appointment.status = 'cancelled'
+        appointment.save()
+        scheduler.refresh(self.now)
+        self.assertEqual(scheduler.run_due(self.now + timedelta(hours=4)), 0)
+
+    def test_refresh_sees_changes_committed_after_the_previous_scan(self):
+        appointment = self.book(5, status='pending')
+        scheduler = ReminderScheduler(hours_ahead=2, horizon=timedelta(hours=12))
+        scheduler.load(self.now)
+
+        # Saved just before the load ran, committed just after it
+        Appointment.objects.filter(pk=appointment.pk).update(
+            status='approved', updated_at=self.now - timedelta(seconds=30),
+        )
+        scheduler.refresh(self.now + timedelta(minutes=5))
+        self.assertEqual(len(scheduler), 1)
+
+
+class SweeperTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='patient', password='pass')
+        self.service = Service.objects.create(name='Checkup', description='x', price=100)
+        today = timezone.localdate()
+        self.stale = [
+            Appointment.objects.create(
+                user=self.user, service=self.service,
+                appointment_date=today - timedelta(days=d), appointment_time='09:00',
+            )
+            for d in (1, 2, 3)
+        ]
+        self.upcoming = Appointment.objects.create(
+            user=self.user, service=self.service,
+            appointment_date=today + timedelta(days=2), appointment_time='09:00',
+        )
+        self.payment = Payment.objects.create(appointment=self.upcoming, amount=100)
+        started = timezone.now() - timedelta(hours=3)
+        Payment.objects.filter(pk=self.payment.pk).update(created_at=started, initiated_at=started)
+
+    def test_expires_stale_rows_in_batches(self):
+        # Per batch: select, update, bulk insert (+ savepoint/release),
+        # then one rollup move per (day, service) group in the batch and the
+        # webhook endpoints for the appointment batches
+        with self.assertNumQueries(38):
+            result = sweep(batch_size=2)
+
+        self.assertEqual(result['appointments'], 3)
+        self.assertEqual(result['payments'], 1)
+        self.assertEqual(Appointment.objects.filter(status='expired').count(), 3)
+        self.upcoming.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.upcoming.status, 'pending')
+        self.assertEqual(self.payment.status, Payment.Status.EXPIRED)
+        self.assertEqual(Notification.objects.filter(message__contains='expired').count(), 4)
+
+    def test_second_sweep_is_a_no_op(self):
+        sweep()
+        self.assertEqual(sweep()['appointments'], 0)
+
+    def test_rows_changed_meanwhile_are_left_alone(self):
+        approved = self.stale[0]
+        real_update = QuerySet.update
+
+        def approve_first(queryset, **kwargs):
+            # Another request approves the appointment after the sweeper selected it
+            if queryset.model is Appointment and kwargs.get('status') == 'expired':
+                Appointment.objects.filter(pk=approved.pk).update(status='approved')
+            return real_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', approve_first):
+            self.assertEqual(sweep()['appointments'], 2)
+        approved.refresh_from_db()
+        self.assertEqual(approved.status, 'approved')
+        self.assertEqual(Notification.objects.filter(message__contains='request for').count(), 2)
+
+    def complete_payment(self):
+        Payment.objects.filter(pk=self.payment.pk).update(pidx='abc')
+        self.client.force_login(self.user)
+        lookup = mock.Mock(**{'json.return_value': {
+            'status': 'Completed', 'total_amount': 10000, 'transaction_id': 't1',
+        }})
+        with mock.patch('apps.appointments.views.requests.post', return_value=lookup):
+            self.client.get(reverse('khalti_payment_response'), {'pidx': 'abc'})
+        self.payment.refresh_from_db()
+        self.upcoming.refresh_from_db()
+
+    def test_completed_payment_approves_the_appointment(self):
+        self.complete_payment()
+        self.assertEqual(self.payment.status, Payment.Status.SUCCESS)
+        self.assertEqual(self.upcoming.status, 'approved')
+
+    def test_payment_completed_after_expiry_is_not_finalized(self):
+        sweep()
+        self.complete_payment()
+        self.upcoming.refresh_from_db()
+        self.assertEqual((self.payment.status, self.payment.transaction_id), (Payment.Status.EXPIRED, 't1'))
+        self.assertEqual(self.upcoming.status, 'pending')
+
+    def test_restarted_payment_gets_a_fresh_ttl(self):
+        sweep()
+        self.client.force_login(self.user)
+        with mock.patch('apps.appointments.views.requests.post', side_effect=requests.RequestException):
+            self.client.get(reverse('khalti_payment', args=[self.upcoming.pk]))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.Status.PENDING)
+        self.assertEqual(sweep()['payments'], 0)
+
+
+class NotificationEmailTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='patient', email='patient@example.com', password='pass')
+        no_email = User.objects.create_user(username='walkin', password='pass')
+        for i in range(3):
+            Notification.objects.create(user=self.user, message=f'update {i}')
+        Notification.objects.create(user=no_email, message='not emailed')
+
+    def test_sends_batch_and_marks_notifications(self):
+        self.assertEqual(send_notification_emails(batch_size=2), (2, 0))
+        self.assertEqual(send_notification_emails(batch_size=2), (1, 0))
+        self.assertEqual(send_notification_emails(batch_size=2), (0, 0))
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ['patient@example.com'])
+        self.assertEqual(Notification.objects.filter(emailed_at__isnull=True).count(), 1)
+
+    def test_failed_messages_are_retried_until_max_attempts(self):
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=OSError,
+        ), self.settings(NOTIFICATION_EMAIL_RETRY_DELAY=0):
+            self.assertEqual(send_notification_emails(max_attempts=2), (0, 3))
+            self.assertEqual(send_notification_emails(max_attempts=2), (0, 3))
+            self.assertEqual(send_notification_emails(max_attempts=2), (0, 0))
+
+        self.assertEqual(send_notification_emails(max_attempts=3), (3, 0))
+
+    def test_unreachable_server_fails_the_batch(self):
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.open',
+            side_effect=ConnectionRefusedError,
+        ):
+            self.assertEqual(send_notification_emails(), (0, 3))
+        self.assertEqual(Notification.objects.filter(next_attempt_at__isnull=False).count(), 3)
+
+    def test_silently_dropped_messages_are_not_marked_sent(self):
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', return_value=0):
+            self.assertEqual(send_notification_emails(), (0, 3))
+        self.assertFalse(Notification.objects.filter(emailed_at__isnull=False).exists())
+
+    def test_failed_messages_back_off(self):
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=OSError,
+        ):
+            self.assertEqual(send_notification_emails(), (0, 3))
+            self.assertEqual(send_notification_emails(), (0, 0))
+
+            later = timezone.now() + timedelta(seconds=61)
+            with mock.patch('django.utils.timezone.now', return_value=later):
+                self.assertEqual(send_notification_emails(), (0, 3))
+                # Second failure waits twice as long
+                self.assertEqual(send_notification_emails(), (0, 0))
+
+        notification = Notification.objects.exclude(user__email='').first()
+        self.assertEqual(notification.email_attempts, 2)
+        self.assertEqual(notification.next_attempt_at, later + timedelta(seconds=120))
+
+
+class DailyRollupTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='patient', password='pass')
+        self.service = Service.objects.create(name='Checkup', description='x', price=100)
+        self.day = timezone.localdate() + timedelta(days=1)
+
+    def book(self, **kwargs):
+        return Appointment.objects.create(
+            user=self.user, service=self.service,
+            appointment_date=self.day, appointment_time='09:00', **kwargs
+        )
+
+    def assertRollupsMatch(self):
+        live = AppointmentDailyRollup.objects.status_totals()
+        AppointmentDailyRollup.objects.rebuild()
+        # Incremental counters may leave zero rows behind; a rebuild does not
+        self.assertEqual(
+            {status: n for status, n in live.items() if n},
+            AppointmentDailyRollup.objects.status_totals(),
+        )
+
+    def test_counters_follow_writes(self):
+        first = self.book()
+        self.book()
+        self.book(status='approved')
+        self.assertEqual(AppointmentDailyRollup.objects.status_totals(), {'pending': 2, 'approved': 1})
+
+        first.status = 'rejected'
+        first.save()
+        first.appointment_date = self.day + timedelta(days=1)
+        first.save()
+        self.assertEqual(
+            list(AppointmentDailyRollup.objects.daily_counts(self.day, self.day + timedelta(days=1))),
+            [(self.day, 'approved', 1), (self.day, 'pending', 1), (self.day, 'rejected', 0),
+             (first.appointment_date, 'rejected', 1)],
+        )
+
+        first.delete()
+        self.assertRollupsMatch()
+
+    def test_bulk_status_change(self):
+        for _ in range(3):
+            self.book()
+        bulk_set_status(Appointment.objects.all(), 'approved')
+        self.assertEqual(AppointmentDailyRollup.objects.status_totals(), {'pending': 0, 'approved': 3})
+        self.assertRollupsMatch()
+
+
+class AppointmentListPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='patient', password='pass')
+        cls.admin = User.objects.create_user(username='boss', password='pass', role='admin')
+        services = [Service.objects.create(name=f'S{i}', description='x', price=100) for i in range(5)]
+        day = timezone.localdate() + timedelta(days=1)
+        Appointment.objects.bulk_create([
+            Appointment(
+                user=cls.user, service=services[i % 5],
+                appointment_date=day + timedelta(days=i // 4), appointment_time=f'{9 + i % 2}:00',
+            )
+            for i in range(25)
+        ])
+        cls.expected = list(
+            Appointment.objects.order_by('-appointment_date', '-appointment_time', '-id')
+            .values_list('pk', flat=True)
+        )
+
+    def test_walks_pages_forward_and_back(self):
+        self.client.force_login(self.user)
+        url = reverse('appointment_list')
+        seen, pages, params = [], [], {}
+        while True:
+            page = self.client.get(url, params).context['page_obj']
+            pages.append([a.pk for a in page])
+            seen += pages[-1]
+            if not page.has_next:
+                break
+            params = {'after': page.next_cursor}
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(p) for p in pages], [10, 10, 5])
+
+        previous = self.client.get(url, {'before': page.previous_cursor}).context['page_obj']
+        self.assertEqual([a.pk for a in previous], pages[1])
+
+    def test_admin_list_has_no_n_plus_one(self):
+        self.client.force_login(self.admin)
+        # session, user, one page of appointments with user and service,
+        # plus the session save (SESSION_SAVE_EVERY_REQUEST)
+        with self.assertNumQueries(6):
+            self.client.get(reverse('appointment_list'))
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='patient', password='pass')
+        self.service = Service.objects.create(name='Checkup', description='x', price=100)
+        old = timezone.localdate() - timedelta(days=400)
+        self.completed = self.book(old, 'completed')
+        Payment.objects.create(appointment=self.completed, amount=100, status=Payment.Status.SUCCESS, pidx='p1')
+        self.rejected = self.book(old + timedelta(days=1), 'rejected')
+        self.book(old, 'pending')
+        self.book(timezone.localdate() - timedelta(days=10), 'completed')
+
+    def book(self, day, status):
+        return Appointment.objects.create(
+            user=self.user, service=self.service,
+            appointment_date=day, appointment_time='10:00', status=status,
+        )
+
+    def test_moves_appointments_and_payments(self):
+        totals = AppointmentDailyRollup.objects.status_totals()
+
+        chunks = list(archive_appointments(archive_cutoff(365), chunk_size=1))
+
+        self.assertEqual(chunks, [1, 1])
+        self.assertEqual(Appointment.objects.count(), 2)
+        self.assertFalse(Payment.objects.exists())
+        archived = ArchivedAppointment.objects.get(pk=self.completed.pk)
+        self.assertEqual(archived.status, 'completed')
+        self.assertEqual(archived.payment.pidx, 'p1')
+        # Archived appointments still count towards the dashboard totals
+        self.assertEqual(AppointmentDailyRollup.objects.status_totals(), totals)
+        AppointmentDailyRollup.objects.rebuild()
+        self.assertEqual(AppointmentDailyRollup.objects.status_totals(), totals)
+
+    def test_list_can_include_archived(self):
+        list(archive_appointments(archive_cutoff(365)))
+        self.client.force_login(self.user)
+        url = reverse('appointment_list')
+
+        live = self.client.get(url).context['appointments']
+        self.assertEqual(len(live), 2)
+
+        with self.assertNumQueries(7):
+            merged = self.client.get(url, {'include_archived': '1'}).context['appointments']
+        self.assertEqual(len(merged), 4)
+        self.assertEqual([a.is_archived for a in merged], [False, True, False, True])
+
+        response = self.client.get(url, {'include_archived': '1', 'status': 'rejected'})
+        self.assertEqual([a.pk for a in response.context['appointments']], [self.rejected.pk])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked on SQLite')
+class QueryPlanTests(TestCase):
+    """Hot queries must be answered from an index, never a full table scan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='patient', password='pass')
+        cls.service = Service.objects.create(name='Checkup', description='x', price=100)
+
+    def assertNoFullScan(self, func, table=None):
+        """Run ``func`` and EXPLAIN every SELECT it issued (optionally only those on ``table``)."""
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        selects = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT') and (table is None or f'FROM "{table}"' in q['sql'])
+        ]
+        self.assertTrue(selects)
+        with connection.cursor() as cursor:
+            for sql in selects:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+                scans = [step for step in plan if step.startswith('SCAN') and 'USING' not in step]
+                self.assertFalse(scans, f'Full scan in {plan} for:\n{sql}')
+
+    def test_slot_capacity_check(self):
+        day = timezone.localdate() + timedelta(days=7)
+        slot = TimeSlot.objects.create(service=self.service, start_time='09:00', end_time='17:00')
+        slot.day_of_week.add(Weekday.objects.create(day=day.weekday()))
+        form = AppointmentForm(data={
+            'service': self.service.pk, 'appointment_date': day, 'appointment_time': '10:00',
+        })
+        self.assertNoFullScan(form.is_valid, table='appointments_appointment')
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_dashboard_counts(self):
+        self.assertNoFullScan(lambda: count_by_status(Appointment.objects.filter(user=self.user)))
+
+    def test_unread_notifications(self):
+        self.assertNoFullScan(lambda: list(
+            Notification.objects.filter(user=self.user, is_read=False).order_by('-created_at')
+        ))
+
+    def test_retention_and_sweeper(self):
+        self.assertNoFullScan(lambda: list(expired_notifications(retention_cutoff()).values('pk')[:500]))
+        self.assertNoFullScan(lambda: list(stale_appointments(timezone.now()).values('pk')[:500]))
+        self.assertNoFullScan(lambda: list(stale_payments(timezone.now()).values('pk')[:500]))
+
+    def test_payment_pidx_lookup(self):
+        self.assertNoFullScan(
+            lambda: Payment.objects.select_related('appointment').filter(pidx='abc').first()
+        )
 
-# Create your tests here.
+    def test_active_services(self):
+        self.assertNoFullScan(lambda: list(Service.objects.filter(is_active=True).order_by('name')))
+        self.assertNoFullScan(lambda: list(
+            Service.objects.filter(is_active=True, category='mental_health').order_by('name')
+        ))
@@ -9,13 +9,16 @@ from django.views.generic import ListView, CreateView, UpdateView, DeleteView, D
 from django.urls import reverse_lazy, reverse
 from django.utils.decorators import method_decorator
 from django.http import JsonResponse, HttpResponse
-from .models import Appointment, Payment
+from .models import Appointment, ArchivedAppointment, Payment
 from .forms import AppointmentForm
+from .pagination import KEYSET_ORDERING, paginate_keyset
+from .signals import payment_completed
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.conf import settings
 import requests
 from django.db import transaction
 from django.utils import timezone
+from django.utils.http import urlencode
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.pagesizes import A4
@@ -42,29 +45,59 @@ class AppointmentCreateView(CreateView):
 
 
 class AppointmentListView(LoginRequiredMixin, ListView):
-    """View for listing user's appointments with filtering."""
+    """View for listing user's appointments with filtering.
+
+    Uses keyset pagination (``?after=`` / ``?before=`` cursors) so deep
+    pages cost the same as the first one. With ``?include_archived=1`` the
+    archived appointments are merged into the list.
+    """
     
     model = Appointment
     template_name = 'appointments/appointment_list.html'
     context_object_name = 'appointments'
     paginate_by = 10
     
-    def get_queryset(self):
+    @property
+    def include_archived(self):
+        return self.request.GET.get('include_archived') == '1'
+    
+    def filter_appointments(self, queryset):
         if self.request.user.is_admin_user:
-            queryset = Appointment.objects.all()
+            queryset = queryset.select_related('user', 'service')
         else:
-            queryset = Appointment.objects.filter(user=self.request.user)
+            queryset = queryset.filter(user=self.request.user).select_related('service')
         
         # Filter by status from URL parameter
         status = self.request.GET.get('status', '')
         if status:
             queryset = queryset.filter(status=status)
         
-        return queryset.order_by('-appointment_date', '-appointment_time')
+        return queryset.order_by(*KEYSET_ORDERING)
+    
+    def get_queryset(self):
+        return self.filter_appointments(Appointment.objects.all())
+    
+    def paginate_queryset(self, queryset, page_size):
+        querysets = [queryset]
+        if self.include_archived:
+            querysets.append(self.filter_appointments(ArchivedAppointment.objects.all()))
+        page = paginate_keyset(
+            querysets,
+            page_size,
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        return None, page, page.object_list, page.has_other_pages()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['selected_status'] = self.request.GET.get('status', '')
+        context['include_archived'] = self.include_archived
+        # Filters carried over by the pagination links
+        context['filter_query'] = urlencode({
+            key: value for key, value in self.request.GET.items()
+            if key in ('status', 'include_archived') and value
+        })
         return context
 
 
@@ -175,6 +208,12 @@ def khalti_payment(request, appointment_id):
         }
     )
 
+    # An expired checkout can be started again, with a fresh TTL
+    if payment.status == Payment.Status.EXPIRED:
+        payment.status = Payment.Status.PENDING
+        payment.initiated_at = timezone.now()
+        payment.save(update_fields=["status", "initiated_at"])
+
     # Prevent re-initiation if already processed
     if not created and payment.status != Payment.Status.PENDING:
         messages.warning(request, "Payment already processed.")
@@ -223,7 +262,8 @@ def khalti_payment(request, appointment_id):
         return redirect("user_dashboard")
 
     payment.pidx = pidx
-    payment.save(update_fields=["pidx"])
+    payment.initiated_at = timezone.now()
+    payment.save(update_fields=["pidx", "initiated_at"])
 
     return redirect(payment_url)
 
@@ -294,21 +334,36 @@ def khalti_payment_response(request):
     # Finalize
     try:
         with transaction.atomic():
+            # The sweeper may have expired the checkout, and released the
+            # slot, while the patient was paying
+            payment = Payment.objects.select_for_update().get(pk=payment.pk)
+            appointment = Appointment.objects.select_for_update().get(pk=payment.appointment_id)
+            finalized = payment.status == Payment.Status.PENDING and appointment.status == "pending"
 
             payment.transaction_id = transaction_id
-            payment.status = Payment.Status.SUCCESS
-            payment.paid_at = timezone.now()
-            payment.save(update_fields=["transaction_id", "status", "paid_at"])
-
-            # 🔥 IMPORTANT: Update appointment
-            appointment = payment.appointment
-            appointment.status = "approved"  # or confirmed
-            appointment.save(update_fields=["status"])
+            if finalized:
+                payment.status = Payment.Status.SUCCESS
+                payment.paid_at = timezone.now()
+                payment.save(update_fields=["transaction_id", "status", "paid_at"])
+
+                # 🔥 IMPORTANT: Update appointment
+                appointment.status = "approved"  # or confirmed
+                # updated_at too, or the reminder scheduler never sees the change
+                appointment.save(update_fields=["status", "updated_at"])
+            else:
+                # Kept so the payment can be traced for a refund
+                payment.save(update_fields=["transaction_id"])
 
     except Exception:
         messages.error(request, "Something went wrong.")
         return redirect("user_dashboard")
 
+    if not finalized:
+        messages.error(request, "Your checkout expired before the payment was confirmed. Please contact us for a refund.")
+        return redirect("user_dashboard")
+
+    payment_completed.send(sender=Payment, payment=payment)
+
     # ✅ THIS IS YOUR TASK REQUIREMENT
     messages.success(request, "Payment successful. Appointment confirmed.")
     print("Payment object:", payment)
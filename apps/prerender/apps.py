@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class PrerenderConfig(AppConfig):
+    name = 'apps.prerender'
+
+    def ready(self):
+        from . import pages  # noqa: F401
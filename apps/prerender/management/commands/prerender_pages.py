@@ -0,0 +1,23 @@
+"""
+Management command to pre-render every public catalog page.
+Usage: python manage.py prerender_pages
+
+Run after deploying (templates may have changed) and after services or
+doctors are written with bulk_create() or update(), which skip the signals
+that render changed pages again.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.prerender.pages import brotli, prerender_all
+
+
+class Command(BaseCommand):
+    help = 'Renders the home, service and doctor pages to static files for anonymous visitors'
+
+    def handle(self, *args, **options):
+        count = prerender_all()
+        encodings = 'gzip and brotli' if brotli is not None else 'gzip'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {count} pages rendered to {settings.PRERENDER_ROOT} (with {encodings}).'
+        ))
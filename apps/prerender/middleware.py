@@ -0,0 +1,59 @@
+"""
+Serve the pre-rendered catalog pages (see pages.py) to anonymous visitors.
+"""
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.messages.storage.session import SessionStorage
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .pages import ENCODINGS, is_page, page_path
+
+
+def accepted_encodings(request):
+    return {
+        part.split(';')[0].strip().lower()
+        for part in request.headers.get('Accept-Encoding', '').split(',')
+    }
+
+
+class PrerenderedPageMiddleware:
+    """
+    Answers anonymous GET requests for pre-rendered pages from their files,
+    in the best encoding the client accepts, without running the view.
+
+    Place it last, after AuthenticationMiddleware and MessageMiddleware;
+    visitors with messages waiting get the live page, which shows them.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.serve(request) or self.get_response(request)
+
+    def serve(self, request):
+        if not settings.PRERENDER_PAGES or request.method not in ('GET', 'HEAD') or request.GET:
+            return None
+        if request.user.is_authenticated:
+            return None
+        if CookieStorage.cookie_name in request.COOKIES or request.session.get(SessionStorage.session_key):
+            return None
+        if not is_page(request.path_info):
+            return None
+
+        path = page_path(request.path_info)
+        accepted = accepted_encodings(request)
+        for encoding, suffix in (*ENCODINGS, (None, '')):
+            if encoding is not None and encoding not in accepted:
+                continue
+            try:
+                content = path.with_name(path.name + suffix).read_bytes()
+            except FileNotFoundError:
+                continue
+            response = HttpResponse(content, content_type='text/html; charset=utf-8')
+            if encoding:
+                response['Content-Encoding'] = encoding
+            patch_vary_headers(response, ('Accept-Encoding', 'Cookie'))
+            return response
+        return None
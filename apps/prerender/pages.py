@@ -0,0 +1,174 @@
+"""
+Static pre-rendering of the public catalog pages.
+
+The home page, the unfiltered service list, each active service's detail
+page and each doctor's profile look the same to every anonymous visitor.
+They are rendered to ``index.html`` files under PRERENDER_ROOT, with gzip
+and, when the ``brotli`` package is installed, brotli copies next to them.
+PrerenderedPageMiddleware serves those files to anonymous GET requests
+without running the view.
+
+Once a transaction that changed a service, a doctor or a row on a doctor's
+profile commits, the pages showing that row are rendered again and no
+others. ``manage.py prerender_pages`` renders every page.
+"""
+import gzip
+import os
+import tempfile
+from functools import partial
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import Http404, HttpRequest
+from django.urls import Resolver404, resolve, reverse
+
+from apps.services.models import Doctor, Education, Experience, Language, Service
+from apps.services.signals import doctor_user_changed, service_doctor_ids
+
+# URL names of the pre-rendered pages
+PAGE_NAMES = {'home', 'service_list', 'service_detail', 'doctor_profile'}
+
+# (Content-Encoding, file suffix), best first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def is_page(url):
+    try:
+        return resolve(url).url_name in PAGE_NAMES
+    except Resolver404:
+        return False
+
+
+def page_path(url):
+    """The file holding the page at ``url``; its encodings add a suffix."""
+    return Path(settings.PRERENDER_ROOT, *url.strip('/').split('/'), 'index.html')
+
+
+def page_urls():
+    """The URL of every page to pre-render."""
+    urls = [reverse('home'), reverse('service_list')]
+    urls += [reverse('service_detail', args=[pk]) for pk in Service.objects.filter(is_active=True).values_list('pk', flat=True)]
+    urls += [reverse('doctor_profile', args=[pk]) for pk in Doctor.objects.values_list('pk', flat=True)]
+    return urls
+
+
+def render_page(url):
+    """The page at ``url`` as an anonymous visitor sees it, or None if it has none."""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = url
+    request.user = AnonymousUser()
+    match = resolve(url)
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+    except Http404:
+        return None
+    if hasattr(response, 'render'):
+        response.render()
+    return response.content if response.status_code == 200 else None
+
+
+def _write(path, data):
+    # Written aside and renamed, so a request never reads half a page
+    fd, temp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as file:
+        file.write(data)
+    os.replace(temp, path)
+
+
+def write_page(url, content):
+    path = page_path(url)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _write(path, content)
+    _write(path.with_name(path.name + '.gz'), gzip.compress(content, compresslevel=9, mtime=0))
+    br = path.with_name(path.name + '.br')
+    if brotli is not None:
+        _write(br, brotli.compress(content))
+    else:
+        br.unlink(missing_ok=True)
+
+
+def remove_page(url):
+    path = page_path(url)
+    for suffix in ('', '.gz', '.br'):
+        path.with_name(path.name + suffix).unlink(missing_ok=True)
+
+
+def prerender(urls):
+    """Render the pages at ``urls`` again; pages that no longer exist are removed."""
+    for url in urls:
+        try:
+            content = render_page(url)
+        except Exception:
+            # Better rendered live than served stale
+            remove_page(url)
+            raise
+        if content is None:
+            remove_page(url)
+        else:
+            write_page(url, content)
+
+
+def prerender_all():
+    """Render every page and remove the files of pages that are gone; returns how many were written."""
+    urls = page_urls()
+    prerender(urls)
+    kept = {page_path(url) for url in urls}
+    for path in Path(settings.PRERENDER_ROOT).rglob('index.html'):
+        if path not in kept:
+            remove_page('/' + path.parent.relative_to(settings.PRERENDER_ROOT).as_posix() + '/')
+    return len(urls)
+
+
+def invalidate_pages(urls):
+    """Render the pages at ``urls`` again once the transaction commits."""
+    if settings.PRERENDER_PAGES:
+        # robust: a page that fails to render is removed and served live;
+        # the change that triggered it has committed either way
+        transaction.on_commit(partial(prerender, sorted(set(urls))), robust=True)
+
+
+def doctor_pages(doctor_ids):
+    return [reverse('doctor_profile', args=[pk]) for pk in doctor_ids if pk is not None]
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def service_changed(sender, instance, **kwargs):
+    invalidate_pages([
+        reverse('service_list'),
+        reverse('service_detail', args=[instance.pk]),
+        *doctor_pages(service_doctor_ids(instance)),
+    ])
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def doctor_changed(sender, instance, **kwargs):
+    invalidate_pages(doctor_pages([instance.pk]))
+
+
+@receiver(post_save, sender=Education)
+@receiver(post_delete, sender=Education)
+@receiver(post_save, sender=Experience)
+@receiver(post_delete, sender=Experience)
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Language)
+@receiver(post_save, sender='reviews.Review')
+@receiver(post_delete, sender='reviews.Review')
+def doctor_row_changed(sender, instance, **kwargs):
+    invalidate_pages(doctor_pages([instance.doctor_id]))
+
+
+@receiver(doctor_user_changed)
+def doctor_user_saved(sender, doctors, **kwargs):
+    invalidate_pages(doctor_pages(doctor.pk for doctor in doctors))
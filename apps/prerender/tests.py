@@ -0,0 +1,108 @@
+import gzip
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.accounts.models import User
+from apps.services.models import Doctor, Language, Service
+
+from .pages import page_path, prerender_all
+
+
+class PrerenderTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='dr', first_name='Anita', role='doctor')
+        cls.doctor = Doctor.objects.create(user=user, specialization='Cardiology')
+        cls.ecg = Service.objects.create(name='ECG', description='x', price=100, doctor=cls.doctor)
+        cls.scan = Service.objects.create(name='Bone Scan', description='x', price=200)
+        cls.retired = Service.objects.create(name='Retired', description='x', price=100, is_active=False)
+        cls.patient = User.objects.create_user(username='patient', password='pass')
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings = override_settings(PRERENDER_PAGES=True, PRERENDER_ROOT=root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        prerender_all()
+
+    def page(self, url, suffix=''):
+        path = page_path(url)
+        return path.with_name(path.name + suffix)
+
+    def test_renders_every_public_page(self):
+        for url in (
+            reverse('home'),
+            reverse('service_list'),
+            reverse('service_detail', args=[self.ecg.pk]),
+            reverse('doctor_profile', args=[self.doctor.pk]),
+        ):
+            html = self.page(url).read_bytes()
+            self.assertIn(b'Login', html, url)
+            self.assertEqual(gzip.decompress(self.page(url, '.gz').read_bytes()), html)
+        self.assertFalse(self.page(reverse('service_detail', args=[self.retired.pk])).exists())
+
+    def test_anonymous_visitors_get_the_file(self):
+        url = reverse('service_detail', args=[self.ecg.pk])
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn(b'ECG', gzip.decompress(response.content))
+
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIsNone(response.context)
+        self.assertContains(response, 'ECG')
+
+    def test_others_get_the_live_page(self):
+        url = reverse('service_list')
+        self.assertIsNotNone(self.client.get(url, {'category': 'other'}).context)
+
+        self.client.cookies[CookieStorage.cookie_name] = 'pending'
+        self.assertIsNotNone(self.client.get(url).context)
+        del self.client.cookies[CookieStorage.cookie_name]
+
+        self.client.force_login(self.patient)
+        response = self.client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertNotContains(response, 'href="/accounts/login/"')
+
+    def test_changes_render_only_the_affected_pages(self):
+        scan_page = self.page(reverse('service_detail', args=[self.scan.pk]))
+        scan_page.write_bytes(b'untouched')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ecg.name = 'Resting ECG'
+            self.ecg.save()
+        self.assertIn(b'Resting ECG', self.page(reverse('service_detail', args=[self.ecg.pk])).read_bytes())
+        self.assertIn(b'Resting ECG', self.page(reverse('service_list')).read_bytes())
+        self.assertIn(b'Resting ECG', self.page(reverse('doctor_profile', args=[self.doctor.pk])).read_bytes())
+        self.assertEqual(scan_page.read_bytes(), b'untouched')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Language.objects.create(doctor=self.doctor, name='Maithili')
+        self.assertIn(b'Maithili', self.page(reverse('doctor_profile', args=[self.doctor.pk])).read_bytes())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ecg.is_active = False
+            self.ecg.save()
+        self.assertFalse(self.page(reverse('service_detail', args=[self.ecg.pk])).exists())
+        self.assertFalse(self.page(reverse('service_detail', args=[self.ecg.pk]), '.gz').exists())
+
+    def test_command_removes_pages_that_are_gone(self):
+        url = reverse('service_detail', args=[self.scan.pk])
+        Service.objects.filter(pk=self.scan.pk).update(is_active=False)
+        out = StringIO()
+        call_command('prerender_pages', stdout=out)
+        self.assertIn('4 pages rendered', out.getvalue())
+        self.assertFalse(self.page(url).exists())
@@ -4,11 +4,12 @@ Admin configuration for Service model with image preview.
 from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
+from config.admin_tools import PrefixSearchMixin
 from .models import Service, Doctor, Education, Experience, Language
 
 
 @admin.register(Service)
-class ServiceAdmin(admin.ModelAdmin):
+class ServiceAdmin(PrefixSearchMixin, admin.ModelAdmin):
     """Admin interface for Service model with image preview."""
 
     list_display = (
@@ -22,8 +23,10 @@ class ServiceAdmin(admin.ModelAdmin):
         'created_at'
     )
     list_filter = ('is_active', 'category', 'created_at')
-    search_fields = ('name', 'description', 'doctor_user_first_name')
+    search_fields = ('^name', '^doctor__user__first_name', '^doctor__user__last_name')
     list_editable = ('is_active',)
+    # Doctor.__str__ uses the doctor's user
+    list_select_related = ('doctor__user',)
     ordering = ('category', 'name')
     readonly_fields = ('created_at', 'updated_at', 'image_preview_large')
 
@@ -82,21 +85,26 @@ class ServiceAdmin(admin.ModelAdmin):
     image_preview_large.short_description = 'Current Image Preview'
 
 @admin.register(Doctor)
-class DoctorAdmin(admin.ModelAdmin):
+class DoctorAdmin(PrefixSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'specialization')
+    list_select_related = ('user',)
+    search_fields = ('^user__first_name', '^user__last_name', '^specialization')
 
 @admin.register(Education)
-class EducationAdmin(admin.ModelAdmin):
+class EducationAdmin(PrefixSearchMixin, admin.ModelAdmin):
     list_display = ('doctor', 'degree', 'institution', 'year')
-    search_fields = ('doctor__user__first_name', 'doctor__user__last_name')
+    list_select_related = ('doctor__user',)
+    search_fields = ('^doctor__user__first_name', '^doctor__user__last_name')
 
 
 @admin.register(Experience)
 class ExperienceAdmin(admin.ModelAdmin):
     list_display = ('doctor', 'position', 'hospital', 'start_year', 'end_year')
+    list_select_related = ('doctor__user',)
 
 
 @admin.register(Language)
 class LanguageAdmin(admin.ModelAdmin):
     list_display = ('doctor', 'name')
+    list_select_related = ('doctor__user',)
     
\ No newline at end of file
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ServicesConfig(AppConfig):
     name = 'apps.services'
+
+    def ready(self):
+        from . import autocomplete, cards, facets, search, signals  # noqa: F401
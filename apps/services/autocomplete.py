@@ -0,0 +1,302 @@
+"""
+Type-ahead suggestions and typo-tolerant matching from in-memory indexes.
+
+Every worker keeps a sorted array of (key, ...) tuples, one for each word
+start of each suggestion, so "sha" finds "Dr. Anita Sharma". A lookup is a
+bisect to the first key at or after the prefix and a scan while keys still
+start with it, with no database or cache round trip. The same suggestions
+also feed a TrigramIndex (see trigrams.py) for fuzzy search.
+
+The indexes are built when the worker starts (see config/wsgi.py), or on
+the first lookup. Service and doctor changes are applied to it incrementally in
+the worker that made them, once the transaction commits, and bump a shared
+version in the cache. Other workers check that version every
+AUTOCOMPLETE_VERSION_CHECK_SECONDS and rebuild when it has moved.
+"""
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import namedtuple
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.db.models import Case, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .models import Doctor, Service
+from .search import search_terms
+from .signals import doctor_user_changed
+from .trigrams import TrigramIndex
+
+VERSION_KEY = 'autocomplete:version'
+
+# A suggestion; ``owner`` is the (model, pk) it came from, so it can be
+# replaced when that row changes
+Suggestion = namedtuple('Suggestion', 'owner kind label url')
+
+
+def normalize(text):
+    """Lower-case ``text`` and strip accents and punctuation."""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char if char.isalnum() else ' ' for char in text if not unicodedata.combining(char))
+    return ' '.join(text.split())
+
+
+def word_starts(text):
+    """``text`` from each of its words on: 'anita sharma' -> 'anita sharma', 'sharma'."""
+    words = normalize(text).split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class PrefixIndex:
+    """Sorted array of suggestion keys; see the module docstring."""
+
+    def __init__(self, suggestions=()):
+        self._owners = {}
+        items = []
+        for suggestion in suggestions:
+            items.extend(self._track(suggestion))
+        items.sort()
+        self._items = items
+
+    def __len__(self):
+        return len(self._items)
+
+    def _track(self, suggestion):
+        items = [
+            (key, suggestion.kind, suggestion.label, suggestion.url, suggestion.owner)
+            for key in word_starts(suggestion.label)
+        ]
+        self._owners.setdefault(suggestion.owner, []).extend(items)
+        return items
+
+    def search(self, query, limit=10):
+        """Suggestions with a word starting with ``query``, in key order."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        items = self._items
+        results = []
+        seen = set()
+        for i in range(bisect_left(items, (prefix,)), len(items)):
+            key, kind, label, url, owner = items[i]
+            if not key.startswith(prefix):
+                break
+            # Doctors sharing a specialization give one suggestion
+            if (kind, label) in seen:
+                continue
+            seen.add((kind, label))
+            results.append({'kind': kind, 'label': label, 'url': url})
+            if len(results) == limit:
+                break
+        return results
+
+    def replace(self, owner, suggestions):
+        """Swap the suggestions of ``owner`` for ``suggestions``."""
+        # Copy on write: a lookup running in another thread keeps scanning
+        # the old array
+        items = list(self._items)
+        for item in self._owners.pop(owner, []):
+            i = bisect_left(items, item)
+            if i < len(items) and items[i] == item:
+                del items[i]
+        for suggestion in suggestions:
+            for item in self._track(suggestion):
+                insort(items, item)
+        self._items = items
+
+
+def service_suggestions(service):
+    if not service.is_active:
+        return []
+    return [Suggestion(('service', service.pk), 'service', service.name, reverse('service_detail', args=[service.pk]))]
+
+
+def doctor_suggestions(doctor):
+    owner = ('doctor', doctor.pk)
+    suggestions = [Suggestion(owner, 'doctor', str(doctor), reverse('doctor_profile', args=[doctor.pk]))]
+    if doctor.specialization:
+        url = f"{reverse('doctor_list')}?{urlencode({'search': doctor.specialization})}"
+        suggestions.append(Suggestion(owner, 'specialization', doctor.specialization, url))
+    return suggestions
+
+
+def category_suggestions():
+    return [
+        Suggestion(('category', value), 'category', label, f"{reverse('service_list')}?{urlencode({'category': value})}")
+        for value, label in Service.CATEGORY_CHOICES
+    ]
+
+
+def trigram_entries(suggestions):
+    """(owner, words) for a TrigramIndex; categories are not searched."""
+    return [
+        (suggestion.owner, search_terms(normalize(suggestion.label)))
+        for suggestion in suggestions
+        if suggestion.kind != 'category'
+    ]
+
+
+class Indexes:
+    """The prefix and trigram indexes over one set of suggestions."""
+
+    def __init__(self, suggestions):
+        self.prefix = PrefixIndex(suggestions)
+        self.trigram = TrigramIndex(trigram_entries(suggestions))
+
+    def replace(self, owner, suggestions):
+        self.prefix.replace(owner, suggestions)
+        self.trigram.remove(owner)
+        for entry_owner, words in trigram_entries(suggestions):
+            self.trigram.add(entry_owner, words)
+
+
+def build_index():
+    """The indexes over every active service, doctor and category."""
+    suggestions = category_suggestions()
+    for service in Service.objects.filter(is_active=True).order_by().only('pk', 'name', 'is_active'):
+        suggestions.extend(service_suggestions(service))
+    for doctor in Doctor.objects.select_related('user').only(
+        'pk', 'specialization', 'user__first_name', 'user__last_name', 'user__username',
+    ):
+        suggestions.extend(doctor_suggestions(doctor))
+    return Indexes(suggestions)
+
+
+class Autocomplete:
+    """The worker's indexes, rebuilt when another worker has changed the data."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._index = None
+        self._version = None
+        self._checked_at = 0
+
+    def _current_version(self):
+        return cache.get_or_set(VERSION_KEY, 1, None)
+
+    def index(self):
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < settings.AUTOCOMPLETE_VERSION_CHECK_SECONDS:
+            return self._index
+        with self._lock:
+            version = self._current_version()
+            if self._index is None or version != self._version:
+                self._index = build_index()
+                self._version = version
+            self._checked_at = now
+        return self._index
+
+    def warm(self):
+        """Build the index now rather than on the first lookup."""
+        try:
+            self.index()
+        except DatabaseError:
+            # Not migrated yet; the first lookup builds it
+            self.reset()
+
+    def search(self, query, limit=10):
+        """Suggestions with a word starting with ``query``."""
+        return self.index().prefix.search(query, limit)
+
+    def similar(self, kind, query, limit=None):
+        """
+        pks of the ``kind`` rows ('service' or 'doctor') whose names are
+        spelled like ``query``, best first, with their similarity.
+        """
+        indexes = self.index()
+        # The trigram index is updated in place, so lookups wait for writes
+        with self._lock:
+            scores = indexes.trigram.search(
+                search_terms(normalize(query)), settings.FUZZY_SEARCH_THRESHOLD, kind=kind,
+            )
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(owner[1], score) for owner, score in ranked[:limit]]
+
+    def replace(self, owner, suggestions):
+        """Apply a change made by this worker and tell the others."""
+        with self._lock:
+            try:
+                version = cache.incr(VERSION_KEY)
+            except ValueError:
+                version = None
+            if self._index is None:
+                return
+            if self._version is not None and version == self._version + 1:
+                self._index.replace(owner, suggestions)
+                self._version = version
+            else:
+                # Another worker changed something too; rebuild on next lookup
+                self._index = None
+
+
+autocomplete = Autocomplete()
+
+
+class FuzzyMatcher:
+    """
+    ``filter()`` and ``rank()`` like SearchIndex, but matching names spelled
+    like the query in the worker's trigram index.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+
+    def similar_pks(self, query):
+        return [pk for pk, score in autocomplete.similar(self.kind, query, settings.FUZZY_SEARCH_LIMIT)]
+
+    def filter(self, queryset, query):
+        return queryset.filter(pk__in=self.similar_pks(query))
+
+    def rank(self, queryset, query):
+        """``filter()`` plus a ``search_rank`` annotation; lower is better."""
+        pks = self.similar_pks(query)
+        if not pks:
+            return queryset.none().annotate(search_rank=Value(0))
+        return queryset.filter(pk__in=pks).annotate(search_rank=Case(
+            *[When(pk=pk, then=Value(position)) for position, pk in enumerate(pks)],
+            default=Value(len(pks)),
+        ))
+
+
+SERVICE_FUZZY = FuzzyMatcher('service')
+DOCTOR_FUZZY = FuzzyMatcher('doctor')
+
+
+def _on_commit(owner, suggestions):
+    transaction.on_commit(partial(autocomplete.replace, owner, suggestions))
+
+
+@receiver(post_save, sender=Service)
+def service_saved(sender, instance, **kwargs):
+    _on_commit(('service', instance.pk), service_suggestions(instance))
+
+
+@receiver(post_delete, sender=Service)
+def service_deleted(sender, instance, **kwargs):
+    _on_commit(('service', instance.pk), [])
+
+
+@receiver(post_save, sender=Doctor)
+def doctor_saved(sender, instance, **kwargs):
+    _on_commit(('doctor', instance.pk), doctor_suggestions(instance))
+
+
+@receiver(post_delete, sender=Doctor)
+def doctor_deleted(sender, instance, **kwargs):
+    _on_commit(('doctor', instance.pk), [])
+
+
+@receiver(doctor_user_changed)
+def doctor_user_saved(sender, doctors, **kwargs):
+    for doctor in doctors:
+        _on_commit(('doctor', doctor.pk), doctor_suggestions(doctor))
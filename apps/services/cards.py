@@ -0,0 +1,144 @@
+"""
+Doctor cards read model.
+
+A doctor card in a listing shows rows from six tables: the doctor, their
+user, two educations, two experiences, three active services and their
+languages. Rather than join them on every page, each doctor has a
+DoctorCard row holding the card as one JSON document, plus the columns
+listings filter and sort on. A page of doctors is then one indexed query.
+
+Cards are rebuilt once the transaction that changed one of their rows
+commits. Rows written with bulk_create() or update() skip the signals;
+run ``manage.py rebuild_doctor_cards`` after those.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Doctor, DoctorCard, Education, Experience, Language, Service
+from .signals import doctor_user_changed, service_doctor_ids
+
+CARD_FIELDS = ['specialization', 'bayesian_rating', 'data', 'updated_at']
+
+
+def with_card_data(doctors):
+    """
+    Everything a doctor card shows, in a fixed number of queries: the user
+    is joined, ratings are read from the doctor row and each list is
+    prefetched as far as the card slices it.
+    """
+    return doctors.select_related('user').prefetch_related(
+        Prefetch('educations', queryset=Education.objects.order_by('pk')[:2], to_attr='card_educations'),
+        Prefetch('experiences', queryset=Experience.objects.order_by('pk')[:2], to_attr='card_experiences'),
+        Prefetch('services', queryset=Service.objects.filter(is_active=True)[:3], to_attr='card_services'),
+        Prefetch('languages', queryset=Language.objects.order_by('pk'), to_attr='card_languages'),
+    )
+
+
+def card_data(doctor):
+    """The card document of a doctor loaded with ``with_card_data()``."""
+    user = doctor.user
+    return {
+        'name': f'{user.first_name} {user.last_name}'.strip() or user.username,
+        'specialization': doctor.specialization,
+        'profile_image': doctor.profile_image.url if doctor.profile_image else None,
+        'educations': [
+            {'degree': education.degree, 'institution': education.institution, 'year': education.year}
+            for education in doctor.card_educations
+        ],
+        'experiences': [
+            {
+                'position': experience.position, 'hospital': experience.hospital,
+                'start_year': experience.start_year, 'end_year': experience.end_year,
+            }
+            for experience in doctor.card_experiences
+        ],
+        'services': [
+            {'id': service.pk, 'name': service.name, 'price': str(service.price)}
+            for service in doctor.card_services
+        ],
+        'languages': [language.name for language in doctor.card_languages],
+        'average_rating': round(doctor.rating_sum / doctor.rating_count, 1) if doctor.rating_count else None,
+        'rating_count': doctor.rating_count,
+    }
+
+
+def write_cards(doctors):
+    """Insert or replace the cards of ``doctors``, loaded with ``with_card_data()``."""
+    DoctorCard.objects.bulk_create(
+        [
+            DoctorCard(
+                doctor=doctor,
+                specialization=doctor.specialization,
+                bayesian_rating=doctor.bayesian_rating,
+                data=card_data(doctor),
+            )
+            for doctor in doctors
+        ],
+        update_conflicts=True,
+        unique_fields=['doctor'],
+        update_fields=CARD_FIELDS,
+    )
+
+
+def refresh_cards(doctor_ids):
+    """Rebuild the cards of the given doctors; deleted doctors lose theirs by cascade."""
+    doctor_ids = {doctor_id for doctor_id in doctor_ids if doctor_id is not None}
+    if doctor_ids:
+        write_cards(with_card_data(Doctor.objects.filter(pk__in=doctor_ids)))
+
+
+def rebuild_cards(batch_size=500):
+    """Rebuild every card; returns how many were written."""
+    DoctorCard.objects.exclude(doctor__in=Doctor.objects.all()).delete()
+    total = 0
+    doctors = with_card_data(Doctor.objects.order_by('pk'))
+    batch = []
+    for doctor in doctors.iterator(chunk_size=batch_size):
+        batch.append(doctor)
+        if len(batch) == batch_size:
+            write_cards(batch)
+            total += len(batch)
+            batch = []
+    write_cards(batch)
+    return total + len(batch)
+
+
+def invalidate_cards(doctor_ids):
+    """Rebuild the cards of the given doctors once the transaction commits."""
+    doctor_ids = {doctor_id for doctor_id in doctor_ids if doctor_id is not None}
+    if doctor_ids:
+        # Also keeps a doctor deleted by cascade from getting a card back
+        # from the deletes of their other rows
+        transaction.on_commit(partial(refresh_cards, doctor_ids))
+
+
+@receiver(post_save, sender=Doctor)
+def doctor_saved(sender, instance, **kwargs):
+    invalidate_cards([instance.pk])
+
+
+@receiver(post_save, sender=Education)
+@receiver(post_delete, sender=Education)
+@receiver(post_save, sender=Experience)
+@receiver(post_delete, sender=Experience)
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Language)
+@receiver(post_save, sender='reviews.Review')
+@receiver(post_delete, sender='reviews.Review')
+def doctor_row_changed(sender, instance, **kwargs):
+    invalidate_cards([instance.doctor_id])
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def service_changed(sender, instance, **kwargs):
+    invalidate_cards(service_doctor_ids(instance))
+
+
+@receiver(doctor_user_changed)
+def doctor_user_saved(sender, doctors, **kwargs):
+    invalidate_cards(doctor.pk for doctor in doctors)
@@ -0,0 +1,179 @@
+"""
+Faceted search over active services.
+
+Search, category, price range, duration bucket and price bucket filters are
+normalized into a filter dict first, so equivalent query strings share one
+cache entry. The facet counts for those filters come from a single
+conditional aggregate: each facet is counted with every other filter
+applied but not its own, so picking a category still shows how many
+services the other categories would give.
+
+Facets are cached by the normalized filters plus a version number that is
+bumped whenever a service changes.
+"""
+import hashlib
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .autocomplete import SERVICE_FUZZY
+from .models import Service
+from .search import SERVICE_INDEX
+
+FACETS_VERSION_KEY = 'service-facets:version'
+
+DURATION_BUCKETS = {
+    'short': ('Short (≤ 30 min)', Q(duration_minutes__lte=30)),
+    'medium': ('Medium (31-60 min)', Q(duration_minutes__gt=30, duration_minutes__lte=60)),
+    'long': ('Long (> 60 min)', Q(duration_minutes__gt=60)),
+}
+
+PRICE_BUCKETS = {
+    'under_1000': ('Under Rs 1,000', Q(price__lt=1000)),
+    '1000_2500': ('Rs 1,000 - 2,500', Q(price__gte=1000, price__lt=2500)),
+    '2500_5000': ('Rs 2,500 - 5,000', Q(price__gte=2500, price__lt=5000)),
+    'over_5000': ('Rs 5,000 and above', Q(price__gte=5000)),
+}
+
+CATEGORIES = dict(Service.CATEGORY_CHOICES)
+
+
+def _price(value):
+    try:
+        price = Decimal(value)
+    except (InvalidOperation, TypeError):
+        return ''
+    if not price.is_finite() or price < 0:
+        return ''
+    return format(price.normalize(), 'f')
+
+
+def normalize_filters(params):
+    """Return the recognised filters from ``params``; unknown values are dropped."""
+    category = params.get('category', '')
+    duration = params.get('duration', '')
+    price = params.get('price', '')
+    return {
+        'search': ' '.join(params.get('search', '').split()).lower(),
+        'category': category if category in CATEGORIES else '',
+        'min_price': _price(params.get('min_price', '')),
+        'max_price': _price(params.get('max_price', '')),
+        'duration': duration if duration in DURATION_BUCKETS else '',
+        'price': price if price in PRICE_BUCKETS else '',
+        # Typo-tolerant search instead of full-text
+        'match': 'fuzzy' if params.get('match') == 'fuzzy' else '',
+    }
+
+
+def search_index(filters):
+    """SERVICE_INDEX, or SERVICE_FUZZY for ``match=fuzzy``."""
+    return SERVICE_FUZZY if filters['match'] == 'fuzzy' else SERVICE_INDEX
+
+
+def base_queryset(filters):
+    """Active services matching the filters that are not faceted."""
+    queryset = Service.objects.filter(is_active=True)
+    if filters['search']:
+        queryset = search_index(filters).filter(queryset, filters['search'])
+    if filters['min_price']:
+        queryset = queryset.filter(price__gte=filters['min_price'])
+    if filters['max_price']:
+        queryset = queryset.filter(price__lte=filters['max_price'])
+    return queryset
+
+
+def facet_conditions(filters):
+    """The condition of each selected facet; empty when it is not selected."""
+    return {
+        'category': Q(category=filters['category']) if filters['category'] else Q(),
+        'duration': DURATION_BUCKETS[filters['duration']][1] if filters['duration'] else Q(),
+        'price': PRICE_BUCKETS[filters['price']][1] if filters['price'] else Q(),
+    }
+
+
+def filter_services(filters):
+    """Queryset of the services matching all of the filters."""
+    conditions = facet_conditions(filters)
+    return base_queryset(filters).filter(conditions['category'], conditions['duration'], conditions['price'])
+
+
+def _count(*conditions):
+    condition = Q()
+    for q in conditions:
+        condition &= q
+    return Count('pk', filter=condition or None)
+
+
+def build_facets(filters):
+    """Total, price range and per-facet counts in one aggregate query."""
+    conditions = facet_conditions(filters)
+    selected = conditions['category'] & conditions['duration'] & conditions['price']
+    others = {
+        facet: [q for name, q in conditions.items() if name != facet]
+        for facet in conditions
+    }
+
+    aggregates = {
+        'total': _count(selected),
+        'min_price': Min('price', filter=selected or None),
+        'max_price': Max('price', filter=selected or None),
+    }
+    for value in CATEGORIES:
+        aggregates[f'category__{value}'] = _count(Q(category=value), *others['category'])
+    for value, (label, q) in DURATION_BUCKETS.items():
+        aggregates[f'duration__{value}'] = _count(q, *others['duration'])
+    for value, (label, q) in PRICE_BUCKETS.items():
+        aggregates[f'price__{value}'] = _count(q, *others['price'])
+
+    result = base_queryset(filters).aggregate(**aggregates)
+    return {
+        'total': result['total'],
+        'min_price': result['min_price'],
+        'max_price': result['max_price'],
+        'categories': [
+            (value, label, result[f'category__{value}'])
+            for value, label in Service.CATEGORY_CHOICES
+        ],
+        'durations': [
+            (value, label, result[f'duration__{value}'])
+            for value, (label, q) in DURATION_BUCKETS.items()
+        ],
+        'prices': [
+            (value, label, result[f'price__{value}'])
+            for value, (label, q) in PRICE_BUCKETS.items()
+        ],
+    }
+
+
+def facets_key(filters, version):
+    digest = hashlib.md5(repr(sorted(filters.items())).encode()).hexdigest()
+    return f'service-facets:{digest}:v{version}'
+
+
+def service_facets(filters):
+    """Cached ``build_facets()``."""
+    version = cache.get_or_set(FACETS_VERSION_KEY, 1, None)
+    return cache.get_or_set(
+        facets_key(filters, version),
+        lambda: build_facets(filters),
+        settings.SERVICE_FACETS_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_service_facets():
+    """Drop every cached set of facets."""
+    try:
+        cache.incr(FACETS_VERSION_KEY)
+    except ValueError:
+        # No version yet, so nothing is cached
+        pass
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def service_changed(sender, instance, **kwargs):
+    invalidate_service_facets()
@@ -0,0 +1,62 @@
+"""
+Management command to measure autocomplete lookup latency.
+Usage: python manage.py bench_autocomplete [--entries 50000] [--lookups 20000]
+
+Builds a prefix index over synthetic suggestions in memory; the database is
+not touched.
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.services.autocomplete import PrefixIndex, Suggestion
+
+SYLLABLES = ('ka', 'ri', 'sha', 'mo', 'na', 'ta', 'vi', 'lo', 'pe', 'du', 'ra', 'si', 'an', 'go', 'be')
+
+
+def word(rng):
+    return ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks autocomplete lookups against an in-memory prefix index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=50000)
+        parser.add_argument('--lookups', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        suggestions = [
+            Suggestion(('service', i), 'service', f'{word(rng)} {word(rng)}'.title(), f'/services/{i}/')
+            for i in range(options['entries'])
+        ]
+
+        started = time.perf_counter()
+        index = PrefixIndex(suggestions)
+        self.stdout.write(
+            f'Built {len(index)} keys for {len(suggestions)} entries in {time.perf_counter() - started:.2f}s'
+        )
+
+        started = time.perf_counter()
+        index.replace(('service', 0), [Suggestion(('service', 0), 'service', 'Renamed Service', '/services/0/')])
+        self.stdout.write(f'Incremental update: {(time.perf_counter() - started) * 1000:.2f}ms')
+
+        labels = [suggestion.label for suggestion in suggestions]
+        queries = [rng.choice(labels)[:rng.randint(1, 6)] for _ in range(options['lookups'])]
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+
+        def percentile(p):
+            return timings[min(len(timings) - 1, int(len(timings) * p))] * 1000
+
+        self.stdout.write(
+            f'{len(timings)} lookups: p50 {percentile(0.5):.3f}ms  p99 {percentile(0.99):.3f}ms  '
+            f'max {timings[-1] * 1000:.3f}ms'
+        )
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark complete.'))
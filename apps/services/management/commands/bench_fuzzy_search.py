@@ -0,0 +1,73 @@
+"""
+Management command to measure fuzzy (trigram) search latency.
+Usage: python manage.py bench_fuzzy_search [--entries 50000] [--lookups 2000]
+
+Builds a trigram index over synthetic names in memory and looks up
+misspelled copies of them; the database is not touched.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.services.trigrams import TrigramIndex
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+# Consonant-vowel syllables give name-like words ("kerasimo")
+SYLLABLES = tuple(c + v for c in 'bcdfghjklmnprstvwyz' for v in 'aeiou') + ('sh', 'th', 'an', 'es', 'ra')
+
+
+def word(rng):
+    return ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+
+
+def misspell(rng, text):
+    """Drop, swap or replace one letter."""
+    i = rng.randrange(len(text) - 1)
+    edit = rng.choice(('drop', 'swap', 'replace'))
+    if edit == 'drop':
+        return text[:i] + text[i + 1:]
+    if edit == 'swap':
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text[:i] + rng.choice(LETTERS) + text[i + 1:]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks typo-tolerant lookups against an in-memory trigram index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=50000)
+        parser.add_argument('--lookups', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        names = {('service', i): [word(rng), word(rng)] for i in range(options['entries'])}
+
+        started = time.perf_counter()
+        index = TrigramIndex(names.items())
+        self.stdout.write(
+            f'Indexed {len(index)} distinct words for {len(names)} entries in {time.perf_counter() - started:.2f}s'
+        )
+
+        owners = list(names)
+        timings = []
+        found = 0
+        for _ in range(options['lookups']):
+            owner = rng.choice(owners)
+            query = [misspell(rng, name) for name in names[owner]]
+            started = time.perf_counter()
+            scores = index.search(query, settings.FUZZY_SEARCH_THRESHOLD)
+            ranked = sorted(scores, key=scores.get, reverse=True)[:settings.FUZZY_SEARCH_LIMIT]
+            timings.append(time.perf_counter() - started)
+            found += owner in ranked[:10]
+        timings.sort()
+
+        def percentile(p):
+            return timings[min(len(timings) - 1, int(len(timings) * p))] * 1000
+
+        self.stdout.write(
+            f'{len(timings)} lookups: p50 {percentile(0.5):.2f}ms  p99 {percentile(0.99):.2f}ms; '
+            f'the misspelled entry was in the top 10 for {found / len(timings):.0%}'
+        )
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark complete.'))
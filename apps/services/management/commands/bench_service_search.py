@@ -0,0 +1,94 @@
+"""
+Management command to compare icontains and full-text service search.
+Usage: python manage.py bench_service_search [--rows 100000]
+
+Seeds services inside a transaction that is rolled back, so no data is kept.
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from apps.services.models import Service
+from apps.services.search import SERVICE_INDEX
+
+PER_PAGE = 9
+
+WORDS = (
+    'heart', 'skin', 'bone', 'joint', 'child', 'dental', 'kidney', 'lung', 'brain', 'nerve',
+    'vision', 'hearing', 'allergy', 'diabetes', 'thyroid', 'blood', 'pressure', 'sleep', 'diet',
+    'therapy', 'screening', 'checkup', 'consultation', 'scan', 'test', 'vaccination', 'surgery',
+    'care', 'recovery', 'pain', 'stress', 'fitness', 'pregnancy', 'infant', 'elderly', 'sports',
+)
+
+QUERIES = ('heart', 'kidney screening', 'therap', 'child vaccination checkup', 'zzz')
+
+
+class Rollback(Exception):
+    pass
+
+
+def timed(func, repeat=10):
+    """Best wall time of ``repeat`` runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def icontains_page(query):
+    queryset = Service.objects.filter(Q(name__icontains=query) | Q(description__icontains=query))
+    return queryset.count(), list(queryset.order_by('name')[:PER_PAGE])
+
+
+def fulltext_page(query):
+    queryset = Service.objects.all()
+    return (
+        SERVICE_INDEX.filter(queryset, query).count(),
+        list(SERVICE_INDEX.rank(queryset, query).order_by('search_rank', 'name')[:PER_PAGE]),
+    )
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks a search results page with icontains against the full-text index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        try:
+            with transaction.atomic():
+                # bulk_create skips the signals, so the index is rebuilt below
+                Service.objects.bulk_create(
+                    (
+                        Service(
+                            name=' '.join(rng.sample(WORDS, 2)).title(),
+                            description=' '.join(rng.choices(WORDS, k=12)),
+                            price=100 + i % 5000,
+                        )
+                        for i in range(options['rows'])
+                    ),
+                    batch_size=2000,
+                )
+                started = time.perf_counter()
+                indexed = SERVICE_INDEX.rebuild()
+                self.stdout.write(f'Indexed {indexed} services in {time.perf_counter() - started:.1f}s\n')
+
+                self.stdout.write(f'{"query":<28}{"matches":>9}{"icontains":>12}{"full-text":>12}')
+                for query in QUERIES:
+                    matches, page = fulltext_page(query)
+                    self.stdout.write(
+                        f'{query:<28}{matches:>9}'
+                        f'{timed(lambda: icontains_page(query)):>10.1f}ms'
+                        f'{timed(lambda: fulltext_page(query)):>10.1f}ms'
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark data rolled back.'))
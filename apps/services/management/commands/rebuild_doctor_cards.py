@@ -0,0 +1,21 @@
+"""
+Management command to rebuild the precomputed doctor cards.
+Usage: python manage.py rebuild_doctor_cards
+
+Needed after doctors or their educations, experiences, services, languages
+or reviews are written with bulk_create() or update(), which skip the
+signals that keep the cards up to date.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.services.cards import rebuild_cards
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the doctor card read model from the source tables'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_cards()
+        self.stdout.write(self.style.SUCCESS(f'✓ {count} doctor cards rebuilt.'))
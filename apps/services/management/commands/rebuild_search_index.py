@@ -0,0 +1,23 @@
+"""
+Management command to rebuild the service and doctor full-text search tables.
+Usage: python manage.py rebuild_search_index
+
+Needed after rows are written with bulk_create() or update(), which skip the
+signals that keep the tables up to date.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.services.search import SEARCH_INDEXES
+
+
+class Command(BaseCommand):
+    help = 'Re-indexes every service and doctor for full-text search'
+
+    def handle(self, *args, **options):
+        for index in SEARCH_INDEXES:
+            with transaction.atomic():
+                count = index.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {count} {index.model._meta.verbose_name_plural} indexed.'
+            ))
@@ -0,0 +1,21 @@
+# Indexes for the admin's prefix (``^field``) searches; see config.admin_tools.PrefixSearchIndex
+import config.admin_tools
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='service',
+            index=config.admin_tools.PrefixSearchIndex(fields=['name'], name='service_name_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=config.admin_tools.PrefixSearchIndex(fields=['specialization'], name='doctor_specialty_search_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+"""
+Full-text search tables for services and doctors (see apps.services.search).
+
+SQLite gets FTS5 virtual tables whose rowid is the service or doctor id.
+PostgreSQL gets a weighted tsvector per row with a GIN index. Both are
+filled from the existing rows; other databases search with icontains and
+need no table.
+"""
+from django.db import migrations
+
+FTS5_TOKENIZER = 'porter unicode61 remove_diacritics 2'
+
+DOCTOR_NAME = (
+    "COALESCE(NULLIF(TRIM(u.first_name || ' ' || u.last_name), ''), u.username)"
+)
+
+SQLITE = [
+    f'CREATE VIRTUAL TABLE "services_service_search" USING fts5(name, description, tokenize="{FTS5_TOKENIZER}")',
+    'INSERT INTO "services_service_search" (rowid, name, description) '
+    'SELECT id, name, description FROM "services_service"',
+    f'CREATE VIRTUAL TABLE "services_doctor_search" USING fts5(name, specialization, bio, tokenize="{FTS5_TOKENIZER}")',
+    'INSERT INTO "services_doctor_search" (rowid, name, specialization, bio) '
+    f'SELECT d.id, {DOCTOR_NAME}, d.specialization, d.bio '
+    'FROM "services_doctor" d JOIN "accounts_user" u ON u.id = d.user_id',
+]
+
+POSTGRESQL = [
+    'CREATE TABLE "services_service_search" ('
+    '"id" integer PRIMARY KEY REFERENCES "services_service" ("id") ON DELETE CASCADE, '
+    '"document" tsvector NOT NULL)',
+    'CREATE INDEX "services_service_search_document_idx" ON "services_service_search" USING GIN ("document")',
+    'INSERT INTO "services_service_search" ("id", "document") '
+    "SELECT id, setweight(to_tsvector('english', name), 'A') || "
+    "setweight(to_tsvector('english', description), 'B') FROM \"services_service\"",
+    'CREATE TABLE "services_doctor_search" ('
+    '"id" integer PRIMARY KEY REFERENCES "services_doctor" ("id") ON DELETE CASCADE, '
+    '"document" tsvector NOT NULL)',
+    'CREATE INDEX "services_doctor_search_document_idx" ON "services_doctor_search" USING GIN ("document")',
+    'INSERT INTO "services_doctor_search" ("id", "document") '
+    f"SELECT d.id, setweight(to_tsvector('english', {DOCTOR_NAME}), 'A') || "
+    "setweight(to_tsvector('english', d.specialization), 'B') || "
+    "setweight(to_tsvector('english', d.bio), 'C') "
+    'FROM "services_doctor" d JOIN "accounts_user" u ON u.id = d.user_id',
+]
+
+
+def create_tables(apps, schema_editor):
+    statements = {'sqlite': SQLITE, 'postgresql': POSTGRESQL}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_tables(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE IF EXISTS "services_service_search"')
+        schema_editor.execute('DROP TABLE IF EXISTS "services_doctor_search"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_search_indexes'),
+        ('services', '0011_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_tables, drop_tables),
+    ]
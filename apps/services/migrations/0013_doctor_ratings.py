@@ -0,0 +1,55 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:34
+
+import apps.services.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_ratings(apps, schema_editor):
+    Doctor = apps.get_model('services', 'Doctor')
+    Review = apps.get_model('reviews', 'Review')
+    weight = settings.DOCTOR_RATING_PRIOR_WEIGHT
+    prior = weight * settings.DOCTOR_RATING_PRIOR_MEAN
+    rows = (
+        Review.objects.order_by()
+        .values('doctor_id')
+        .annotate(total=models.Sum('rating'), n=models.Count('pk'))
+    )
+    for row in rows.iterator():
+        Doctor.objects.filter(pk=row['doctor_id']).update(
+            rating_sum=row['total'],
+            rating_count=row['n'],
+            bayesian_rating=(prior + row['total']) / (weight + row['n']),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0001_initial'),
+        ('services', '0012_search_tables'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='bayesian_rating',
+            field=models.FloatField(default=apps.services.models.default_bayesian_rating, editable=False),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['-bayesian_rating', 'id'], name='doctor_bayesian_rating_idx'),
+        ),
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
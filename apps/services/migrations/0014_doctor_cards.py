@@ -0,0 +1,87 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def card_data(doctor):
+    # The card document as it is at this migration; apps.services.cards
+    # builds later versions
+    user = doctor.user
+    return {
+        'name': f'{user.first_name} {user.last_name}'.strip() or user.username,
+        'specialization': doctor.specialization,
+        'profile_image': doctor.profile_image.url if doctor.profile_image else None,
+        'educations': [
+            {'degree': education.degree, 'institution': education.institution, 'year': education.year}
+            for education in doctor.card_educations
+        ],
+        'experiences': [
+            {
+                'position': experience.position, 'hospital': experience.hospital,
+                'start_year': experience.start_year, 'end_year': experience.end_year,
+            }
+            for experience in doctor.card_experiences
+        ],
+        'services': [
+            {'id': service.pk, 'name': service.name, 'price': str(service.price)}
+            for service in doctor.card_services
+        ],
+        'languages': [language.name for language in doctor.card_languages],
+        'average_rating': round(doctor.rating_sum / doctor.rating_count, 1) if doctor.rating_count else None,
+        'rating_count': doctor.rating_count,
+    }
+
+
+def fill_cards(apps, schema_editor):
+    Doctor = apps.get_model('services', 'Doctor')
+    DoctorCard = apps.get_model('services', 'DoctorCard')
+    doctors = Doctor.objects.order_by('pk').select_related('user').prefetch_related(
+        models.Prefetch('educations', queryset=apps.get_model('services', 'Education').objects.order_by('pk')[:2], to_attr='card_educations'),
+        models.Prefetch('experiences', queryset=apps.get_model('services', 'Experience').objects.order_by('pk')[:2], to_attr='card_experiences'),
+        models.Prefetch('services', queryset=apps.get_model('services', 'Service').objects.filter(is_active=True)[:3], to_attr='card_services'),
+        models.Prefetch('languages', queryset=apps.get_model('services', 'Language').objects.order_by('pk'), to_attr='card_languages'),
+    )
+
+    def write(batch):
+        DoctorCard.objects.bulk_create([
+            DoctorCard(
+                doctor=doctor,
+                specialization=doctor.specialization,
+                bayesian_rating=doctor.bayesian_rating,
+                data=card_data(doctor),
+            )
+            for doctor in batch
+        ])
+
+    batch = []
+    for doctor in doctors.iterator(chunk_size=500):
+        batch.append(doctor)
+        if len(batch) == 500:
+            write(batch)
+            batch = []
+    write(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0013_doctor_ratings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorCard',
+            fields=[
+                ('doctor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='services.doctor')),
+                ('specialization', models.CharField(max_length=255)),
+                ('bayesian_rating', models.FloatField()),
+                ('data', models.JSONField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-bayesian_rating', 'doctor'], name='doctorcard_rating_idx'), models.Index(fields=['specialization', '-bayesian_rating', 'doctor'], name='doctorcard_spec_rating_idx')],
+            },
+        ),
+        migrations.RunPython(fill_cards, migrations.RunPython.noop),
+    ]
@@ -8,6 +8,8 @@ from decimal import Decimal
 import os
 from django.conf import settings
 
+from config.admin_tools import PrefixSearchIndex
+
 
 def validate_image_size(image):
     """Validate that uploaded image is not too large."""
@@ -86,6 +88,17 @@ class Service(models.Model):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Public catalogue: active services by name, optionally per category
+            models.Index(fields=['name'], condition=models.Q(is_active=True), name='service_active_name_idx'),
+            models.Index(
+                fields=['category', 'name'],
+                condition=models.Q(is_active=True),
+                name='service_active_category_idx',
+            ),
+            # Admin ^name search
+            PrefixSearchIndex(fields=['name'], name='service_name_search_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} (Rs. {self.price})"
@@ -137,16 +150,40 @@ class Service(models.Model):
 
 # ---------------- DOCTOR MODELS ---------------- #
 
+def default_bayesian_rating():
+    """With no reviews the Bayesian average is the prior mean."""
+    return settings.DOCTOR_RATING_PRIOR_MEAN
+
+
 class Doctor(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     specialization = models.CharField(max_length=255)
     bio = models.TextField(blank=True)
     profile_image = models.ImageField(upload_to='doctors/', blank=True, null=True)
+    # Review aggregates, maintained by reviews.ratings
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    bayesian_rating = models.FloatField(default=default_bayesian_rating, editable=False)
+
+    class Meta:
+        indexes = [
+            # Doctor list, best rated first
+            models.Index(fields=['-bayesian_rating', 'id'], name='doctor_bayesian_rating_idx'),
+            # Admin ^specialization search
+            PrefixSearchIndex(fields=['specialization'], name='doctor_specialty_search_idx'),
+        ]
 
     def __str__(self):
         full_name = self.user.get_full_name()
         return f"Dr. {full_name}" if full_name else f"Dr. {self.user.username}"
 
+    @property
+    def average_rating(self):
+        """Mean review rating to one decimal, or None without reviews."""
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 1)
+
 
 class Education(models.Model):
     doctor = models.ForeignKey(Doctor, related_name="educations", on_delete=models.CASCADE)
@@ -174,4 +211,25 @@ class Language(models.Model):
     name = models.CharField(max_length=100)
 
     def __str__(self):
-        return f"{self.name} ({self.doctor})"
\ No newline at end of file
+        return f"{self.name} ({self.doctor})"
+
+class DoctorCard(models.Model):
+    """
+    Read model of a doctor's card in listings: everything the card shows as
+    one JSON document, kept up to date by apps.services.cards.
+    """
+    doctor = models.OneToOneField(Doctor, primary_key=True, related_name="card", on_delete=models.CASCADE)
+    # Copied out of the document to filter and sort on
+    specialization = models.CharField(max_length=255)
+    bayesian_rating = models.FloatField()
+    data = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-bayesian_rating', 'doctor'], name='doctorcard_rating_idx'),
+            models.Index(fields=['specialization', '-bayesian_rating', 'doctor'], name='doctorcard_spec_rating_idx'),
+        ]
+
+    def __str__(self):
+        return f"Card of {self.data.get('name', self.doctor_id)}"
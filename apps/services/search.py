@@ -0,0 +1,249 @@
+"""
+Ranked full-text search over services and doctors.
+
+Each searchable model has a side table holding its text: an FTS5 virtual
+table on SQLite (rowid = model pk) and a weighted tsvector with a GIN index
+on PostgreSQL. The tables are created by migration 0012 and kept up to date
+by the signal handlers below. Rows written with bulk_create() or update()
+skip the signals; run ``manage.py rebuild_search_index`` after those.
+
+``SearchIndex.filter()`` narrows a queryset to the matches and
+``SearchIndex.rank()`` also annotates ``search_rank``, where lower is a
+better match (BM25 on SQLite, negated ts_rank on PostgreSQL). Other
+databases fall back to ``icontains`` without ranking. The queryset may
+also be of a model sharing the indexed model's primary keys, such as
+DoctorCard.
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+from django.db.models import Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Doctor, Service
+from .signals import doctor_user_changed
+
+User = get_user_model()
+
+# unicode61 lower-cases and strips accents, porter stems like the
+# 'english' text search configuration on PostgreSQL
+FTS5_TOKENIZER = 'porter unicode61 remove_diacritics 2'
+PG_CONFIG = 'english'
+PG_WEIGHTS = 'ABCD'
+
+
+def search_terms(query):
+    """The words of ``query``; punctuation and operators are dropped."""
+    return re.findall(r'\w+', query.lower())
+
+
+class SearchIndex:
+    """Full-text side table for ``model``; ``columns`` are in weight order."""
+
+    def __init__(self, model, table, columns, weights, lookups):
+        self.model = model
+        self.table = table
+        self.columns = columns
+        # BM25 column weights on SQLite
+        self.weights = weights
+        # Fields searched with icontains on other databases
+        self.lookups = lookups
+
+    def document(self, instance):
+        """The text of each column for ``instance``."""
+        return [getattr(instance, column) or '' for column in self.columns]
+
+    def objects(self):
+        return self.model._default_manager.all()
+
+    def _pg_document(self):
+        return ' || '.join(
+            f"setweight(to_tsvector('{PG_CONFIG}', %s), '{weight}')"
+            for weight, column in zip(PG_WEIGHTS, self.columns)
+        )
+
+    # Writes
+
+    def update(self, instances):
+        """Write the documents of ``instances`` to the index."""
+        connection = connections[router.db_for_write(self.model)]
+        rows = [[instance.pk, *self.document(instance)] for instance in instances]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.executemany(f'DELETE FROM "{self.table}" WHERE rowid = %s', [row[:1] for row in rows])
+                cursor.executemany(
+                    f'INSERT INTO "{self.table}" (rowid, {", ".join(self.columns)}) '
+                    f'VALUES (%s{", %s" * len(self.columns)})',
+                    rows,
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.executemany(
+                    f'INSERT INTO "{self.table}" ("id", "document") VALUES (%s, {self._pg_document()}) '
+                    f'ON CONFLICT ("id") DO UPDATE SET "document" = EXCLUDED."document"',
+                    rows,
+                )
+
+    def delete(self, pk):
+        connection = connections[router.db_for_write(self.model)]
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            return
+        column = 'rowid' if connection.vendor == 'sqlite' else '"id"'
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{self.table}" WHERE {column} = %s', [pk])
+
+    def rebuild(self, batch_size=1000):
+        """Re-index every row; returns how many were indexed."""
+        connection = connections[router.db_for_write(self.model)]
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{self.table}"')
+        total = 0
+        batch = []
+        for instance in self.objects().order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(instance)
+            if len(batch) == batch_size:
+                self.update(batch)
+                total += len(batch)
+                batch = []
+        self.update(batch)
+        return total + len(batch)
+
+    # Reads
+
+    def _match(self, vendor, query):
+        terms = search_terms(query)
+        if not terms:
+            return None
+        if vendor == 'sqlite':
+            # Quoted terms with a prefix wildcard, all required
+            return ' '.join(f'"{term}"*' for term in terms)
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def filter(self, queryset, query):
+        """Narrow ``queryset`` to the rows matching ``query``."""
+        vendor = connections[queryset.db].vendor
+        match = self._match(vendor, query)
+        if match is None:
+            return queryset.none()
+        if vendor == 'sqlite':
+            return queryset.filter(pk__in=RawSQL(
+                f'SELECT rowid FROM "{self.table}" WHERE "{self.table}" MATCH %s', [match]
+            ))
+        if vendor == 'postgresql':
+            return queryset.filter(pk__in=RawSQL(
+                f'SELECT "id" FROM "{self.table}" WHERE "document" @@ to_tsquery(\'{PG_CONFIG}\', %s)', [match]
+            ))
+        condition = Q()
+        for term in search_terms(query):
+            condition &= Q.create([(lookup, term) for lookup in self.lookups], connector=Q.OR)
+        if queryset.model is not self.model:
+            return queryset.filter(pk__in=self.objects().filter(condition).values('pk'))
+        return queryset.filter(condition)
+
+    def rank(self, queryset, query):
+        """``filter()`` plus a ``search_rank`` annotation; lower is better."""
+        vendor = connections[queryset.db].vendor
+        match = self._match(vendor, query)
+        if match is None or vendor not in ('sqlite', 'postgresql'):
+            return self.filter(queryset, query).annotate(search_rank=Value(0.0))
+        opts = queryset.model._meta
+        pk_column = f'"{opts.db_table}"."{opts.pk.column}"'
+        if vendor == 'sqlite':
+            weights = ', '.join(str(weight) for weight in self.weights)
+            where = [f'"{self.table}".rowid = {pk_column}', f'"{self.table}" MATCH %s']
+            rank = f'bm25("{self.table}", {weights})'
+            select_params = []
+        else:
+            tsquery = f"to_tsquery('{PG_CONFIG}', %s)"
+            where = [f'"{self.table}"."id" = {pk_column}', f'"{self.table}"."document" @@ {tsquery}']
+            rank = f'-ts_rank("{self.table}"."document", {tsquery})'
+            select_params = [match]
+        # extra() is the one place this module uses it, and on purpose: the
+        # search table has no model, and extra(tables=...) is the only
+        # QuerySet API that joins one. A RawSQL or Subquery annotation would
+        # be a correlated subquery, running the MATCH again for every hit
+        # instead of once, and bm25() only works in the query that does the
+        # MATCH. Anything that changes here must keep using the join.
+        return queryset.extra(
+            tables=[self.table],
+            where=where,
+            params=[match],
+            select={'search_rank': rank},
+            select_params=select_params,
+        )
+
+
+class DoctorSearchIndex(SearchIndex):
+
+    def document(self, instance):
+        user = instance.user
+        return [user.get_full_name() or user.username, instance.specialization, instance.bio]
+
+    def objects(self):
+        return super().objects().select_related('user')
+
+
+SERVICE_INDEX = SearchIndex(
+    Service,
+    table='services_service_search',
+    columns=('name', 'description'),
+    weights=(10.0, 1.0),
+    lookups=('name__icontains', 'description__icontains'),
+)
+
+DOCTOR_INDEX = DoctorSearchIndex(
+    Doctor,
+    table='services_doctor_search',
+    columns=('name', 'specialization', 'bio'),
+    weights=(10.0, 5.0, 1.0),
+    lookups=(
+        'user__first_name__icontains', 'user__last_name__icontains',
+        'specialization__icontains', 'bio__icontains',
+    ),
+)
+
+SEARCH_INDEXES = (SERVICE_INDEX, DOCTOR_INDEX)
+
+# User fields that end up in a doctor's document
+DOCTOR_USER_FIELDS = {'first_name', 'last_name', 'username'}
+
+
+@receiver(post_save, sender=Service)
+def service_saved(sender, instance, **kwargs):
+    SERVICE_INDEX.update([instance])
+
+
+@receiver(post_delete, sender=Service)
+def service_deleted(sender, instance, **kwargs):
+    SERVICE_INDEX.delete(instance.pk)
+
+
+@receiver(post_save, sender=Doctor)
+def doctor_saved(sender, instance, **kwargs):
+    DOCTOR_INDEX.update([instance])
+
+
+@receiver(post_delete, sender=Doctor)
+def doctor_deleted(sender, instance, **kwargs):
+    DOCTOR_INDEX.delete(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Every read model showing a doctor's name listens to doctor_user_changed
+    if created:
+        return
+    if update_fields is not None and not DOCTOR_USER_FIELDS.intersection(update_fields):
+        return
+    doctors = list(Doctor.objects.filter(user=instance).select_related('user'))
+    if doctors:
+        doctor_user_changed.send(sender=Doctor, doctors=doctors)
+
+
+@receiver(doctor_user_changed)
+def doctor_user_saved(sender, doctors, **kwargs):
+    DOCTOR_INDEX.update(doctors)
@@ -0,0 +1,30 @@
+"""
+Signals sent by the services app, and the pre_save bookkeeping shared by
+the read models built from services.
+"""
+from django.db.models.signals import pre_save
+from django.dispatch import Signal, receiver
+
+from .models import Service
+
+# Sent after a user who has a Doctor profile is saved with a change to a
+# field shown on the doctor's pages (see search.DOCTOR_USER_FIELDS).
+# Provides ``doctors``, loaded with their user.
+doctor_user_changed = Signal()
+
+
+@receiver(pre_save, sender=Service)
+def service_saving(sender, instance, **kwargs):
+    instance._previous_doctor_id = None
+    if instance.pk is not None:
+        instance._previous_doctor_id = (
+            Service.objects.filter(pk=instance.pk).values_list('doctor_id', flat=True).first()
+        )
+
+
+def service_doctor_ids(service):
+    """
+    The doctor of a saved or deleted ``service`` and, when the save moved it,
+    the doctor it was moved from; both show the service on their pages.
+    """
+    return [service.doctor_id, getattr(service, '_previous_doctor_id', None)]
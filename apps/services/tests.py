@@ -1,3 +1,392 @@
-from django.test import TestCase
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.accounts.models import User
+from reviews.ratings import submit_review
+
+from .autocomplete import PrefixIndex, Suggestion, autocomplete
+from .facets import build_facets, normalize_filters, service_facets
+from .cards import rebuild_cards
+from .models import Doctor, DoctorCard, Education, Experience, Language, Service
+from .search import DOCTOR_INDEX, SERVICE_INDEX
+from .trigrams import TrigramIndex
+
+
+def doctor_ids(response):
+    return [card.doctor_id for card in response.context['doctors']]
+
+
+class ServiceFacetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name, category, minutes, price in [
+            ('Checkup', 'general_medicine', 20, 500),
+            ('Full Checkup', 'general_medicine', 45, 1500),
+            ('ECG', 'cardiovascular_health', 30, 1200),
+            ('Echo Scan', 'cardiovascular_health', 90, 6000),
+            ('Therapy', 'mental_health', 60, 3000),
+        ]:
+            Service.objects.create(
+                name=name, description=f'{name} service', category=category,
+                duration_minutes=minutes, price=price,
+            )
+        Service.objects.create(name='Retired', description='x', price=100, is_active=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self, facets, facet):
+        return {value: count for value, label, count in facets[facet] if count}
+
+    def test_normalize_filters(self):
+        filters = normalize_filters({
+            'search': '  Full   CHECKUP ', 'category': 'nope', 'min_price': 'abc',
+            'max_price': '2000.00', 'duration': 'medium', 'price': 'cheap', 'sort': 'price_low',
+        })
+        self.assertEqual(filters, {
+            'search': 'full checkup', 'category': '', 'min_price': '',
+            'max_price': '2000', 'duration': 'medium', 'price': '', 'match': '',
+        })
+
+    def test_facets_without_filters(self):
+        with self.assertNumQueries(1):
+            facets = build_facets(normalize_filters({}))
+        self.assertEqual(facets['total'], 5)
+        self.assertEqual(facets['min_price'], Decimal('500'))
+        self.assertEqual(facets['max_price'], Decimal('6000'))
+        self.assertEqual(self.counts(facets, 'categories'), {
+            'general_medicine': 2, 'cardiovascular_health': 2, 'mental_health': 1,
+        })
+        self.assertEqual(self.counts(facets, 'durations'), {'short': 2, 'medium': 2, 'long': 1})
+        self.assertEqual(self.counts(facets, 'prices'), {
+            'under_1000': 1, '1000_2500': 2, '2500_5000': 1, 'over_5000': 1,
+        })
+
+    def test_facet_ignores_its_own_filter(self):
+        facets = build_facets(normalize_filters({'category': 'cardiovascular_health', 'max_price': '5000'}))
+        self.assertEqual(facets['total'], 1)
+        # Other categories still show what picking them would give
+        self.assertEqual(self.counts(facets, 'categories'), {
+            'general_medicine': 2, 'cardiovascular_health': 1, 'mental_health': 1,
+        })
+        self.assertEqual(self.counts(facets, 'durations'), {'short': 1})
+        self.assertEqual(self.counts(facets, 'prices'), {'1000_2500': 1})
+
+    def test_facets_are_cached_until_a_service_changes(self):
+        filters = normalize_filters({'search': 'checkup'})
+        self.assertEqual(service_facets(filters)['total'], 2)
+        with self.assertNumQueries(0):
+            service_facets(normalize_filters({'search': ' CHECKUP'}))
+
+        Service.objects.create(name='Quick Checkup', description='x', price=300)
+        self.assertEqual(service_facets(filters)['total'], 3)
+
+    def test_service_list(self):
+        url = reverse('service_list')
+        response = self.client.get(url, {'duration': 'short', 'min_price': 'oops'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_services'], 2)
+        self.assertEqual([service.name for service in response.context['services']], ['Checkup', 'ECG'])
+
+        # The invalid min_price was dropped, so the facets are already
+        # cached and only the page itself is queried
+        with self.assertNumQueries(1):
+            self.client.get(url, {'duration': 'short'})
+
+
+class FullTextSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.heart = Service.objects.create(
+            name='Heart Screening', description='ECG and blood pressure checks', price=1500,
+        )
+        cls.blood = Service.objects.create(
+            name='Blood Tests', description='Routine screening of the heart and kidneys', price=800,
+        )
+        Service.objects.create(name='Dental Cleaning', description='Scaling and polishing', price=1200)
+        user = User.objects.create_user(
+            username='dr_rai', first_name='Anita', last_name='Rai', role='doctor',
+        )
+        cls.doctor = Doctor.objects.create(
+            user=user, specialization='Cardiology', bio='Treats heart rhythm disorders',
+        )
+        # Cards are built on commit, which never comes in a TestCase
+        rebuild_cards()
+
+    def search(self, query):
+        return list(SERVICE_INDEX.rank(Service.objects.all(), query).order_by('search_rank'))
+
+    def test_ranks_name_matches_first(self):
+        self.assertEqual(self.search('heart'), [self.heart, self.blood])
+        # Stemmed prefixes, all words required
+        self.assertEqual(self.search('screen heart'), [self.heart, self.blood])
+        self.assertEqual(self.search('kidney'), [self.blood])
+        # Query syntax is treated as plain words
+        self.assertEqual(self.search('"heart" OR -dental*'), [])
+        self.assertEqual(self.search('!!!'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.heart.name = 'Cardiac Screening'
+        self.heart.save()
+        self.assertEqual(self.search('cardiac'), [self.heart])
+
+        self.blood.delete()
+        self.assertEqual(self.search('kidney'), [])
+
+        self.doctor.user.last_name = 'Sharma'
+        self.doctor.user.save()
+        doctors = DOCTOR_INDEX.filter(Doctor.objects.all(), 'sharma')
+        self.assertEqual(list(doctors), [self.doctor])
+
+    def test_rebuild(self):
+        Service.objects.filter(pk=self.heart.pk).update(name='Cardiac Screening')
+        self.assertEqual(self.search('cardiac'), [])
+        self.assertEqual(SERVICE_INDEX.rebuild(), 3)
+        self.assertEqual(self.search('cardiac'), [self.heart])
+
+    def test_service_list_orders_by_relevance(self):
+        response = self.client.get(reverse('service_list'), {'search': 'Heart'})
+        self.assertEqual(response.context['selected_sort'], 'relevance')
+        self.assertEqual(list(response.context['services']), [self.heart, self.blood])
+
+        response = self.client.get(reverse('service_list'), {'search': 'heart', 'sort': 'price_low'})
+        self.assertEqual(list(response.context['services']), [self.blood, self.heart])
+
+    def test_doctor_list_search(self):
+        for query in ('anita', 'cardio', 'rhythm'):
+            response = self.client.get(reverse('doctor_list'), {'search': query})
+            self.assertEqual(doctor_ids(response), [self.doctor.pk], query)
+        response = self.client.get(reverse('doctor_list'), {'search': 'dental'})
+        self.assertEqual(doctor_ids(response), [])
+
+
+class AutocompleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = Service.objects.create(name='Heart Screening', description='x', price=1500)
+        Service.objects.create(name='Hidden', description='x', price=100, is_active=False)
+        for username, last_name in (('dr_rai', 'Rai'), ('dr_rana', 'Rana')):
+            user = User.objects.create_user(
+                username=username, first_name='Anita', last_name=last_name, role='doctor',
+            )
+            Doctor.objects.create(user=user, specialization='Cardiology')
+        cls.doctor = Doctor.objects.get(user__username='dr_rai')
+
+    def setUp(self):
+        cache.clear()
+        autocomplete.reset()
+
+    def labels(self, query):
+        return [(result['kind'], result['label']) for result in autocomplete.search(query)]
+
+    def test_prefix_index(self):
+        index = PrefixIndex([
+            Suggestion(('service', 1), 'service', 'Blood Test', '/1/'),
+            Suggestion(('service', 2), 'service', 'Blöod Pressure', '/2/'),
+        ])
+        self.assertEqual([r['label'] for r in index.search('BLOOD')], ['Blöod Pressure', 'Blood Test'])
+        self.assertEqual([r['label'] for r in index.search('tes')], ['Blood Test'])
+        self.assertEqual(index.search(' '), [])
+
+        index.replace(('service', 1), [Suggestion(('service', 1), 'service', 'Urine Test', '/1/')])
+        self.assertEqual([r['label'] for r in index.search('test')], ['Urine Test'])
+        index.replace(('service', 2), [])
+        self.assertEqual(index.search('blood'), [])
+        self.assertEqual(len(index), 2)
+
+    def test_suggestions(self):
+        self.assertEqual(self.labels('ra'), [('doctor', 'Dr. Anita Rai'), ('doctor', 'Dr. Anita Rana')])
+        # One suggestion per specialization, however many doctors share it
+        self.assertEqual(self.labels('cardi'), [('specialization', 'Cardiology'), ('category', 'Cardiovascular Health')])
+        self.assertEqual(self.labels('scr'), [('service', 'Heart Screening')])
+        self.assertEqual(self.labels('hidden'), [])
+
+    def test_index_follows_changes(self):
+        with self.assertNumQueries(2):
+            autocomplete.search('heart')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.name = 'Cardiac Screening'
+            self.service.save()
+            self.doctor.user.last_name = 'Sharma'
+            self.doctor.user.save()
+        # Applied in place, not rebuilt
+        with self.assertNumQueries(0):
+            self.assertEqual(self.labels('heart'), [])
+            self.assertEqual(self.labels('cardiac'), [('service', 'Cardiac Screening')])
+            self.assertEqual(self.labels('sharma'), [('doctor', 'Dr. Anita Sharma')])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.delete()
+        self.assertEqual(self.labels('cardiac'), [])
+
+    def test_rebuilds_when_another_worker_changed_data(self):
+        autocomplete.search('heart')
+        cache.incr('autocomplete:version')
+        with override_settings(AUTOCOMPLETE_VERSION_CHECK_SECONDS=0), self.assertNumQueries(2):
+            autocomplete.search('heart')
+
+    def test_endpoint(self):
+        response = self.client.get(reverse('service_autocomplete'), {'q': 'an', 'limit': '1'})
+        self.assertEqual(response.json(), {
+            'query': 'an',
+            'results': [{
+                'kind': 'doctor', 'label': 'Dr. Anita Rai',
+                'url': reverse('doctor_profile', args=[self.doctor.pk]),
+            }],
+        })
+
+
+class FuzzySearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.skin = Service.objects.create(name='Dermatology Consultation', description='Skin checks', price=900)
+        cls.heart = Service.objects.create(name='Cardiology Consultation', description='Heart checks', price=1500)
+        user = User.objects.create_user(
+            username='dr_shrestha', first_name='Sita', last_name='Shrestha', role='doctor',
+        )
+        cls.doctor = Doctor.objects.create(user=user, specialization='Dermatology')
+        user = User.objects.create_user(
+            username='dr_thapa', first_name='Ram', last_name='Thapa', role='doctor',
+        )
+        Doctor.objects.create(user=user, specialization='Cardiology')
+        rebuild_cards()
+
+    def setUp(self):
+        cache.clear()
+        autocomplete.reset()
+
+    def test_trigram_index(self):
+        index = TrigramIndex([(('service', 1), ['blood', 'test']), (('service', 2), ['bone', 'scan'])])
+        # 'blod' and 'blood' share 4 of their 7 trigrams
+        self.assertEqual(index.search(['blod'], 0.2), {('service', 1): 4 / 7})
+        # Every query word counts towards the score; 'tset' is too far off
+        self.assertEqual(index.search(['blod', 'tset'], 0.2), {('service', 1): 2 / 7})
+        self.assertEqual(index.search(['xyz'], 0.2), {})
+
+        index.remove(('service', 1))
+        self.assertEqual(index.search(['blod'], 0.2), {})
+        self.assertEqual(len(index), 2)
+
+    def test_service_list_falls_back_to_similar_spellings(self):
+        response = self.client.get(reverse('service_list'), {'search': 'dermatolgy'})
+        self.assertTrue(response.context['fuzzy_fallback'])
+        self.assertEqual(list(response.context['services']), [self.skin])
+        self.assertEqual(response.context['total_services'], 1)
+
+        # Asked for explicitly, close spellings rank first
+        response = self.client.get(reverse('service_list'), {'search': 'cardiolgy consult', 'match': 'fuzzy'})
+        self.assertFalse(response.context['fuzzy_fallback'])
+        self.assertEqual(list(response.context['services']), [self.heart, self.skin])
+
+    def test_doctor_list_falls_back_to_similar_spellings(self):
+        response = self.client.get(reverse('doctor_list'), {'search': 'Sresta'})
+        self.assertTrue(response.context['fuzzy_fallback'])
+        self.assertEqual(doctor_ids(response), [self.doctor.pk])
+
+        response = self.client.get(reverse('doctor_list'), {'search': 'Shrestha'})
+        self.assertFalse(response.context['fuzzy_fallback'])
+        self.assertEqual(doctor_ids(response), [self.doctor.pk])
+
+
+class DoctorListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        patients = [User.objects.create_user(username=f'patient{i}') for i in range(3)]
+        cls.doctors = []
+        for i in range(12):
+            user = User.objects.create_user(username=f'dr{i}', first_name='Doc', last_name=f'Tor{i}', role='doctor')
+            doctor = Doctor.objects.create(user=user, specialization='Cardiology' if i % 3 else 'Dermatology')
+            for year in (2001, 2005, 2010):
+                Education.objects.create(doctor=doctor, degree='MBBS', institution='TU', year=year)
+                Experience.objects.create(doctor=doctor, position='Resident', hospital='Bir', start_year=year)
+            for n in range(4):
+                Service.objects.create(name=f'Service {i}.{n}', description='x', price=100, doctor=doctor)
+            Language.objects.create(doctor=doctor, name='Nepali')
+            cls.doctors.append(doctor)
+        for patient, rating in zip(patients, (5, 4, 4)):
+            submit_review(cls.doctors[0], patient, rating)
+        cls.patient = patients[0]
+        rebuild_cards()
+
+    def test_queries_do_not_grow_with_the_page(self):
+        # count, specialities, the page of cards
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('doctor_list'))
+        self.assertContains(response, 'Page 1 of 2')
+
+        first = response.context['doctors'][0].data
+        self.assertEqual(first['average_rating'], 4.3)
+        self.assertEqual(first['rating_count'], 3)
+        self.assertEqual(len(first['educations']), 2)
+        self.assertEqual(first['services'][0], {'id': self.doctors[0].services.first().pk, 'name': 'Service 0.0', 'price': '100.00'})
+        self.assertEqual(len(first['services']), 3)
+        self.assertEqual(response.context['doctors'][1].data['rating_count'], 0)
+
+    def test_name_changes_reach_doctors_of_any_role(self):
+        user = self.doctors[3].user
+        user.role = 'admin'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            user.save(update_fields=['last_login'])
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.last_name = 'Adhikari'
+            user.save(update_fields=['last_name'])
+        self.assertEqual(DoctorCard.objects.get(pk=self.doctors[3].pk).data['name'], 'Doc Adhikari')
+
+    def test_cards_follow_changes_once_committed(self):
+        doctor = self.doctors[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            Language.objects.create(doctor=doctor, name='Hindi')
+            doctor.user.first_name = 'Dina'
+            doctor.user.save()
+        card = DoctorCard.objects.get(pk=doctor.pk)
+        self.assertEqual(card.data['languages'], ['Nepali', 'Hindi'])
+        self.assertEqual(card.data['name'], 'Dina Tor1')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submit_review(doctor, self.patient, 5)
+        card.refresh_from_db()
+        self.assertEqual((card.data['rating_count'], card.data['average_rating']), (1, 5.0))
+        self.assertGreater(card.bayesian_rating, 3.5)
+
+        # A service moving to another doctor leaves the old card
+        service = doctor.services.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            service.doctor = self.doctors[2]
+            service.save()
+        self.assertNotIn(service.pk, [entry['id'] for entry in DoctorCard.objects.get(pk=doctor.pk).data['services']])
+        self.assertIn(service.pk, [entry['id'] for entry in DoctorCard.objects.get(pk=self.doctors[2].pk).data['services']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor.delete()
+        self.assertFalse(DoctorCard.objects.filter(pk=doctor.pk).exists())
+
+    def test_rebuild_command(self):
+        DoctorCard.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_doctor_cards', stdout=out)
+        self.assertIn('12 doctor cards rebuilt', out.getvalue())
+        self.assertEqual(DoctorCard.objects.count(), 12)
+
+    def test_speciality_and_search_filters(self):
+        response = self.client.get(reverse('doctor_list'), {'speciality': 'Dermatology'})
+        self.assertEqual(list(response.context['specialities']), ['Cardiology', 'Dermatology'])
+        self.assertEqual(doctor_ids(response), [doctor.pk for doctor in self.doctors[::3]])
+
+        response = self.client.get(reverse('doctor_list'), {'speciality': 'Cardiology', 'search': 'tor4', 'page': '1'})
+        self.assertEqual(doctor_ids(response), [self.doctors[4].pk])
+        self.assertEqual(response.context['filter_query'], 'speciality=Cardiology&search=tor4')
@@ -0,0 +1,94 @@
+"""
+Trigram index for typo-tolerant matching.
+
+Words are split into trigrams the way PostgreSQL's pg_trgm does it (two
+spaces before the word, one after), and the similarity of two words is the
+share of trigrams they have in common: |A & B| / |A | B|. "dermatolgy"
+and "dermatology" have 14 trigrams between them and share 9 (0.64).
+
+The index maps each trigram to the distinct words containing it and each
+word to the owners (e.g. ('doctor', 7)) whose text contains it, so a lookup
+only counts trigrams over the words that share at least one with the query.
+"""
+import math
+from collections import Counter, defaultdict
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex:
+
+    def __init__(self, entries=()):
+        # trigram -> words, word -> its trigrams, word -> owners, owner -> words
+        self._postings = defaultdict(set)
+        self._trigrams = {}
+        self._owners = defaultdict(set)
+        self._words = {}
+        for owner, words in entries:
+            self.add(owner, words)
+
+    def __len__(self):
+        return len(self._trigrams)
+
+    def add(self, owner, words):
+        words = set(words) | self._words.get(owner, set())
+        self._words[owner] = words
+        for word in words:
+            self._owners[word].add(owner)
+            if word not in self._trigrams:
+                self._trigrams[word] = trigrams(word)
+                for trigram in self._trigrams[word]:
+                    self._postings[trigram].add(word)
+
+    def remove(self, owner):
+        for word in self._words.pop(owner, ()):
+            owners = self._owners[word]
+            owners.discard(owner)
+            if not owners:
+                del self._owners[word]
+                for trigram in self._trigrams.pop(word):
+                    self._postings[trigram].discard(word)
+
+    def similar_words(self, word, threshold):
+        """(word, similarity) for indexed words at least ``threshold`` similar."""
+        wanted = trigrams(word)
+        size = len(wanted)
+        shared = Counter()
+        for trigram in wanted:
+            shared.update(self._postings.get(trigram, ()))
+        # |A & B| / |A | B| >= t needs at least t * |A| trigrams in common,
+        # which rules out most candidates before any division
+        least = math.ceil(threshold * size - 1e-9)
+        sizes = self._trigrams
+        return [
+            (candidate, similarity)
+            for candidate, count in shared.items()
+            if count >= least
+            for similarity in (count / (size + len(sizes[candidate]) - count),)
+            if similarity >= threshold
+        ]
+
+    def search(self, words, threshold, kind=None):
+        """
+        {owner: score} for owners similar to ``words``.
+
+        An owner scores the mean, over the query words, of its best
+        similarity to each; owners below ``threshold`` are left out.
+        """
+        words = list(words)
+        if not words:
+            return {}
+        totals = defaultdict(float)
+        for word in words:
+            best = {}
+            for candidate, similarity in self.similar_words(word, threshold):
+                for owner in self._owners[candidate]:
+                    if (kind is None or owner[0] == kind) and similarity > best.get(owner, 0):
+                        best[owner] = similarity
+            for owner, similarity in best.items():
+                totals[owner] += similarity
+        scores = {owner: total / len(words) for owner, total in totals.items()}
+        return {owner: score for owner, score in scores.items() if score >= threshold}
@@ -3,11 +3,14 @@ URL patterns for services app.
 """
 from django.urls import path
 from . import views
+from reviews import views as review_views
 
 urlpatterns = [
     path('', views.ServiceListView.as_view(), name='service_list'),
     path('<int:pk>/', views.ServiceDetailView.as_view(), name='service_detail'),
-    path("doctor/<int:doctor_id>/", views.doctor_profile, name="doctor_profile"),
+    path('autocomplete/', views.service_autocomplete, name='service_autocomplete'),
+    path("doctor/<int:doctor_id>/", review_views.doctor_profile, name="doctor_profile"),
+    path("doctor/<int:doctor_id>/reviews/", review_views.doctor_reviews, name="doctor_reviews"),
     path("doctors/", views.doctor_list, name="doctor_list"),
     
 
@@ -1,11 +1,18 @@
 """
 Views for displaying and managing services with search and filtering.
 """
-from django.shortcuts import render, get_object_or_404
+from django.core.paginator import Paginator
+from django.http import JsonResponse
+from django.shortcuts import render
 from django.views.generic import ListView, DetailView
-from django.db.models import Q
-from .models import Service , Doctor
-from django.db import models
+from django.utils.functional import cached_property
+from django.utils.http import urlencode
+from .autocomplete import DOCTOR_FUZZY, autocomplete
+from .facets import filter_services, normalize_filters, search_index, service_facets
+from .models import Service, DoctorCard
+from .search import DOCTOR_INDEX
+
+DOCTORS_PER_PAGE = 10
 
 
 class ServiceListView(ListView):
@@ -16,43 +23,36 @@ class ServiceListView(ListView):
     context_object_name = 'services'
     paginate_by = 9
     
+    fuzzy_fallback = False
+    
+    @cached_property
+    def filters(self):
+        filters = normalize_filters(self.request.GET)
+        if filters['search'] and not filters['match'] and not service_facets(filters)['total']:
+            # Nothing matched as typed; look for names spelled like it
+            filters = {**filters, 'match': 'fuzzy'}
+            self.fuzzy_fallback = True
+        return filters
+    
+    @cached_property
+    def facets(self):
+        return service_facets(self.filters)
+    
+    @property
+    def sort_by(self):
+        sort_by = self.request.GET.get('sort') or ('relevance' if self.filters['search'] else 'name')
+        if sort_by == 'relevance' and not self.filters['search']:
+            return 'name'
+        return sort_by
+    
     def get_queryset(self):
-        queryset = Service.objects.filter(is_active=True)
-        
-        # Search functionality
-        search_query = self.request.GET.get('search', '')
-        if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query) |
-                Q(description__icontains=search_query)
-            )
-        
-        # Category filter
-        category = self.request.GET.get('category', '')
-        if category:
-            queryset = queryset.filter(category=category)
-        
-        # Price range filter
-        min_price = self.request.GET.get('min_price', '')
-        max_price = self.request.GET.get('max_price', '')
+        queryset = filter_services(self.filters)
         
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
-        
-        # Duration filter
-        duration = self.request.GET.get('duration', '')
-        if duration == 'short':
-            queryset = queryset.filter(duration_minutes__lte=30)
-        elif duration == 'medium':
-            queryset = queryset.filter(duration_minutes__gt=30, duration_minutes__lte=60)
-        elif duration == 'long':
-            queryset = queryset.filter(duration_minutes__gt=60)
-        
-        # Sorting
-        sort_by = self.request.GET.get('sort', 'name')
-        if sort_by == 'price_low':
+        # Sorting; searches default to the best matches first
+        sort_by = self.sort_by
+        if sort_by == 'relevance':
+            queryset = search_index(self.filters).rank(queryset, self.filters['search']).order_by('search_rank', 'name')
+        elif sort_by == 'price_low':
             queryset = queryset.order_by('price')
         elif sort_by == 'price_high':
             queryset = queryset.order_by('-price')
@@ -63,28 +63,40 @@ class ServiceListView(ListView):
         
         return queryset
     
+    def get_paginator(self, *args, **kwargs):
+        paginator = super().get_paginator(*args, **kwargs)
+        # The facets already counted the results
+        paginator.count = self.facets['total']
+        return paginator
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        facets = self.facets
         
         # Pass filter parameters to template
         context['search_query'] = self.request.GET.get('search', '')
-        context['selected_category'] = self.request.GET.get('category', '')
-        context['min_price'] = self.request.GET.get('min_price', '')
-        context['max_price'] = self.request.GET.get('max_price', '')
-        context['selected_duration'] = self.request.GET.get('duration', '')
-        context['selected_sort'] = self.request.GET.get('sort', 'name')
-        
-        # Get all categories for filter dropdown
-        context['categories'] = Service.CATEGORY_CHOICES
+        context['selected_category'] = self.filters['category']
+        context['min_price'] = self.filters['min_price']
+        context['max_price'] = self.filters['max_price']
+        context['selected_duration'] = self.filters['duration']
+        context['selected_price'] = self.filters['price']
+        context['selected_sort'] = self.sort_by
+        context['fuzzy_search'] = self.filters['match'] == 'fuzzy'
+        context['fuzzy_fallback'] = self.fuzzy_fallback
         
-        # Get price range for filters
-        all_services = Service.objects.filter(is_active=True)
-        if all_services.exists():
-            context['min_service_price'] = all_services.order_by('price').first().price
-            context['max_service_price'] = all_services.order_by('-price').first().price
+        # Filter options with the number of services each would give
+        context['categories'] = facets['categories']
+        context['durations'] = facets['durations']
+        context['price_buckets'] = facets['prices']
+        context['min_service_price'] = facets['min_price']
+        context['max_service_price'] = facets['max_price']
+        context['total_services'] = facets['total']
         
-        # Get count of results
-        context['total_services'] = self.get_queryset().count()
+        # Filters carried over by the pagination links
+        context['filter_query'] = urlencode({
+            key: value for key, value in self.request.GET.items()
+            if key != 'page' and value
+        })
         
         return context
 
@@ -99,19 +111,56 @@ class ServiceDetailView(DetailView):
     def get_queryset(self):
         return Service.objects.filter(is_active=True)
 
-# Doctor Profile 
+def doctor_list(request):
+    # Best rated first, read from the precomputed cards (see cards.py)
+    doctors = DoctorCard.objects.order_by('-bayesian_rating', 'doctor_id')
 
-def doctor_profile(request, doctor_id):
-    doctor = get_object_or_404(Doctor, id=doctor_id)
+    # Speciality dropdown, and the doctors of the chosen one
+    specialities = (
+        DoctorCard.objects.exclude(specialization='')
+        .order_by('specialization').values_list('specialization', flat=True).distinct()
+    )
+    selected_speciality = request.GET.get('speciality', '')
+    if selected_speciality:
+        doctors = doctors.filter(specialization=selected_speciality)
 
-    return render(request, "doctor/doctor_profile.html", {
-        "doctor": doctor
-    })
+    # Search by name, specialization or bio, best matches first
+    search_query = request.GET.get('search', '').strip()
+    fuzzy_search = request.GET.get('match') == 'fuzzy'
+    fuzzy_fallback = False
+    if search_query:
+        index = DOCTOR_FUZZY if fuzzy_search else DOCTOR_INDEX
+        results = index.rank(doctors, search_query).order_by('search_rank', '-bayesian_rating', 'doctor_id')
+        if not fuzzy_search and not results.exists():
+            # Nothing matched as typed; look for names spelled like it
+            results = DOCTOR_FUZZY.rank(doctors, search_query).order_by('search_rank', '-bayesian_rating', 'doctor_id')
+            fuzzy_search = fuzzy_fallback = True
+        doctors = results
 
-def doctor_list(request):
-    doctors = Doctor.objects.all()
+    page = Paginator(doctors, DOCTORS_PER_PAGE).get_page(request.GET.get('page'))
 
     return render(request, "doctor/doctor_list.html", {
-        "doctors": doctors
+        "doctors": page.object_list,
+        "page_obj": page,
+        "is_paginated": page.has_other_pages(),
+        "specialities": specialities,
+        "selected_speciality": selected_speciality,
+        "search_query": search_query,
+        "fuzzy_search": fuzzy_search,
+        "fuzzy_fallback": fuzzy_fallback,
+        # Filters carried over by the pagination links
+        "filter_query": urlencode({
+            key: value for key, value in request.GET.items()
+            if key in ('speciality', 'search', 'match') and value
+        }),
     })
 
+
+def service_autocomplete(request):
+    """JSON suggestions for the search box: services, doctors, specializations, categories."""
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), 20))
+    except ValueError:
+        limit = 10
+    query = request.GET.get('q', '')
+    return JsonResponse({'query': query, 'results': autocomplete.search(query, limit)})
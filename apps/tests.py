@@ -0,0 +1,404 @@
+"""
+Project-wide tests: query budgets for pages and admin changelists, plus the
+database settings and routing in config/.
+
+Each named URL is rendered as a patient, an admin and a doctor against a
+realistic data set, and the number of queries is checked against the
+budget declared in QUERY_BUDGETS. When a budget is exceeded the failure
+lists every SQL statement the view ran, so the N+1 is easy to spot.
+
+New URLs must be given a budget (or listed in SKIPPED_URLS with a reason).
+Admin changelists are budgeted the same way in ADMIN_CHANGELIST_BUDGETS.
+"""
+import os
+import sqlite3
+import tempfile
+from datetime import time, timedelta
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.conf import settings
+from django.apps import apps
+from django.contrib import admin
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.appointments.management.commands.sync_replicas import copy_database
+from apps.appointments.models import (
+    Appointment, ArchivedAppointment, Notification, Payment, TimeSlot, Weekday,
+)
+from apps.services.models import Doctor, Education, Experience, Language, Service
+from apps.webhooks.models import WebhookDeadLetter, WebhookDelivery, WebhookEndpoint
+from config.admin_tools import EstimatedCountPaginator
+from config.routers import (
+    STICKY_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware, pin_to_primary, use_replicas,
+)
+
+# Maximum queries per URL name, whatever the role. Every request pays for
+# the session and user lookups and, with SESSION_SAVE_EVERY_REQUEST, three
+# more to save the session.
+QUERY_BUDGETS = {
+    'home': 5,
+    'register': 5,
+    'login': 5,
+    'logout': 4,
+    'profile': 5,
+    'profile_edit': 5,
+    'change_password': 5,
+    'user_dashboard': 8,
+    'admin_dashboard': 9,
+    'doctor_dashboard': 8,
+    'mark_notifications_read': 6,
+    'appointment_list': 6,
+    'appointment_create': 6,
+    'appointment_detail': 8,
+    'appointment_update': 7,
+    'appointment_delete': 7,
+    # Saves the appointment: rollups, notification, the doctor whose agenda
+    # to invalidate, webhook endpoints
+    'appointment_approve': 19,
+    'appointment_reject': 19,
+    'download_receipt': 9,
+    'service_list': 7,
+    # Includes building the worker's prefix index on first use
+    'service_autocomplete': 6,
+    'service_detail': 6,
+    # Renders and caches the profile: the doctor and user, four prefetches
+    # and the first page of reviews; then only whether the user reviewed
+    'doctor_profile': 12,
+    # The doctor's first page of reviews with their patients
+    'doctor_reviews': 5,
+    # Count, specialities and the page of precomputed cards
+    'doctor_list': 8,
+}
+
+SKIPPED_URLS = {
+    'khalti_payment': 'calls the Khalti gateway',
+    'khalti_payment_response': 'calls the Khalti gateway',
+}
+
+ROLES = ('user', 'admin', 'doctor')
+
+# Pages scoped to the patient's own appointments 404 for everyone else
+URL_ROLES = {
+    'appointment_detail': ('user',),
+    'appointment_update': ('user',),
+    'appointment_delete': ('user',),
+    'download_receipt': ('user',),
+}
+
+
+def named_urls(patterns=None):
+    """Yield the name of every named URL pattern, outside the Django admin."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if getattr(pattern, 'app_name', None) == 'admin':
+                continue
+            yield from named_urls(pattern.url_patterns)
+        elif pattern.name:
+            yield pattern.name
+
+
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            'user': User.objects.create_user(username='patient', password='pass', email='p@example.com'),
+            'admin': User.objects.create_user(username='boss', password='pass', role='admin', is_staff=True),
+            'doctor': User.objects.create_user(username='doc', password='pass', role='doctor'),
+        }
+        weekdays = [Weekday.objects.create(day=day) for day in range(7)]
+
+        doctors = [Doctor.objects.create(user=cls.users['doctor'], specialization='Cardiology', bio='Heart')]
+        for i in range(5):
+            user = User.objects.create_user(username=f'doctor{i}', first_name='Doc', last_name=f'No{i}', role='doctor')
+            doctors.append(Doctor.objects.create(user=user, specialization=f'Speciality {i % 3}'))
+        for doctor in doctors:
+            for j in range(3):
+                Education.objects.create(doctor=doctor, degree=f'MBBS {j}', institution='TU', year=2000 + j)
+                Experience.objects.create(doctor=doctor, position='Consultant', hospital=f'H{j}', start_year=2010)
+            Language.objects.create(doctor=doctor, name='English')
+            Language.objects.create(doctor=doctor, name='Nepali')
+
+        cls.services = []
+        for i in range(12):
+            service = Service.objects.create(
+                name=f'Service {i}', description='Description', price=Decimal('500.00') + i,
+                duration_minutes=15 * (i % 6 + 1), doctor=doctors[i % len(doctors)],
+                category=Service.CATEGORY_CHOICES[i % 5][0],
+            )
+            slot = TimeSlot.objects.create(service=service, start_time=time(9), end_time=time(17))
+            slot.day_of_week.set(weekdays)
+            cls.services.append(service)
+
+        today = timezone.localdate()
+        statuses = ['pending', 'approved', 'rejected', 'completed']
+        for i in range(24):
+            Appointment.objects.create(
+                user=cls.users['user'], service=cls.services[i % 12],
+                appointment_date=today + timedelta(days=i - 6), appointment_time=time(9 + i % 8),
+                status=statuses[i % 4],
+            )
+        cls.appointment = Appointment.objects.filter(user=cls.users['user'], status='pending').first()
+        cls.paid = Appointment.objects.filter(user=cls.users['user'], status='approved').first()
+        Payment.objects.create(
+            appointment=cls.paid, amount=cls.paid.service.price,
+            status=Payment.Status.SUCCESS, transaction_id='T1', paid_at=timezone.now(),
+        )
+        for i in range(5):
+            Notification.objects.create(user=cls.users['user'], message=f'Note {i}')
+
+        cls.doctor = doctors[0]
+
+    def url_for(self, name):
+        kwargs = {
+            'appointment_detail': {'pk': self.appointment.pk},
+            'appointment_update': {'pk': self.appointment.pk},
+            'appointment_delete': {'pk': self.appointment.pk},
+            'appointment_approve': {'pk': self.appointment.pk},
+            'appointment_reject': {'pk': self.appointment.pk},
+            'download_receipt': {'appointment_id': self.paid.pk},
+            'service_detail': {'pk': self.services[0].pk},
+            'doctor_profile': {'doctor_id': self.doctor.pk},
+            'doctor_reviews': {'doctor_id': self.doctor.pk},
+        }.get(name, {})
+        return reverse(name, kwargs=kwargs)
+
+    def test_every_url_has_a_budget(self):
+        missing = set(named_urls()) - set(QUERY_BUDGETS) - set(SKIPPED_URLS)
+        self.assertFalse(missing, f'Declare a query budget for: {sorted(missing)}')
+
+    def test_query_budgets(self):
+        for role in ROLES:
+            for name in sorted(set(named_urls()) - set(SKIPPED_URLS)):
+                if role not in URL_ROLES.get(name, ROLES):
+                    continue
+                with self.subTest(role=role, url=name):
+                    self.client.force_login(self.users[role])
+                    url = self.url_for(name)
+                    with CaptureQueriesContext(connection) as ctx:
+                        response = self.client.get(url)
+                    self.assertLess(response.status_code, 400, f'{url} returned {response.status_code}')
+
+                    budget = QUERY_BUDGETS.get(name, 0)
+                    if len(ctx) > budget:
+                        queries = '\n'.join(
+                            f"{i}. {query['sql']}" for i, query in enumerate(ctx.captured_queries, 1)
+                        )
+                        self.fail(f'{url} as {role}: {len(ctx)} queries (budget {budget})\n{queries}')
+
+
+@skipUnless(connection.vendor == 'sqlite' and settings.SQLITE_PRODUCTION_MODE, 'SQLite production mode only')
+class SQLiteProductionModeTests(TestCase):
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_pragmas(self):
+        self.assertEqual(self.pragma('busy_timeout'), settings.SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('cache_size'), settings.SQLITE_PRAGMAS['cache_size'])
+
+    def test_write_transactions_begin_immediate(self):
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def read_db(self):
+        return self.router.db_for_read(Service)
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.read_db(), 'default')
+
+    def test_reads_use_replica_until_first_write(self):
+        with use_replicas():
+            self.assertEqual(self.read_db(), 'replica')
+            self.assertEqual(self.router.db_for_write(Service), 'default')
+            self.assertEqual(self.read_db(), 'default')
+        self.assertEqual(self.read_db(), 'default')
+
+    def test_pin_to_primary(self):
+        with use_replicas():
+            with pin_to_primary():
+                self.assertEqual(self.read_db(), 'default')
+            self.assertEqual(self.read_db(), 'replica')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        with use_replicas():
+            self.assertEqual(self.read_db(), 'default')
+
+    def test_only_primary_is_migrated(self):
+        self.assertTrue(self.router.allow_migrate('default', 'services'))
+        self.assertFalse(self.router.allow_migrate('replica', 'services'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    # Not TestCase: its wrapping transaction would pin every read to the primary
+    databases = {'default'}
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+
+    def handle(self, request, write=False):
+        seen = {}
+
+        def view(request):
+            seen['read'] = self.router.db_for_read(Service)
+            if write:
+                self.router.db_for_write(Service)
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen['read'], response
+
+    def test_get_reads_from_replica(self):
+        db, response = self.handle(self.factory.get('/'))
+        self.assertEqual(db, 'replica')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_post_is_pinned_and_makes_client_sticky(self):
+        db, response = self.handle(self.factory.post('/'), write=True)
+        self.assertEqual(db, 'default')
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], settings.REPLICA_STICKY_SECONDS)
+
+    def test_sticky_client_reads_from_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        db, response = self.handle(request)
+        self.assertEqual(db, 'default')
+
+    def test_reads_inside_transaction_use_primary(self):
+        with use_replicas(), transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Service), 'default')
+
+
+class SyncReplicasTests(SimpleTestCase):
+
+    def test_copy_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'primary.sqlite3')
+            target = os.path.join(directory, 'replica.sqlite3')
+            conn = sqlite3.connect(source)
+            conn.execute('CREATE TABLE t (x INTEGER)')
+            conn.execute('INSERT INTO t VALUES (42)')
+            conn.commit()
+            conn.close()
+
+            copy_database(source, target)
+
+            conn = sqlite3.connect(target)
+            self.assertEqual(conn.execute('SELECT x FROM t').fetchall(), [(42,)])
+            conn.close()
+
+
+# Session, user, permissions, count, rows and the session save; the
+# changelists listed here also run their date_hierarchy and list_filter queries
+ADMIN_CHANGELIST_DEFAULT_BUDGET = 8
+ADMIN_CHANGELIST_BUDGETS = {
+    'appointments.Appointment': 11,
+    'appointments.ArchivedAppointment': 10,
+    'appointments.TimeSlot': 9,
+    'webhooks.WebhookDelivery': 9,
+    'webhooks.WebhookDeadLetter': 9,
+}
+
+# Tables small enough for their admin search to stay a substring scan
+UNINDEXED_SEARCH = {'webhooks.WebhookEndpoint'}
+
+
+class AdminChangelistQueryTests(TestCase):
+    """Every changelist runs a fixed number of queries, however many rows it shows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        QueryBudgetTests.setUpTestData.__func__(cls)
+        cls.superuser = User.objects.create_superuser(username='root', password='pass', email='r@example.com')
+        endpoint = WebhookEndpoint.objects.create(name='Hook', url='http://example.com/hook', events=['payment.completed'])
+        for i in range(3):
+            WebhookDelivery.objects.create(endpoint=endpoint, event='payment.completed', payload={'i': i})
+            WebhookDeadLetter.objects.create(
+                endpoint=endpoint, event='payment.completed', payload={'i': i},
+                attempts=8, created_at=timezone.now(),
+            )
+        archived = list(Appointment.objects.filter(status='completed'))
+        for appointment in archived:
+            ArchivedAppointment.objects.create(
+                id=appointment.pk, user=appointment.user, service=appointment.service,
+                appointment_date=appointment.appointment_date, appointment_time=appointment.appointment_time,
+                status='completed', created_at=appointment.created_at, updated_at=appointment.updated_at,
+            )
+
+    def changelists(self):
+        for model in admin.site._registry:
+            opts = model._meta
+            yield opts.label, reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+
+    def test_changelist_query_counts(self):
+        self.client.force_login(self.superuser)
+        for label, url in self.changelists():
+            with self.subTest(model=label):
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                budget = ADMIN_CHANGELIST_BUDGETS.get(label, ADMIN_CHANGELIST_DEFAULT_BUDGET)
+                if len(ctx) > budget:
+                    queries = '\n'.join(
+                        f"{i}. {query['sql']}" for i, query in enumerate(ctx.captured_queries, 1)
+                    )
+                    self.fail(f'{label} changelist: {len(ctx)} queries (budget {budget})\n{queries}')
+
+    @skipUnless(connection.vendor == 'sqlite', 'Estimates come from sqlite_stat1')
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=1)
+    def test_estimated_count_paginator(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        analyzed = User.objects.count()
+        User.objects.create_user(username='late')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(EstimatedCountPaginator(User.objects.all(), 10).count, analyzed)
+        # Filtered changelists still get an exact count
+        self.assertEqual(EstimatedCountPaginator(User.objects.filter(username='late'), 10).count, 1)
+        with override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=10 ** 6):
+            self.assertEqual(EstimatedCountPaginator(User.objects.all(), 10).count, analyzed + 1)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Query plans are checked on SQLite')
+    def test_search_uses_indexes(self):
+        self.client.force_login(self.superuser)
+        for label, url in self.changelists():
+            model = apps.get_model(label)
+            if (
+                not model.__module__.startswith('apps.')
+                or label in UNINDEXED_SEARCH
+                or not admin.site._registry[model].search_fields
+            ):
+                continue
+            with self.subTest(model=label):
+                with CaptureQueriesContext(connection) as ctx:
+                    self.client.get(url, {'q': 'pat'})
+                searches = [q['sql'] for q in ctx.captured_queries if ' LIKE ' in q['sql']]
+                self.assertTrue(searches)
+                with connection.cursor() as cursor:
+                    for sql in searches:
+                        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                        plan = [row[-1] for row in cursor.fetchall()]
+                        scans = [step for step in plan if step.startswith('SCAN') and 'USING' not in step]
+                        self.assertFalse(scans, f'Full scan in {plan} for:\n{sql}')
@@ -0,0 +1,47 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from config.admin_tools import EstimatedCountPaginator
+
+from .models import WebhookDeadLetter, WebhookDelivery, WebhookEndpoint
+
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'url', 'max_concurrency', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'url')
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('event', 'endpoint', 'status', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = ('status', 'event')
+    list_select_related = ('endpoint',)
+    readonly_fields = ('created_at', 'delivered_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(WebhookDeadLetter)
+class WebhookDeadLetterAdmin(admin.ModelAdmin):
+    list_display = ('event', 'endpoint', 'attempts', 'last_error', 'failed_at')
+    list_filter = ('event',)
+    list_select_related = ('endpoint',)
+    actions = ['requeue']
+
+    def requeue(self, request, queryset):
+        """Move dead letters back onto the delivery queue."""
+        WebhookDelivery.objects.bulk_create([
+            WebhookDelivery(
+                endpoint_id=letter.endpoint_id,
+                event=letter.event,
+                payload=letter.payload,
+                next_attempt_at=timezone.now(),
+            )
+            for letter in queryset
+        ])
+        count = queryset.count()
+        queryset.delete()
+        self.message_user(request, f'{count} delivery(ies) requeued.')
+    requeue.short_description = 'Requeue selected deliveries'
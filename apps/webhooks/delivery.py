@@ -0,0 +1,215 @@
+"""
+Webhook delivery.
+
+Events are written to WebhookDelivery in the same transaction as the
+change that produced them. `deliver_due()` then sends due rows in
+batches. A batch is claimed first by pushing its next_attempt_at
+WEBHOOK_CLAIM_SECONDS ahead, so concurrent workers never send the same
+row; if a worker dies, its rows become due again once the claim runs out.
+Deliveries are grouped by endpoint, each endpoint gets its own
+thread pool sized by ``max_concurrency``, and the results are written back
+from the calling thread. Failed deliveries are retried with exponential
+backoff and moved to WebhookDeadLetter after WEBHOOK_MAX_ATTEMPTS.
+"""
+import hashlib
+import hmac
+import json
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import WebhookDeadLetter, WebhookDelivery, WebhookEndpoint
+
+
+def enqueue(event, data):
+    """Queue ``event`` for every active endpoint subscribed to it."""
+    return enqueue_many(event, [data])
+
+
+def enqueue_many(event, rows):
+    """
+    Queue one ``event`` per item of ``rows`` for every subscribed endpoint,
+    with one endpoint query and one insert however many rows there are.
+    """
+    if not rows:
+        return []
+    endpoints = [
+        endpoint for endpoint in WebhookEndpoint.objects.filter(is_active=True)
+        if endpoint.is_subscribed(event)
+    ]
+    if not endpoints:
+        return []
+    created_at = timezone.now().isoformat()
+    return WebhookDelivery.objects.bulk_create([
+        WebhookDelivery(
+            endpoint=endpoint,
+            event=event,
+            payload={'event': event, 'created_at': created_at, 'data': data},
+        )
+        for data in rows
+        for endpoint in endpoints
+    ])
+
+
+def appointment_status_data(appointment, old_status):
+    """Payload data of an appointment.status_changed event."""
+    return {
+        'appointment_id': appointment.pk,
+        'user_id': appointment.user_id,
+        'service_id': appointment.service_id,
+        'appointment_date': str(appointment.appointment_date),
+        'appointment_time': str(appointment.appointment_time),
+        'old_status': old_status,
+        'status': appointment.status,
+    }
+
+
+def sign(secret, timestamp, body):
+    """HMAC-SHA256 signature over ``"<timestamp>.<body>"``."""
+    message = f"{timestamp}.".encode() + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def backoff_delay(attempts):
+    """Delay before the next attempt, doubling each time with 10% jitter."""
+    delay = settings.WEBHOOK_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1))
+    delay = min(delay, settings.WEBHOOK_BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(1, 1.1))
+
+
+def _post(session, delivery):
+    """Send one delivery. Returns an error string, or '' on success."""
+    body = json.dumps(delivery.payload, separators=(',', ':')).encode()
+    timestamp = str(int(time.time()))
+    headers = {
+        'Content-Type': 'application/json',
+        'X-Webhook-Event': delivery.event,
+        'X-Webhook-Delivery': str(delivery.pk),
+        'X-Webhook-Timestamp': timestamp,
+        'X-Webhook-Signature': f"sha256={sign(delivery.endpoint.secret, timestamp, body)}",
+    }
+    try:
+        response = session.post(
+            delivery.endpoint.url,
+            data=body,
+            headers=headers,
+            timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+        )
+    except requests.RequestException as exc:
+        return f"{exc.__class__.__name__}: {exc}"
+    if response.status_code >= 300:
+        return f"HTTP {response.status_code}"
+    return ''
+
+
+def _send_to_endpoint(endpoint, deliveries):
+    """Send ``deliveries`` with at most ``endpoint.max_concurrency`` in flight."""
+    workers = max(1, min(endpoint.max_concurrency, len(deliveries)))
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_maxsize=workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            errors = list(executor.map(lambda delivery: _post(session, delivery), deliveries))
+    return list(zip(deliveries, errors))
+
+
+def _record_results(results, now):
+    delivered = [delivery.pk for delivery, error in results if not error]
+    failed = [(delivery, error) for delivery, error in results if error]
+
+    with transaction.atomic():
+        if delivered:
+            WebhookDelivery.objects.filter(pk__in=delivered).update(
+                status=WebhookDelivery.Status.DELIVERED,
+                delivered_at=now,
+            )
+
+        retry, dead = [], []
+        for delivery, error in failed:
+            delivery.attempts += 1
+            delivery.last_error = error
+            if delivery.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                dead.append(delivery)
+            else:
+                delivery.next_attempt_at = now + backoff_delay(delivery.attempts)
+                retry.append(delivery)
+
+        if retry:
+            WebhookDelivery.objects.bulk_update(retry, ['attempts', 'last_error', 'next_attempt_at'])
+        if dead:
+            WebhookDeadLetter.objects.bulk_create([
+                WebhookDeadLetter(
+                    endpoint_id=delivery.endpoint_id,
+                    event=delivery.event,
+                    payload=delivery.payload,
+                    attempts=delivery.attempts,
+                    last_error=delivery.last_error,
+                    created_at=delivery.created_at,
+                )
+                for delivery in dead
+            ])
+            WebhookDelivery.objects.filter(pk__in=[delivery.pk for delivery in dead]).delete()
+
+    return len(delivered), len(retry), len(dead)
+
+
+def claim_due(batch_size=None, now=None):
+    """Claim and return one batch of due deliveries for this worker."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        due = list(
+            WebhookDelivery.objects
+            .filter(status=WebhookDelivery.Status.PENDING, next_attempt_at__lte=now)
+            .select_related('endpoint')
+            .select_for_update(skip_locked=True, of=('self',))
+            .order_by('next_attempt_at')[:batch_size or settings.WEBHOOK_BATCH_SIZE]
+        )
+        if not due:
+            return []
+        pks = [delivery.pk for delivery in due]
+        claimed_until = timezone.now() + timedelta(seconds=settings.WEBHOOK_CLAIM_SECONDS)
+        claimed = WebhookDelivery.objects.filter(
+            pk__in=pks, status=WebhookDelivery.Status.PENDING, next_attempt_at__lte=now,
+        ).update(next_attempt_at=claimed_until)
+        if claimed != len(due):
+            # Without row locks (SQLite) another worker can claim rows
+            # between the select and the update; keep only ours
+            ours = set(
+                WebhookDelivery.objects.filter(pk__in=pks, next_attempt_at=claimed_until)
+                .values_list('pk', flat=True)
+            )
+            due = [delivery for delivery in due if delivery.pk in ours]
+    return due
+
+
+def deliver_due(batch_size=None, now=None):
+    """
+    Claim and send one batch of due deliveries.
+
+    Returns ``(delivered, retrying, dead)`` counts.
+    """
+    due = claim_due(batch_size, now)
+    if not due:
+        return 0, 0, 0
+
+    by_endpoint = defaultdict(list)
+    for delivery in due:
+        by_endpoint[delivery.endpoint_id].append(delivery)
+
+    with ThreadPoolExecutor(max_workers=len(by_endpoint)) as executor:
+        futures = [
+            executor.submit(_send_to_endpoint, deliveries[0].endpoint, deliveries)
+            for deliveries in by_endpoint.values()
+        ]
+        results = [result for future in futures for result in future.result()]
+
+    return _record_results(results, timezone.now())
@@ -0,0 +1,61 @@
+"""
+Management command to measure webhook delivery throughput.
+Usage: python manage.py bench_webhooks [--count 2000] [--endpoints 2] [--concurrency 8]
+
+Delivers to a local receiver stub inside a transaction that is rolled back,
+so no data is kept.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.webhooks.delivery import deliver_due, enqueue
+from apps.webhooks.models import WebhookEndpoint
+from apps.webhooks.receiver import LocalReceiver
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks webhook delivery throughput against a local receiver'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=2000, help='Events to enqueue')
+        parser.add_argument('--endpoints', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=8, help='max_concurrency per endpoint')
+        parser.add_argument('--batch-size', type=int, default=settings.WEBHOOK_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        with LocalReceiver() as receiver:
+            try:
+                with transaction.atomic():
+                    WebhookEndpoint.objects.update(is_active=False)
+                    for i in range(options['endpoints']):
+                        WebhookEndpoint.objects.create(
+                            name=f'bench-{i}',
+                            url=receiver.url,
+                            max_concurrency=options['concurrency'],
+                        )
+                    for i in range(options['count']):
+                        enqueue(WebhookEndpoint.EVENT_PAYMENT_COMPLETED, {'payment_id': i})
+
+                    started = time.perf_counter()
+                    delivered = 0
+                    while True:
+                        sent, retrying, dead = deliver_due(batch_size=options['batch_size'])
+                        delivered += sent
+                        if not (sent or retrying or dead):
+                            break
+                    elapsed = time.perf_counter() - started
+                    raise Rollback
+            except Rollback:
+                pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {delivered} delivery(ies) in {elapsed:.2f}s ({delivered / elapsed:.0f}/s, '
+            f'{options["endpoints"]} endpoint(s) × {options["concurrency"]} concurrent)'
+        ))
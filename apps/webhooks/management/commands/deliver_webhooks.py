@@ -0,0 +1,42 @@
+"""
+Management command to deliver queued webhooks.
+Usage: python manage.py deliver_webhooks [--interval 5]
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.webhooks.delivery import deliver_due
+
+
+class Command(BaseCommand):
+    help = 'Delivers due webhook events to subscribed endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.WEBHOOK_BATCH_SIZE,
+            help='Deliveries sent per batch',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep running, polling every N seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            while True:
+                delivered, retrying, dead = deliver_due(batch_size=options['batch_size'])
+                if delivered or retrying or dead:
+                    self.stdout.write(
+                        f'Delivered {delivered}, retrying {retrying}, dead-lettered {dead}.'
+                    )
+                if delivered + retrying + dead < options['batch_size']:
+                    break
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
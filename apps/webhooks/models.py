@@ -0,0 +1,97 @@
+"""
+Outbound webhook subscriptions, the delivery queue and the dead-letter table.
+"""
+import secrets
+
+from django.db import models
+from django.utils import timezone
+
+
+def generate_secret():
+    return secrets.token_hex(32)
+
+
+class WebhookEndpoint(models.Model):
+    """A receiver subscribed to one or more events."""
+
+    EVENT_APPOINTMENT_STATUS_CHANGED = 'appointment.status_changed'
+    EVENT_PAYMENT_COMPLETED = 'payment.completed'
+    EVENT_CHOICES = (
+        (EVENT_APPOINTMENT_STATUS_CHANGED, 'Appointment status changed'),
+        (EVENT_PAYMENT_COMPLETED, 'Payment completed'),
+    )
+
+    name = models.CharField(max_length=100)
+    url = models.URLField(max_length=500)
+    secret = models.CharField(
+        max_length=64,
+        default=generate_secret,
+        help_text='Shared secret used to sign payloads (HMAC-SHA256)'
+    )
+    events = models.JSONField(
+        default=list,
+        blank=True,
+        help_text='Subscribed event names; leave empty to receive every event'
+    )
+    max_concurrency = models.PositiveSmallIntegerField(
+        default=4,
+        help_text='Maximum requests in flight to this endpoint'
+    )
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.url})"
+
+    def is_subscribed(self, event):
+        return not self.events or event in self.events
+
+
+class WebhookDelivery(models.Model):
+    """One event queued for one endpoint."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        DELIVERED = "delivered", "Delivered"
+
+    endpoint = models.ForeignKey(
+        WebhookEndpoint,
+        on_delete=models.CASCADE,
+        related_name='deliveries'
+    )
+    event = models.CharField(max_length=50)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'Webhook deliveries'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='webhook_delivery_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} → {self.endpoint.name} ({self.status})"
+
+
+class WebhookDeadLetter(models.Model):
+    """A delivery that ran out of attempts."""
+
+    endpoint = models.ForeignKey(
+        WebhookEndpoint,
+        on_delete=models.CASCADE,
+        related_name='dead_letters'
+    )
+    event = models.CharField(max_length=50)
+    payload = models.JSONField()
+    attempts = models.PositiveSmallIntegerField()
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    failed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.event} → {self.endpoint.name} (dead)"
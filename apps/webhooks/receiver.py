@@ -0,0 +1,64 @@
+"""
+Local webhook receiver stub used by the tests and the delivery benchmark.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class LocalReceiver:
+    """
+    HTTP server on 127.0.0.1 that records every POST it receives.
+
+    ``status`` is the response code returned for each request, so tests can
+    simulate a failing receiver.
+
+        with LocalReceiver() as receiver:
+            endpoint.url = receiver.url
+            ...
+            receiver.requests  # [(headers, payload), ...]
+    """
+
+    def __init__(self, status=200):
+        self.status = status
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = _Server(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/hook"
+
+    def _handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like a real receiver
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with receiver._lock:
+                    receiver.requests.append((dict(self.headers), json.loads(body), body))
+                self.send_response(receiver.status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
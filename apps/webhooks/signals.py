@@ -0,0 +1,27 @@
+"""
+Queue webhook deliveries for appointment and payment events.
+"""
+from django.dispatch import receiver
+
+from apps.appointments.signals import appointment_status_changed, payment_completed
+
+from .delivery import appointment_status_data, enqueue
+from .models import WebhookEndpoint
+
+
+@receiver(appointment_status_changed)
+def queue_appointment_status_changed(sender, appointment, old_status, **kwargs):
+    # Single saves; bulk_set_status() and the sweeper queue their rows with enqueue_many()
+    enqueue(WebhookEndpoint.EVENT_APPOINTMENT_STATUS_CHANGED, appointment_status_data(appointment, old_status))
+
+
+@receiver(payment_completed)
+def queue_payment_completed(sender, payment, **kwargs):
+    enqueue(WebhookEndpoint.EVENT_PAYMENT_COMPLETED, {
+        'payment_id': payment.pk,
+        'appointment_id': payment.appointment_id,
+        'method': payment.method,
+        'amount': str(payment.amount),
+        'transaction_id': payment.transaction_id,
+        'paid_at': payment.paid_at.isoformat() if payment.paid_at else None,
+    })
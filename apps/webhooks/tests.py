@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.appointments.models import Appointment
+from apps.appointments.stats import bulk_set_status
+from apps.appointments.sweeper import sweep
+from apps.services.models import Service
+
+from .delivery import claim_due, deliver_due, sign
+from .models import WebhookDeadLetter, WebhookDelivery, WebhookEndpoint
+from .receiver import LocalReceiver
+
+User = get_user_model()
+
+
+class WebhookDeliveryTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username='patient', password='pass')
+        service = Service.objects.create(name='Checkup', description='x', price=100)
+        self.appointment = Appointment.objects.create(
+            user=user, service=service,
+            appointment_date=timezone.localdate() + timedelta(days=1), appointment_time='09:00',
+        )
+
+    def subscribe(self, url, **kwargs):
+        return WebhookEndpoint.objects.create(name='ehr', url=url, **kwargs)
+
+    def approve(self):
+        self.appointment.status = 'approved'
+        self.appointment.save()
+
+    def test_status_change_is_delivered_signed(self):
+        with LocalReceiver() as receiver:
+            endpoint = self.subscribe(receiver.url)
+            self.approve()
+            self.assertEqual(deliver_due(), (1, 0, 0))
+
+        headers, payload, body = receiver.requests[0]
+        self.assertEqual(payload['event'], 'appointment.status_changed')
+        self.assertEqual(payload['data']['old_status'], 'pending')
+        self.assertEqual(payload['data']['status'], 'approved')
+        self.assertEqual(
+            headers['X-Webhook-Signature'],
+            'sha256=' + sign(endpoint.secret, headers['X-Webhook-Timestamp'], body),
+        )
+        self.assertEqual(WebhookDelivery.objects.get().status, WebhookDelivery.Status.DELIVERED)
+
+    def test_unsubscribed_endpoint_gets_nothing(self):
+        self.subscribe('http://127.0.0.1:9/hook', events=[WebhookEndpoint.EVENT_PAYMENT_COMPLETED])
+        self.approve()
+        self.assertFalse(WebhookDelivery.objects.exists())
+
+    @override_settings(WEBHOOK_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_dead_letter(self):
+        with LocalReceiver(status=500) as receiver:
+            self.subscribe(receiver.url)
+            self.approve()
+
+            self.assertEqual(deliver_due(), (0, 1, 0))
+            delivery = WebhookDelivery.objects.get()
+            self.assertEqual(delivery.attempts, 1)
+            self.assertGreater(delivery.next_attempt_at, timezone.now())
+            self.assertEqual(deliver_due(), (0, 0, 0))
+
+            self.assertEqual(deliver_due(now=delivery.next_attempt_at), (0, 0, 1))
+
+        self.assertFalse(WebhookDelivery.objects.exists())
+        letter = WebhookDeadLetter.objects.get()
+        self.assertEqual(letter.attempts, 2)
+        self.assertEqual(letter.last_error, 'HTTP 500')
+
+    def test_bulk_status_changes_are_queued(self):
+        self.subscribe('http://127.0.0.1:9/hook')
+        bulk_set_status(Appointment.objects.all(), 'approved')
+        bulk_set_status(Appointment.objects.all(), 'approved')
+        payload = WebhookDelivery.objects.get().payload
+        self.assertEqual(payload['data']['appointment_id'], self.appointment.pk)
+        self.assertEqual((payload['data']['old_status'], payload['data']['status']), ('pending', 'approved'))
+
+    def test_bulk_changes_queue_in_one_insert(self):
+        self.subscribe('http://127.0.0.1:9/hook')
+        self.subscribe('http://127.0.0.1:9/other')
+        for hour in (10, 11, 12):
+            Appointment.objects.create(
+                user=self.appointment.user, service=self.appointment.service,
+                appointment_date=self.appointment.appointment_date, appointment_time=f'{hour}:00',
+            )
+        with CaptureQueriesContext(connection) as ctx:
+            bulk_set_status(Appointment.objects.all(), 'rejected')
+        webhook_queries = [q['sql'] for q in ctx.captured_queries if '"webhooks_' in q['sql']]
+        self.assertEqual(len(webhook_queries), 2)
+        self.assertEqual(WebhookDelivery.objects.count(), 8)
+
+    def test_expired_appointments_are_queued(self):
+        self.subscribe('http://127.0.0.1:9/hook')
+        Appointment.objects.filter(pk=self.appointment.pk).update(
+            appointment_date=timezone.localdate() - timedelta(days=1),
+        )
+        sweep()
+        self.assertEqual(WebhookDelivery.objects.get().payload['data']['status'], 'expired')
+
+    def test_claimed_deliveries_are_not_sent_twice(self):
+        self.subscribe('http://127.0.0.1:9/hook')
+        self.approve()
+        self.assertEqual(len(claim_due()), 1)
+        self.assertEqual(claim_due(), [])
+        self.assertEqual(deliver_due(), (0, 0, 0))
+
+        # A worker that died leaves its claim to run out
+        later = timezone.now() + timedelta(seconds=settings.WEBHOOK_CLAIM_SECONDS + 1)
+        self.assertEqual(len(claim_due(now=later)), 1)
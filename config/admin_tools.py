@@ -0,0 +1,121 @@
+"""
+Shared helpers for ModelAdmins over large tables.
+
+EstimatedCountPaginator
+    Counting every row of a big table is a full scan on SQLite and
+    PostgreSQL alike. For an unfiltered changelist the count only drives the
+    page links, so the planner statistics are good enough: the row count
+    ANALYZE stores in ``sqlite_stat1`` on SQLite, ``pg_class.reltuples`` on
+    PostgreSQL. Filtered changelists, small tables and databases without
+    statistics fall back to an exact COUNT(*).
+
+PrefixSearchMixin
+    Runs ``^field`` search_fields that cross a relation as
+    ``fk IN (SELECT pk ... WHERE col LIKE 'x%')`` rather than joining. OR-ing
+    LIKEs on several joined tables forces a scan of the changelist table;
+    the subquery form lets each term use the search index on the related
+    table and the foreign-key index on this one.
+
+PrefixSearchIndex
+    The index a ``^field`` search needs. Django runs ``istartswith`` as
+    ``LIKE 'x%'`` on SQLite, which only uses an index built with the NOCASE
+    collation, and as ``UPPER(col) LIKE UPPER('x%')`` on PostgreSQL, which
+    needs an expression index with text_pattern_ops. Declared in
+    ``Meta.indexes``, so migrations and SQLite table rebuilds keep it.
+"""
+from functools import reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.contrib.postgres.indexes import OpClass
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import F, Q
+from django.db.models.functions import Collate, Upper
+from django.db.models.indexes import Index
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
+
+
+def estimated_row_count(model, using='default'):
+    """Planner estimate of the rows in ``model``'s table, or None."""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'sqlite':
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # sqlite_stat1 only exists once ANALYZE has run
+        return None
+    if row is None:
+        return None
+    # sqlite_stat1.stat starts with the row count: "<rows> <avg rows per key> ..."
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if getattr(queryset, 'query', None) is not None and not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class PrefixSearchIndex(Index):
+    """Index on the single field in ``fields`` for case-insensitive prefix searches."""
+
+    def _vendor_index(self, vendor):
+        column = self.fields[0]
+        if vendor == 'sqlite':
+            return Index(Collate(F(column), 'NOCASE'), name=self.name)
+        if vendor == 'postgresql':
+            return Index(OpClass(Upper(column), name='text_pattern_ops'), name=self.name)
+        return None
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        index = self._vendor_index(schema_editor.connection.vendor)
+        if index is None:
+            return super().create_sql(model, schema_editor, using, **kwargs)
+        return index.create_sql(model, schema_editor, using, **kwargs)
+
+
+def prefix_lookup(model, path, term):
+    """Q for ``path__istartswith=term`` with each relation hop as a subquery."""
+    name, _, rest = path.partition(LOOKUP_SEP)
+    if not rest:
+        return Q(**{f'{name}__istartswith': term})
+    related = model._meta.get_field(name).related_model
+    return Q(**{
+        f'{name}__in': related._default_manager.filter(prefix_lookup(related, rest, term)).values('pk')
+    })
+
+
+class PrefixSearchMixin:
+    """ModelAdmin mixin for search_fields that are all ``^`` prefix searches."""
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        if not search_term or not all(field.startswith('^') for field in search_fields):
+            return super().get_search_results(request, queryset, search_term)
+
+        term_queries = []
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            term_queries.append(reduce(or_, (
+                prefix_lookup(queryset.model, field.removeprefix('^'), bit) for field in search_fields
+            )))
+        return queryset.filter(reduce(and_, term_queries)), False
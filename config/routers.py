@@ -0,0 +1,113 @@
+"""
+Primary/replica database routing.
+
+Writes always go to ``default``. Reads go to one of DATABASE_REPLICAS, but
+only inside a web request handled by ReplicaRoutingMiddleware, and never
+when any of the following holds:
+
+* the request is not a GET/HEAD/OPTIONS;
+* the request has already written something (read-your-writes within the
+  request);
+* the client wrote within the last REPLICA_STICKY_SECONDS (tracked with a
+  cookie, so the redirect after a POST sees its own changes);
+* the code runs inside ``pin_to_primary()`` or a transaction on ``default``.
+
+Management commands, the sweeper and other background jobs keep reading from
+the primary.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_use_replicas = ContextVar('use_replicas', default=False)
+_pinned = ContextVar('pinned_to_primary', default=False)
+_wrote = ContextVar('wrote_to_primary', default=False)
+
+
+@contextmanager
+def use_replicas():
+    """Allow reads to be served by replicas (used per request by the middleware)."""
+    tokens = (_use_replicas.set(True), _pinned.set(False), _wrote.set(False))
+    try:
+        yield
+    finally:
+        for var, token in zip((_use_replicas, _pinned, _wrote), tokens):
+            var.reset(token)
+
+
+@contextmanager
+def pin_to_primary():
+    """Send every read to the primary. Works as a decorator too."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def wrote_to_primary():
+    """Whether a write was routed since replica reads were enabled."""
+    return _wrote.get()
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or not _use_replicas.get()
+            or _pinned.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if _use_replicas.get():
+            _wrote.set(True)
+            _pinned.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema by being copied from the primary
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Enables replica reads for safe requests and keeps a client on the
+    primary for a few seconds after it writes.
+
+    Place it after SessionMiddleware, so the session save at the end of every
+    request does not count as a write.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with use_replicas():
+            if request.method not in SAFE_METHODS or STICKY_COOKIE in request.COOKIES:
+                _pinned.set(True)
+            response = self.get_response(request)
+            if wrote_to_primary():
+                response.set_cookie(
+                    STICKY_COOKIE, '1',
+                    max_age=settings.REPLICA_STICKY_SECONDS,
+                    httponly=True,
+                    samesite='Lax',
+                )
+        return response
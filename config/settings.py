@@ -46,17 +46,24 @@ INSTALLED_APPS = [
     'apps.accounts.apps.AccountsConfig',
     'apps.appointments.apps.AppointmentsConfig',
     'apps.services.apps.ServicesConfig',
+    'apps.webhooks.apps.WebhooksConfig',
+    'reviews',
+    # After the apps whose data it renders, so its commit hooks run after
+    # theirs (e.g. the doctor profile cache is invalidated first)
+    'apps.prerender.apps.PrerenderConfig',
 # 'doctors', REMOVED: Invalid app - directory does not exist (PRIMARY BUG FIX)
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'config.routers.ReplicaRoutingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.prerender.middleware.PrerenderedPageMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -89,6 +96,106 @@ DATABASES = {
     }
 }
 
+# SQLite production mode for several gunicorn workers sharing one file.
+# WAL lets readers run while a write is in progress, and BEGIN IMMEDIATE takes
+# the write lock when the transaction starts. Without it, a transaction that
+# reads and then writes (e.g. a booking's slot check) fails with "database is
+# locked" without waiting. Connections are kept between requests.
+SQLITE_PRODUCTION_MODE = True
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',    # Durable in WAL mode except on power loss
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -20000,       # Negative means KiB, so ~20 MB per connection
+    'busy_timeout': 5000,       # Milliseconds to wait for the write lock
+    'temp_store': 'MEMORY',
+}
+
+if SQLITE_PRODUCTION_MODE:
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
+    })
+
+# Read replicas. Safe requests read from one of these aliases and everything
+# else uses 'default'; see config/routers.py. To try it locally, set this to
+# ['replica'] and run `python manage.py sync_replicas --interval 2`, which
+# copies db.sqlite3 to db.replica.sqlite3 with the SQLite backup API.
+DATABASE_REPLICAS = []
+
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db.{alias}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['config.routers.PrimaryReplicaRouter']
+
+# How long a client keeps reading from the primary after it writes; should
+# exceed the replication lag
+REPLICA_STICKY_SECONDS = 5
+
+
+# Cache
+# Local memory is per process; point this at a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache) when running several
+# workers so cache invalidation reaches all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Dashboard statistics are cached for at most this many seconds
+DASHBOARD_STATS_CACHE_TIMEOUT = 60
+
+# Doctor agendas are invalidated on every appointment or payment change; the
+# timeout only bounds how long a past day's agenda stays cached
+DOCTOR_AGENDA_CACHE_TIMEOUT = 60 * 60
+
+# Doctor profiles are invalidated whenever a row they show changes; the
+# timeout only bounds how long profiles nobody visits stay cached
+DOCTOR_PROFILE_CACHE_TIMEOUT = 60 * 60
+
+# Public catalog pages are pre-rendered to files under PRERENDER_ROOT and
+# served from there to anonymous visitors (off while DEBUG, so template
+# edits show up); run prerender_pages after deploying
+PRERENDER_PAGES = not DEBUG
+PRERENDER_ROOT = BASE_DIR / 'prerendered'
+
+# Service search facets are invalidated whenever a service changes; the
+# timeout only bounds how many filter combinations stay cached
+SERVICE_FACETS_CACHE_TIMEOUT = 60 * 60
+
+# Each worker keeps its own autocomplete index and checks this often whether
+# another worker changed a service or doctor
+AUTOCOMPLETE_VERSION_CHECK_SECONDS = 5
+
+# Fuzzy search keeps names whose trigram similarity (0-1) is at least this
+# and ranks at most this many of them
+FUZZY_SEARCH_THRESHOLD = 0.2
+FUZZY_SEARCH_LIMIT = 100
+
+# Doctors are ranked by a Bayesian average rating: their reviews plus this
+# many imaginary reviews at this mean (run reconcile_doctor_ratings after
+# changing either)
+DOCTOR_RATING_PRIOR_MEAN = 3.5
+DOCTOR_RATING_PRIOR_WEIGHT = 5
+
+
+# Admin changelists on tables with at least this many rows show the planner's
+# row estimate instead of running COUNT(*); see config/admin_tools.py. On SQLite
+# the estimate comes from ANALYZE, so run it (or PRAGMA optimize) periodically.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -161,6 +268,45 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Notification retention
+# Read notifications older than this are removed by `compact_notifications`
+NOTIFICATION_RETENTION_DAYS = 90
+NOTIFICATION_COMPACTION_CHUNK_SIZE = 500
+
+# Appointment archival
+# Finished appointments older than this are moved to the archive tables by
+# `archive_appointments`
+APPOINTMENT_ARCHIVE_AFTER_DAYS = 365
+APPOINTMENT_ARCHIVE_CHUNK_SIZE = 500
+
+# Appointment reminders
+# Approved appointments get a reminder this many hours before they start
+APPOINTMENT_REMINDER_HOURS = 24
+APPOINTMENT_REMINDER_CHANNEL = 'apps.appointments.reminders.NotificationChannel'
+
+# Stale booking sweeper
+# Pending Khalti checkouts started longer ago than this are expired by `sweep_stale`
+PAYMENT_PENDING_TTL_MINUTES = 60
+SWEEPER_BATCH_SIZE = 500
+
+# Email
+DEFAULT_FROM_EMAIL = 'Appointment Scheduler <no-reply@localhost>'
+# Notifications are emailed in batches over one SMTP connection by `send_notification_emails`
+NOTIFICATION_EMAIL_BATCH_SIZE = 100
+NOTIFICATION_EMAIL_MAX_ATTEMPTS = 5
+# Seconds before the first retry of a failed email, doubled after each further failure
+NOTIFICATION_EMAIL_RETRY_DELAY = 60
+NOTIFICATION_EMAIL_SUBJECT = 'Update on your appointment'
+
+# Outbound webhooks
+WEBHOOK_BATCH_SIZE = 200
+WEBHOOK_TIMEOUT_SECONDS = 5
+WEBHOOK_MAX_ATTEMPTS = 8
+WEBHOOK_BACKOFF_BASE_SECONDS = 30
+WEBHOOK_BACKOFF_MAX_SECONDS = 6 * 60 * 60
+# A claimed batch not recorded within this time (the worker died) is sent again
+WEBHOOK_CLAIM_SECONDS = 5 * 60
+
 
 # import os
 # from pathlib import Path
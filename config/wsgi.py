@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Build the autocomplete index as the worker starts, then drop the
+# connection so it is not shared with forked workers
+from django.db import connections  # noqa: E402
+
+from apps.services.autocomplete import autocomplete  # noqa: E402
+
+autocomplete.warm()
+connections.close_all()
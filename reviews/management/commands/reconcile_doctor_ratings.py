@@ -0,0 +1,29 @@
+"""
+Management command to recount the rating aggregates kept on each doctor.
+Usage: python manage.py reconcile_doctor_ratings [--dry-run]
+
+The aggregates are adjusted as reviews are written (see reviews/ratings.py);
+reviews changed with bulk_create(), update() or raw SQL skip that, and this
+puts the doctors right again.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reviews.ratings import reconcile_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recounts the rating sum, count and Bayesian average of every doctor from the reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted doctors without fixing them')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            wrong = reconcile_ratings(dry_run=options['dry_run'])
+        for doctor in wrong:
+            self.stdout.write(
+                f'Doctor {doctor.pk}: {doctor.rating_count} reviews, sum {doctor.rating_sum}'
+            )
+        verb = 'would be fixed' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(wrong)} doctor ratings {verb}.'))
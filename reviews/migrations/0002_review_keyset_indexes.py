@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0001_initial'),
+        ('services', '0013_doctor_ratings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['doctor', '-created_at', '-id'], name='review_doctor_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['doctor', '-rating', '-created_at', '-id'], name='review_doctor_rating_idx'),
+        ),
+    ]
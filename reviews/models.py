@@ -22,13 +22,11 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ('doctor', 'patient')  # one review per patient
+        indexes = [
+            # Keyset pages of a doctor's reviews, see reviews.pagination
+            models.Index(fields=['doctor', '-created_at', '-id'], name='review_doctor_recent_idx'),
+            models.Index(fields=['doctor', '-rating', '-created_at', '-id'], name='review_doctor_rating_idx'),
+        ]
 
     def __str__(self):
         return f"{self.patient} → {self.doctor} ({self.rating}⭐)"
-    
-    @property
-    def average_rating(self):
-        reviews = self.reviews.all()
-        if reviews.exists():
-            return round(sum(r.rating for r in reviews) / reviews.count(), 1)
-        return 0
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Keyset (cursor) pagination for a doctor's reviews.
+
+Like the appointment listings (apps/appointments/pagination.py), a page is
+addressed by the sort key of the review it starts after, so loading the
+tenth page of a popular doctor's reviews is the same index range scan as
+loading the first. Every ordering ends in (created_at, id), which makes the
+key unique.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+# ?sort= value -> ordering; each is covered by an index on Review
+REVIEW_ORDERINGS = {
+    'recent': ('-created_at', '-id'),
+    'rating': ('-rating', '-created_at', '-id'),
+}
+DEFAULT_SORT = 'recent'
+
+
+def encode_cursor(review, ordering):
+    values = [getattr(review, field.lstrip('-')) for field in ordering]
+    raw = '|'.join(value.isoformat() if isinstance(value, datetime) else str(value) for value in values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value, ordering):
+    """Return the key in ``value`` for ``ordering``, or None if it is not a valid cursor."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        *ratings, created_at, pk = raw.split('|')
+        if len(ratings) != len(ordering) - 2:
+            return None
+        return (*map(int, ratings), datetime.fromisoformat(created_at), int(pk))
+    except ValueError:
+        return None
+
+
+def _after(ordering, key):
+    """Rows that come after ``key`` in ``ordering``."""
+    condition = Q(pk__in=[])
+    equal = Q()
+    for field, value in zip(ordering, key):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+class ReviewPage:
+    """One page of reviews with the cursor to the next."""
+
+    def __init__(self, object_list, ordering, has_next):
+        self.object_list = object_list
+        self.ordering = ordering
+        self.has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1], self.ordering) if self.has_next else None
+
+
+def paginate_reviews(queryset, per_page, sort=DEFAULT_SORT, after=None):
+    """
+    Return the ReviewPage of ``queryset`` sorted by ``sort`` (a key of
+    REVIEW_ORDERINGS) following the ``after`` cursor, or the first page.
+    """
+    ordering = REVIEW_ORDERINGS.get(sort, REVIEW_ORDERINGS[DEFAULT_SORT])
+    key = decode_cursor(after, ordering)
+    if key:
+        queryset = queryset.filter(_after(ordering, key))
+    rows = list(queryset.order_by(*ordering)[:per_page + 1])
+    return ReviewPage(rows[:per_page], ordering, has_next=len(rows) > per_page)
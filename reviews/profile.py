@@ -0,0 +1,123 @@
+"""
+Cached doctor profiles.
+
+Everything on the profile page that is the same for every visitor (the
+doctor's details, educations, experiences, languages, services, rating and
+first page of reviews) is rendered once and cached as HTML. Like the
+agendas (apps/appointments/agenda.py), each doctor has a version number
+that is part of the key. Any change to a row the profile shows bumps it
+once the transaction commits, so until then a profile is served without
+touching the database.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from apps.services.models import Doctor, Education, Experience, Language, Service
+from apps.services.signals import doctor_user_changed, service_doctor_ids
+
+from .models import Review
+from .pagination import DEFAULT_SORT, paginate_reviews
+
+REVIEWS_PER_PAGE = 5
+
+
+def review_page(doctor_id, sort=DEFAULT_SORT, after=None):
+    reviews = Review.objects.filter(doctor_id=doctor_id).select_related('patient')
+    return paginate_reviews(reviews, REVIEWS_PER_PAGE, sort, after)
+
+
+def next_page_url(doctor_id, sort, page):
+    if not page.has_next:
+        return None
+    query = urlencode({'sort': sort, 'after': page.next_cursor})
+    return f"{reverse('doctor_reviews', args=[doctor_id])}?{query}"
+
+
+def profile_version_key(doctor_id):
+    return f'doctor-profile:version:{doctor_id}'
+
+
+def profile_key(doctor_id, version):
+    return f'doctor-profile:{doctor_id}:v{version}'
+
+
+def render_profile(doctor_id):
+    """The shared part of the profile page, as HTML."""
+    doctor = get_object_or_404(
+        Doctor.objects.select_related('user').prefetch_related('languages', 'educations', 'experiences', 'services'),
+        pk=doctor_id,
+    )
+    # First page inline, the rest from doctor_reviews as the patient scrolls
+    reviews = review_page(doctor.pk)
+    return render_to_string('doctor/_profile.html', {
+        'doctor': doctor,
+        'reviews': reviews,
+        'next_reviews_url': next_page_url(doctor.pk, DEFAULT_SORT, reviews),
+    })
+
+
+def doctor_profile_html(doctor_id):
+    """Cached ``render_profile()``; raises Http404 for unknown doctors."""
+    version = cache.get_or_set(profile_version_key(doctor_id), 1, None)
+    return cache.get_or_set(
+        profile_key(doctor_id, version),
+        lambda: render_profile(doctor_id),
+        settings.DOCTOR_PROFILE_CACHE_TIMEOUT,
+    )
+
+
+def _bump_versions(doctor_ids):
+    for doctor_id in doctor_ids:
+        try:
+            cache.incr(profile_version_key(doctor_id))
+        except ValueError:
+            # No version yet, so nothing is cached for this doctor
+            pass
+
+
+def invalidate_doctor_profiles(doctor_ids):
+    """Drop the cached profiles of the given doctors once the transaction commits."""
+    doctor_ids = {doctor_id for doctor_id in doctor_ids if doctor_id is not None}
+    if doctor_ids:
+        # Bumping earlier would let a request still seeing the old rows
+        # cache them under the new version
+        transaction.on_commit(partial(_bump_versions, doctor_ids))
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def doctor_changed(sender, instance, **kwargs):
+    invalidate_doctor_profiles([instance.pk])
+
+
+@receiver(post_save, sender=Education)
+@receiver(post_delete, sender=Education)
+@receiver(post_save, sender=Experience)
+@receiver(post_delete, sender=Experience)
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Language)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def doctor_row_changed(sender, instance, **kwargs):
+    invalidate_doctor_profiles([instance.doctor_id])
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def service_changed(sender, instance, **kwargs):
+    # A service moved to another doctor leaves the old doctor's profile too
+    invalidate_doctor_profiles(service_doctor_ids(instance))
+
+
+@receiver(doctor_user_changed)
+def doctor_user_saved(sender, doctors, **kwargs):
+    invalidate_doctor_profiles(doctor.pk for doctor in doctors)
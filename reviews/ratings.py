@@ -0,0 +1,103 @@
+"""
+Rating aggregates kept on Doctor.
+
+Doctor.rating_sum and rating_count are adjusted with F() expressions in the
+same transaction as the review write, so a doctor card or profile reads its
+rating from the doctor row instead of averaging the reviews.
+Doctor.bayesian_rating shrinks the average towards DOCTOR_RATING_PRIOR_MEAN
+as if every doctor had DOCTOR_RATING_PRIOR_WEIGHT extra reviews at that
+mean, so a single 5-star review does not outrank a hundred 4.8s. It is
+recomputed in the same UPDATE.
+
+``manage.py reconcile_doctor_ratings`` recounts them from the reviews.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from apps.prerender.pages import doctor_pages, invalidate_pages
+from apps.services.cards import invalidate_cards
+from apps.services.models import Doctor
+
+from .models import Review
+from .profile import invalidate_doctor_profiles
+
+
+def bayesian_rating(rating_sum, rating_count):
+    """Bayesian average; works on numbers and on F() expressions alike."""
+    weight = settings.DOCTOR_RATING_PRIOR_WEIGHT
+    return (weight * settings.DOCTOR_RATING_PRIOR_MEAN + rating_sum) / (weight + rating_count)
+
+
+def record_rating(doctor_id, sum_delta, count_delta):
+    """Add a rating change to the doctor's aggregates in one UPDATE."""
+    # Every F() below reads the row as it was before this UPDATE
+    rating_sum = Cast(F('rating_sum'), FloatField()) + sum_delta
+    Doctor.objects.filter(pk=doctor_id).update(
+        rating_sum=F('rating_sum') + sum_delta,
+        rating_count=F('rating_count') + count_delta,
+        bayesian_rating=bayesian_rating(rating_sum, F('rating_count') + count_delta),
+    )
+
+
+def submit_review(doctor, patient, rating, comment=''):
+    """Create or replace ``patient``'s review of ``doctor`` and update the aggregates."""
+    with transaction.atomic():
+        previous = (
+            Review.objects.select_for_update()
+            .filter(doctor=doctor, patient=patient)
+            .values_list('rating', flat=True)
+            .first()
+        )
+        review, created = Review.objects.update_or_create(
+            doctor=doctor,
+            patient=patient,
+            defaults={'rating': rating, 'comment': comment},
+        )
+        if created:
+            record_rating(doctor.pk, rating, 1)
+        elif previous is not None:
+            record_rating(doctor.pk, rating - previous, 0)
+        else:
+            # Created by a concurrent request after our read, so the rating
+            # it replaced is unknown
+            reconcile_ratings(Doctor.objects.filter(pk=doctor.pk))
+    return review, created
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    record_rating(instance.doctor_id, -instance.rating, -1)
+
+
+def reconcile_ratings(doctors=None, dry_run=False):
+    """
+    Recount the aggregates of ``doctors`` (default: all) from their reviews.
+
+    Returns the doctors whose stored aggregates were wrong.
+    """
+    if doctors is None:
+        doctors = Doctor.objects.all()
+    totals = {
+        row['doctor']: (row['total'], row['count'])
+        for row in Review.objects.filter(doctor__in=doctors)
+        .order_by().values('doctor').annotate(total=Sum('rating'), count=Count('pk'))
+    }
+    wrong = []
+    for doctor in doctors.only('pk', 'rating_sum', 'rating_count', 'bayesian_rating'):
+        rating_sum, rating_count = totals.get(doctor.pk, (0, 0))
+        expected = bayesian_rating(rating_sum, rating_count)
+        if (doctor.rating_sum, doctor.rating_count) != (rating_sum, rating_count) or \
+                abs(doctor.bayesian_rating - expected) > 1e-9:
+            doctor.rating_sum, doctor.rating_count, doctor.bayesian_rating = rating_sum, rating_count, expected
+            wrong.append(doctor)
+    if wrong and not dry_run:
+        Doctor.objects.bulk_update(wrong, ['rating_sum', 'rating_count', 'bayesian_rating'])
+        # bulk_update() sends no signals
+        invalidate_doctor_profiles(doctor.pk for doctor in wrong)
+        invalidate_cards(doctor.pk for doctor in wrong)
+        invalidate_pages(doctor_pages(doctor.pk for doctor in wrong))
+    return wrong
@@ -1,3 +1,208 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.services.models import Doctor, Education, Service
+
+from .models import Review
+from .pagination import decode_cursor, paginate_reviews
+from .ratings import bayesian_rating, reconcile_ratings, submit_review
+
+
+@override_settings(DOCTOR_RATING_PRIOR_MEAN=3.5, DOCTOR_RATING_PRIOR_WEIGHT=5)
+class RatingAggregateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Doctor.objects.create(
+            user=User.objects.create_user(username='dr', role='doctor'), specialization='Cardiology',
+        )
+        cls.patients = [User.objects.create_user(username=f'patient{i}') for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    def assertRating(self, rating_sum, rating_count):
+        self.doctor.refresh_from_db()
+        self.assertEqual((self.doctor.rating_sum, self.doctor.rating_count), (rating_sum, rating_count))
+        self.assertAlmostEqual(self.doctor.bayesian_rating, (5 * 3.5 + rating_sum) / (5 + rating_count))
+
+    def test_new_doctor_starts_at_the_prior(self):
+        self.assertRating(0, 0)
+        self.assertIsNone(self.doctor.average_rating)
+
+    def test_submit_update_and_delete(self):
+        submit_review(self.doctor, self.patients[0], 5)
+        submit_review(self.doctor, self.patients[1], 2)
+        self.assertRating(7, 2)
+        self.assertEqual(self.doctor.average_rating, 3.5)
+
+        review, created = submit_review(self.doctor, self.patients[0], 3, 'Changed my mind')
+        self.assertFalse(created)
+        self.assertRating(5, 2)
+
+        review.delete()
+        self.assertRating(2, 1)
+
+    def test_one_review_does_not_outrank_many(self):
+        self.assertGreater(bayesian_rating(48 * 100 / 10, 100), bayesian_rating(5, 1))
+
+    def test_reconcile_fixes_drift(self):
+        submit_review(self.doctor, self.patients[0], 4)
+        # bulk_create skips the aggregates
+        Review.objects.bulk_create([Review(doctor=self.doctor, patient=self.patients[1], rating=2)])
+
+        self.assertEqual(reconcile_ratings(dry_run=True), [self.doctor])
+        self.assertRating(4, 1)
+
+        out = StringIO()
+        call_command('reconcile_doctor_ratings', stdout=out)
+        self.assertIn('1 doctor ratings fixed', out.getvalue())
+        self.assertRating(6, 2)
+        self.assertEqual(reconcile_ratings(), [])
+
+    def test_profile_review_form(self):
+        url = reverse('doctor_profile', args=[self.doctor.pk])
+        self.client.force_login(self.patients[0])
+
+        response = self.client.post(url, {'rating': '9'})
+        self.assertRedirects(response, url)
+        self.assertRating(0, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'rating': '4', 'comment': 'Kind'})
+        self.assertRating(4, 1)
+        response = self.client.get(url)
+        self.assertTrue(response.context['has_reviewed'])
+        self.assertContains(response, '(1 review)')
+
+
+class ReviewPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Doctor.objects.create(
+            user=User.objects.create_user(username='dr', role='doctor'), specialization='Cardiology',
+        )
+        now = timezone.now()
+        for i in range(12):
+            patient = User.objects.create_user(username=f'patient{i}', first_name=f'Pat{i}')
+            review, created = submit_review(cls.doctor, patient, i % 5 + 1, f'Review {i}')
+            # Reviews 4 and 5 share a timestamp, so the id breaks the tie
+            Review.objects.filter(pk=review.pk).update(created_at=now - timedelta(hours=4 if i == 5 else i))
+        cls.reviews = Review.objects.filter(doctor=cls.doctor)
+
+    def walk(self, sort):
+        """Every review, following next cursors from the first page."""
+        seen = []
+        page = paginate_reviews(self.reviews, 5, sort)
+        while True:
+            seen.extend(page)
+            if not page.has_next:
+                return seen
+            page = paginate_reviews(self.reviews, 5, sort, page.next_cursor)
+
+    def test_pages_cover_every_review_in_order(self):
+        self.assertEqual(self.walk('recent'), list(self.reviews.order_by('-created_at', '-id')))
+        self.assertEqual(self.walk('rating'), list(self.reviews.order_by('-rating', '-created_at', '-id')))
+
+    def test_invalid_cursor_gives_the_first_page(self):
+        self.assertIsNone(decode_cursor('not-a-cursor', ('-created_at', '-id')))
+        first = paginate_reviews(self.reviews, 5, 'recent')
+        # A recency cursor has no rating
+        self.assertIsNone(decode_cursor(first.next_cursor, ('-rating', '-created_at', '-id')))
+        self.assertEqual(list(paginate_reviews(self.reviews, 5, 'recent', 'garbage')), list(first))
+
+    def test_reviews_endpoint(self):
+        url = reverse('doctor_reviews', args=[self.doctor.pk])
+        with self.assertNumQueries(1):
+            data = self.client.get(url, {'sort': 'rating'}).json()
+        self.assertEqual([review['rating'] for review in data['results']], [5, 5, 4, 4, 3])
+        self.assertEqual(data['results'][0]['patient'], 'Pat4')
+
+        seen = len(data['results'])
+        while data['next']:
+            data = self.client.get(data['next']).json()
+            seen += len(data['results'])
+        self.assertEqual(seen, 12)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_profile_renders_the_first_page(self):
+        response = self.client.get(reverse('doctor_profile', args=[self.doctor.pk]))
+        self.assertEqual(len(response.context['reviews']), 5)
+        self.assertIn('sort=recent', response.context['next_reviews_url'])
+        self.assertContains(response, 'Review 0')
+        self.assertNotContains(response, 'Review 11')
+
+
+class ProfileCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Doctor.objects.create(
+            user=User.objects.create_user(username='dr', first_name='Anita', role='doctor'), specialization='Cardiology',
+        )
+        cls.other = Doctor.objects.create(
+            user=User.objects.create_user(username='dr2', role='doctor'), specialization='Dermatology',
+        )
+        cls.service = Service.objects.create(name='ECG', description='x', price=100, doctor=cls.doctor)
+        cls.patient = User.objects.create_user(username='patient')
+        cls.url = reverse('doctor_profile', args=[cls.doctor.pk])
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, *args):
+        return self.client.get(*args or [self.url])
+
+    def test_second_view_skips_the_database(self):
+        self.assertContains(self.get(), 'ECG')
+        with self.assertNumQueries(0):
+            self.assertContains(self.get(), 'ECG')
+        # Other doctors have their own entry
+        self.assertContains(self.get(reverse('doctor_profile', args=[self.other.pk])), 'Dermatology')
+        self.assertEqual(self.get(reverse('doctor_profile', args=[0])).status_code, 404)
+
+    def test_changes_invalidate_once_committed(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            education = Education.objects.create(doctor=self.doctor, degree='MD', institution='IOM', year=2015)
+        self.assertContains(self.get(), 'IOM')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submit_review(self.doctor, self.patient, 5, 'Very kind')
+        self.assertContains(self.get(), 'Very kind')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.user.first_name = 'Sunita'
+            self.doctor.user.save()
+        self.assertContains(self.get(), 'Sunita')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            education.delete()
+        self.assertNotContains(self.get(), 'IOM')
+
+    def test_moved_service_leaves_both_profiles(self):
+        other_url = reverse('doctor_profile', args=[self.other.pk])
+        self.get()
+        self.get(other_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.doctor = self.other
+            self.service.save()
+        self.assertNotContains(self.get(), 'ECG')
+        self.assertContains(self.get(other_url), 'ECG')
+
+    def test_unrelated_user_saves_keep_the_cache(self):
+        self.get()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.doctor.user.save(update_fields=['last_login'])
+            self.patient.save()
+        self.assertEqual(callbacks, [])
@@ -1,33 +1,65 @@
-from reviews.models import Review, Doctor
+from django.contrib import messages
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.dateformat import format as format_date
+from django.utils.timezone import localtime
+
+from reviews.models import Review, Doctor
+from reviews.pagination import DEFAULT_SORT, REVIEW_ORDERINGS
+from reviews.profile import doctor_profile_html, next_page_url, review_page
+from reviews.ratings import submit_review
+
+
+def doctor_profile(request, doctor_id):
+    if request.method == "POST":
+        doctor = get_object_or_404(Doctor, pk=doctor_id)
+        if request.user.is_authenticated:
+            try:
+                rating = int(request.POST.get("rating", ""))
+            except ValueError:
+                rating = None
 
-def doctor_profile(request, pk):
-    doctor = get_object_or_404(Doctor, pk=pk)
+            if rating in range(1, 6):
+                submit_review(doctor, request.user, rating, request.POST.get("comment", ""))
+                messages.success(request, "Thank you for your review!")
+            else:
+                messages.error(request, "Please choose a rating from 1 to 5 stars.")
+        return redirect("doctor_profile", doctor_id=doctor.pk)
+
+    # The same for every visitor, so served from the cache
+    profile = doctor_profile_html(doctor_id)
 
     has_reviewed = False
     if request.user.is_authenticated:
         has_reviewed = Review.objects.filter(
-            doctor=doctor,
+            doctor_id=doctor_id,
             patient=request.user
         ).exists()
 
-    if request.method == "POST":
-        if request.user.is_authenticated:
-            rating = request.POST.get("rating")
-            comment = request.POST.get("comment")
-
-            if rating:
-                Review.objects.update_or_create(
-                    doctor=doctor,
-                    patient=request.user,
-                    defaults={
-                        "rating": rating,
-                        "comment": comment
-                    }
-                )
-        return redirect("doctor_profile", pk=pk)
-
     return render(request, "doctor/doctor_profile.html", {
-        "doctor": doctor,
+        "profile": profile,
         "has_reviewed": has_reviewed
     })
+
+
+def doctor_reviews(request, doctor_id):
+    """JSON page of a doctor's reviews: ?sort=recent|rating&after=<cursor>."""
+    sort = request.GET.get('sort', DEFAULT_SORT)
+    if sort not in REVIEW_ORDERINGS:
+        sort = DEFAULT_SORT
+    page = review_page(doctor_id, sort, request.GET.get('after'))
+    return JsonResponse({
+        'results': [
+            {
+                'id': review.pk,
+                'patient': review.patient.get_full_name() or review.patient.username,
+                'initial': review.patient.username[:1].upper(),
+                'rating': review.rating,
+                'comment': review.comment,
+                'created_at': review.created_at.isoformat(),
+                'created_display': format_date(localtime(review.created_at), 'M d, Y'),
+            }
+            for review in page
+        ],
+        'next': next_page_url(doctor_id, sort, page),
+    })